@@ -3,9 +3,14 @@
 # core libs
 import argparse
 import base64
+import collections
+import contextlib
 import copy
+import csv
 import datetime
 import decimal
+import hashlib
+import itertools
 import json
 import math
 import os
@@ -13,13 +18,19 @@ import parselmouth
 import random
 import shutil
 import sys
+import threading
+import time
+import zipfile
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from magic import Magic
 from tkinter import *
 from tkinter.ttk import *
 from tkinter import filedialog
 
 import scipy.fftpack as fftpack
+import scipy.interpolate as interpolate
+import scipy.ndimage as ndimage
 import soundfile as sf
 import urllib.request as request
 
@@ -55,7 +66,7 @@ except (ImportError):
     _WAV_VIS_LIBS_INSTALLED = False
 
 try:
-    from textgrid import TextGrid, IntervalTier, PointTier
+    from textgrid import TextGrid, IntervalTier, PointTier, Interval, Point
     _TEXTGRID_LIBS_INSTALLED = True
 except (ImportError):
     warn('TextGrid library failed to load')
@@ -90,6 +101,43 @@ except (ImportError):
 _CROSSHAIR_DRAG_BUFFER = 20
 _CROSSHAIR_SELECT_RADIUS = 9#12
 _TEXTGRID_ALIGNMENT_TIER_NAMES = [ 'frames', 'all frames', 'dicom frames', 'ultrasound frames' ]
+_SELECTION_MODES = [ 'replace', 'add', 'subtract', 'intersect' ]
+_UNDO_JOURNAL_MAX_BYTES = 2*1024*1024
+_UNDO_JOURNAL_PERSIST = False # only save the journal if the metadata asks for it
+_UNDO_JOURNAL_TOLERANCE = 1e-9
+_UNDO_JOURNAL_WRITE_DELAY = 1000 # ms without undoable changes before the journal is saved
+_MOTION_REFRESH_MS = 16 # ~60Hz
+_WORKER_COUNT = os.cpu_count() or 2
+_FRAME_CACHE_SIZE = 64 # decoded frames (and edge maps) kept in memory
+_EDGE_SMOOTHING_SIGMA = 2.0
+_PROPAGATE_SEARCH_RADIUS = 12 # pixels along the contour normal
+_PROPAGATE_STIFFNESS = 0.01 # edge strength traded per pixel moved
+_PROPAGATE_POLL_MS = 100 # how often the UI checks whether a propagation has finished
+_PROPOSAL_SUFFIX = '*'
+_SNAKE_ALPHA = 0.0 # elasticity (shrinks open contours, so off by default)
+_SNAKE_BETA = 0.5 # rigidity
+_SNAKE_GAMMA = 1.0 # viscosity (inverse step size)
+_SNAKE_KAPPA = 20.0 # weight of the image (edge) force
+_SNAKE_ITERATIONS = 200
+_SNAKE_FORCE_SIGMA = 3.0 # widens the capture range of the edge force
+_INTERPOLATION_KINDS = [ 'linear', 'spline' ]
+_RESAMPLE_POINTS = 100
+_RESAMPLE_SMOOTHING = 10.0 # roughness penalty of the smoothing spline (0 = none)
+_RESAMPLE_PARALLEL_MIN_FILES = 8 # below this, worker processes cost more than they save
+_PROPOSAL_COLOR = '#ff8c00'
+_ONION_SKIN_RADIUS = 3 # frames either side
+_ONION_SKIN_MAX_ALPHA = 0.7 # opacity of the nearest neighbours
+_ONION_SKIN_FADE_TO = 'black'
+_QA_POINTS = 50
+_QA_OUTLIER_THRESHOLD = 3.5 # robust z-score
+_QA_SMOOTHING_WINDOW = 5 # frames
+_TEXTGRID_PRECISION = 5 # decimal places the textgrid lib rounds times to
+_TEXTGRID_TICKS = 10**_TEXTGRID_PRECISION # per second
+_TEXTGRID_CACHE_DIR = 'textgrid-cache'
+_FRAME_SHIFT_WRITE_DELAY = 500 # ms the frame shift has to stay put before it's saved
+_TOOLTIP_HOVER_RADIUS = 3 # pixels
+_DENSITY_STRIP_HEIGHT = 6 # pixels, under the frame ticks when they're denser than one per pixel
+_BOUNDARY_GRAB_RADIUS = 4 # pixels either side of a TextGrid boundary that pick it up
 
 class ZoomFrame(Frame):
     '''
@@ -115,8 +163,11 @@ class ZoomFrame(Frame):
         self.canvas = Canvas( master,  bg='grey', width=self.canvas_width, height=self.canvas_height, highlightthickness=0 )
         self.canvas.grid(row=0, column=0, sticky='news')
         self.canvas.update() # do i need
-        rect = RectTracker(self.canvas)
-        rect.autodraw(outline='blue')
+        self.rect = RectTracker(self.canvas)
+        self.rect.autodraw(outline='blue')
+
+        # overlays redrawn along with the image, see addLayer()
+        self.layers = collections.OrderedDict()
 
         # self.master.rowconfigure(0, weight=1) # do i need
         # self.master.columnconfigure(0, weight=1) # do i need
@@ -196,8 +247,36 @@ class ZoomFrame(Frame):
             self.canvas.lower(image)
             self.canvas.imagetk = imagetk
             self.shown = True
+            self.drawLayers()
             self.app.Trace.update()
 
+    def addLayer(self, name, draw):
+        '''
+        register an overlay: `draw(zframe)` is called every time the image is
+        redrawn (zoom, pan, new frame) and should (re)place its canvas items, which
+        are tagged `'layer-' + name` (see toCanvas() for placing them).  Items are
+        left alone between calls so that layers can update incrementally
+        '''
+        self.layers[ name ] = draw
+        self.drawLayers()
+
+    def removeLayer(self, name):
+        if name in self.layers:
+            self.layers.pop( name )
+            self.canvas.delete( 'layer-' + name )
+
+    def drawLayers(self):
+        if self.image == None:
+            return
+        for name, draw in self.layers.items():
+            draw( self )
+
+    def toCanvas(self, points):
+        ''' (n,2) array of "true" (0-1) coords -> flat list of canvas coords, for create_line() '''
+        points = np.asarray( points, dtype=float ).reshape(-1,2)
+        scale = np.array( [ self.width * self.imgscale, self.height * self.imgscale ] )
+        return ( points * scale + np.array([ self.panX, self.panY ]) ).ravel().tolist()
+
     def wheel(self, event):
         if self.image != None:
             if event.keysym == 'equal' or event.keysym == 'minus': #what is this for?
@@ -253,11 +332,19 @@ class RectTracker:
     def __init__(self, canvas):
         self.canvas = canvas
         self.item = None
+        self.lasso = False   # draw a freehand lasso instead of a rectangle
+        self.path = []       # points visited by the current drag
+        self.lastPath = []   # points visited by the last finished drag
 
     def draw(self, start, end, **opts):
         """Draw the rectangle"""
         return self.canvas.create_rectangle(*(list(start)+list(end)), **opts)
 
+    def drawLasso(self, path, **opts):
+        """Draw the (closed) lasso outline"""
+        points = [ coord for xy in path+path[:1] for coord in xy ]
+        return self.canvas.create_line(*points, fill=opts.get('outline'))
+
     def autodraw(self, **opts):
         """Setup automatic drawing; supports command option"""
         self.start = None
@@ -269,22 +356,31 @@ class RectTracker:
         self.rectopts = opts
 
     def __update(self, event):
+        # canvas (not window) coordinates, like the selection box in onReleaseZoom()
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
         if not self.start:
-            self.start = [event.x, event.y]
+            self.start = [x, y]
+            self.path = [ tuple(self.start) ]
             # return
+        self.path.append( (x, y) )
 
         if self.item is not None:
             self.canvas.delete(self.item)
-        self.item = self.draw(self.start, (event.x, event.y), **self.rectopts)
-        self._command(self.start, (event.x, event.y))
+        if self.lasso:
+            self.item = self.drawLasso(self.path, **self.rectopts)
+        else:
+            self.item = self.draw(self.start, (x, y), **self.rectopts)
+        self._command(self.start, (x, y))
 
     def __stop(self, event):
         self.start = None
+        self.lastPath = self.path
+        self.path = []
         self.canvas.delete(self.item)
         self.item = None
 
 class Crosshairs(object):
-    def __init__(self, zframe, x, y, color, transform=True):
+    def __init__(self, zframe, x, y, color, transform=True, trace=None):
         '''
         Crosshairs() serves two purposes:
              - handling (visual) placement of a `+` onto the zframe canvas
@@ -296,10 +392,12 @@ class Crosshairs(object):
             y :            y-canvas-coordinate of where we should place the center of the Crosshairs
             color :        color for when unselected
             transform : Boolean RE whether the coordinates need to be adjusted
+            trace :     name of the trace this Crosshairs belongs to
         '''
 
         # keep a reference to the zframe
         self.zframe = zframe
+        self.trace = trace
 
         # set defaults here
         self.selectedColor  = 'blue'
@@ -386,6 +484,9 @@ class Crosshairs(object):
         if self.isVisible:
             self.zframe.canvas.itemconfig( self.hline, fill=self.selectedColor, width=self.selectedWidth)
             self.zframe.canvas.itemconfig( self.vline, fill=self.selectedColor, width=self.selectedWidth)
+            # tag the lines so that a drag can move all of them at once
+            self.zframe.canvas.addtag_withtag( 'selectedCrosshairs', self.hline )
+            self.zframe.canvas.addtag_withtag( 'selectedCrosshairs', self.vline )
             self.isSelected = True
 
     def unselect(self):
@@ -393,6 +494,8 @@ class Crosshairs(object):
         if self.isVisible:
             self.zframe.canvas.itemconfig( self.hline, fill=self.unselectedColor, width=self.unselectedWidth)
             self.zframe.canvas.itemconfig( self.vline, fill=self.unselectedColor, width=self.unselectedWidth)
+            self.zframe.canvas.dtag( self.hline, 'selectedCrosshairs' )
+            self.zframe.canvas.dtag( self.vline, 'selectedCrosshairs' )
             self.isSelected = False
 
     def undraw(self):
@@ -420,6 +523,16 @@ class Crosshairs(object):
             self.zframe.canvas.coords( self.hline, self.x-self.len, self.y, self.x+self.len, self.y )
             self.zframe.canvas.coords( self.vline, self.x, self.y-self.len, self.x, self.y+self.len )
 
+    def shift(self, dx, dy):
+        '''
+        move the centerpoint by a canvas offset without touching the canvas items
+        (the caller moves all the selected lines at once by their tag)
+        '''
+        if self.isVisible:
+            self.x += dx
+            self.y += dy
+            self.trueX, self.trueY = self.transformCoordsToTrue(self.x, self.y)
+
     def recolor(self, color):
         ''' change the fill color of the Crosshairs '''
         if self.isVisible:
@@ -428,6 +541,1761 @@ class Crosshairs(object):
                 self.zframe.canvas.itemconfig( self.hline, fill=color )
                 self.zframe.canvas.itemconfig( self.vline, fill=color )
 
+class MotionPipeline(object):
+    '''
+    Coalesces high-frequency <Motion> events: each event only stores its (x,y)
+    sample, and the samples collected since the last refresh are handed to
+    `callback` at most once per `interval` ms.  Also keeps track of the latency
+    between receiving an event and the canvas being repainted with its effect.
+    '''
+    def __init__(self, widget, callback, interval=_MOTION_REFRESH_MS):
+        self.widget = widget
+        self.callback = callback
+        self.interval = interval
+        self.pending = []       # (x,y) samples since the last flush
+        self.received = None    # time the oldest pending sample arrived
+        self.afterId = None
+        self.latencies = []     # in ms
+
+    def feed(self, event):
+        ''' store a motion sample and make sure a flush is scheduled '''
+        if not self.pending:
+            self.received = time.perf_counter()
+        self.pending.append( (event.x, event.y) )
+        if self.afterId == None:
+            self.afterId = self.widget.after( self.interval, self.flush )
+
+    def flush(self):
+        ''' hand all pending samples to the callback '''
+        self.afterId = None
+        if not self.pending:
+            return
+        samples, received = self.pending, self.received
+        self.pending = []
+        self.callback( samples )
+        # idle callbacks run in order, so this one runs after the canvas redraw
+        self.widget.after_idle( lambda: self.latencies.append( (time.perf_counter()-received)*1000 ) )
+
+    def drain(self):
+        ''' flush immediately (e.g. on release, so the final position is not lost) '''
+        if self.afterId != None:
+            self.widget.after_cancel( self.afterId )
+        self.flush()
+
+    def cancel(self):
+        ''' drop any pending samples '''
+        if self.afterId != None:
+            self.widget.after_cancel( self.afterId )
+            self.afterId = None
+        self.pending = []
+
+    def report(self):
+        ''' summarize (and reset) the latencies recorded so far '''
+        lat, self.latencies = self.latencies, []
+        if not lat:
+            return 'motion latency: no events'
+        return 'motion latency: mean %.1f ms, max %.1f ms over %d refreshes' % ( sum(lat)/len(lat), max(lat), len(lat) )
+
+class OnionSkin(object):
+    '''
+    ZoomFrame layer drawing the contours of a trace on the frames around the
+    current one, fading with distance (Tk canvases have no alpha, so colors are
+    blended towards _ONION_SKIN_FADE_TO instead).
+
+    The window of frames is fetched from the metadata in one call and drawn as one
+    line per frame.  When the current frame moves, only the frames entering the
+    window are fetched and drawn and only those leaving it are deleted; the rest
+    are just repositioned and recolored.  Everything is refetched after a write.
+    '''
+    def __init__(self, app, radius=_ONION_SKIN_RADIUS):
+        self.app = app
+        self.radius = radius
+        self.items = {} # frame -> canvas item
+        self.points = {} # frame -> (n,2) array of "true" coords (or None)
+        self.key = None # (file, trace, revision) the cache belongs to
+
+    def getWindow(self):
+        frame = self.app.frame
+        return [ f for f in range( max(1, frame-self.radius), min(self.app.frames, frame+self.radius)+1 ) if f != frame ]
+
+    def getColor(self, canvas, color, distance):
+        ''' `color` faded according to its distance from the current frame '''
+        alpha = _ONION_SKIN_MAX_ALPHA * ( 1 - (distance-1) / (self.radius+1) )
+        rgb = np.array( canvas.winfo_rgb(color) ) / 256
+        fade = np.array( canvas.winfo_rgb(_ONION_SKIN_FADE_TO) ) / 256
+        return '#%02x%02x%02x' % tuple( np.round( alpha*rgb + (1-alpha)*fade ).astype(int) )
+
+    def clear(self, canvas):
+        canvas.delete( 'layer-onion' )
+        self.items = {}
+        self.points = {}
+
+    def draw(self, zframe):
+        trace = self.app.Trace.getCurrentTraceName()
+        filename = self.app.Data.getCurrentFilename()
+        key = ( filename, trace, self.app.Data.revision )
+        if key != self.key:
+            self.clear( zframe.canvas )
+            self.key = key
+        if trace == None:
+            return
+        window = self.getWindow()
+
+        # drop frames that left the window, fetch the ones that entered it
+        for frame in [ f for f in self.items if f not in window ]:
+            zframe.canvas.delete( self.items.pop(frame) )
+        for frame in [ f for f in self.points if f not in window ]:
+            self.points.pop( frame )
+        missing = [ f for f in window if f not in self.points ]
+        for frame, crosshairs in self.app.Data.getTraceFrames( trace, filename, missing ).items():
+            self.points[ frame ] = np.array( [ [pt['x'], pt['y']] for pt in crosshairs ] ) if len(crosshairs) > 1 else None
+
+        color = self.app.Trace.available[ trace ][ 'color' ] or 'white'
+        for frame in window:
+            if self.points[ frame ] is None:
+                continue
+            coords = zframe.toCanvas( self.points[frame] )
+            fill = self.getColor( zframe.canvas, color, abs(frame - self.app.frame) )
+            if frame in self.items:
+                zframe.canvas.coords( self.items[frame], *coords )
+                zframe.canvas.itemconfig( self.items[frame], fill=fill )
+            else:
+                self.items[ frame ] = zframe.canvas.create_line( *coords, fill=fill, tags='layer-onion' )
+
+class SelectionEngine(object):
+    '''
+    Hit-testing for rubber-band (box) and lasso selections.  Rather than asking
+    each Crosshairs in turn whether it lies inside the region, we test an (n,2)
+    array of canvas coordinates in a single vectorized pass and then combine the
+    hits with the current selection according to one of _SELECTION_MODES:
+        - replace :   hits become the new selection
+        - add :       hits are added to the selection
+        - subtract :  hits are removed from the selection
+        - intersect : only selected points that are also hits stay selected
+    '''
+    def __init__(self, mode='replace', shape='box'):
+        self.mode = mode
+        self.shape = shape # either 'box' or 'lasso'
+
+    def inBox(self, coords, x1, y1, x2, y2):
+        ''' returns a boolean mask of the coords that fall inside the box '''
+        xmin, xmax = min(x1,x2), max(x1,x2)
+        ymin, ymax = min(y1,y2), max(y1,y2)
+        x, y = coords[:,0], coords[:,1]
+        return (xmin < x) & (x < xmax) & (ymin < y) & (y < ymax)
+
+    def inLasso(self, coords, path):
+        '''
+        returns a boolean mask of the coords that fall inside the (implicitly closed)
+        polygon given by `path`, using even-odd ray casting broadcast over every
+        (point, edge) pair at once
+        '''
+        poly = np.asarray(path, dtype=float).reshape(-1,2)
+        if len(poly) < 3:
+            return np.zeros(len(coords), dtype=bool)
+        x0, y0 = poly[:,0], poly[:,1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        px, py = coords[:,0,None], coords[:,1,None]
+        straddles = (y0 > py) != (y1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xCross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        crossings = straddles & (px < xCross)
+        return np.count_nonzero(crossings, axis=1) % 2 == 1
+
+    def combine(self, selected, hits, mode=None):
+        ''' combine the current selection mask with a mask of hits '''
+        mode = self.mode if mode==None else mode
+        if mode == 'add':
+            return selected | hits
+        elif mode == 'subtract':
+            return selected & ~hits
+        elif mode == 'intersect':
+            return selected & hits
+        return hits
+
+    def select(self, coords, selected, box=None, path=None, mode=None):
+        '''
+        returns the new selection mask for the (n,2) array `coords`, given the
+        current selection mask and either a box (x1,y1,x2,y2) or a lasso path
+        '''
+        coords = np.asarray(coords, dtype=float).reshape(-1,2)
+        selected = np.asarray(selected, dtype=bool)
+        if path != None:
+            hits = self.inLasso(coords, path)
+        else:
+            hits = self.inBox(coords, *box)
+        return self.combine(selected, hits, mode)
+
+def prefetched(load, items, workers=_WORKER_COUNT, executor=ThreadPoolExecutor):
+    '''
+    generator yielding (item, load(item)) for each item in order, with `load`
+    running in a pool of workers (threads, unless another executor is given) a
+    few items ahead of the consumer
+    '''
+    items = iter( items )
+    with executor( max_workers=workers ) as pool:
+        pending = collections.deque(
+            (item, pool.submit(load, item)) for item in itertools.islice(items, 2*workers) )
+        try:
+            while pending:
+                item, future = pending.popleft()
+                for nxt in itertools.islice( items, 1 ):
+                    pending.append( (nxt, pool.submit(load, nxt)) )
+                yield item, future.result()
+        finally:
+            for item, future in pending:
+                future.cancel()
+
+def getNormals(points):
+    ''' unit normals for an (n,2) array of (ordered) contour points '''
+    tangents = np.gradient( points, axis=0 )
+    normals = np.stack( [ -tangents[:,1], tangents[:,0] ], axis=1 )
+    lengths = np.linalg.norm( normals, axis=1, keepdims=True )
+    return normals / np.where( lengths > 0, lengths, 1 )
+
+def getFrameAspect(entry, path):
+    '''
+    width/height of the frames of a file (given its entry in the metadata `files`
+    list), read from the header of its first processed PNG, or None if it hasn't
+    been processed
+    '''
+    processed = entry.get( 'processed' ) or {}
+    for frame in sorted( processed, key=int )[:1]:
+        try:
+            with Image.open( os.path.join(path, processed[frame]) ) as image:
+                width, height = image.size
+            return width / height
+        except (OSError, TypeError):
+            return None
+    return None
+
+def resampleContour(points, n, aspect=1.0):
+    ''' resample an (m,2) array of contour points to n points equally spaced along its length '''
+    points = np.asarray( points, dtype=float ).reshape(-1,2)
+    if len(points) < 2:
+        return np.repeat( points[:1], n, axis=0 )
+    return resampleContours( [points], n, aspect )[0]
+
+def resampleContours(contours, n, aspect=1.0):
+    '''
+    resample each of a list of contours ((m_i,2) arrays, m_i >= 2) to n points
+    equally spaced along its length, returning an (F,n,2) array.  The contours are
+    padded to a common length by repeating their last point, and every frame is
+    interpolated with a single searchsorted() over the concatenated arc lengths.
+
+    Points are in 0-1 image coordinates, so lengths are measured with x scaled by
+    `aspect`, the width/height of the frames (one for all the contours, or one per
+    contour), to space the samples evenly in pixels rather than in those units.
+    '''
+    F = len( contours )
+    m = max( len(c) for c in contours )
+    padded = np.empty( (F, m, 2) )
+    for i, c in enumerate( contours ):
+        padded[ i, :len(c) ] = c
+        padded[ i, len(c): ] = c[-1]
+    steps = np.diff( padded, axis=1 )
+    steps[ ..., 0 ] *= np.reshape( np.asarray(aspect, dtype=float), (-1,1) )
+    lengths = np.concatenate( [ np.zeros((F,1)),
+        np.cumsum( np.linalg.norm( steps, axis=2 ), axis=1 ) ], axis=1 )
+    total = lengths[:,-1:]
+    flat = np.where( total > 0, lengths / np.where(total > 0, total, 1), np.linspace(0, 1, m)[None,:] )
+    # shift each row into its own interval so the whole array is sorted
+    offsets = 2 * np.arange( F )[:,None]
+    flat = ( flat + offsets ).ravel()
+    targets = ( np.linspace(0, 1, n)[None,:] + offsets ).ravel()
+    start = np.repeat( np.arange(F) * m, n )
+    index = np.clip( np.searchsorted(flat, targets, side='right') - 1, start, start + m - 2 )
+    span = flat[ index+1 ] - flat[ index ]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where( span > 0, (targets - flat[index]) / span, 0 )
+    points = padded.reshape(-1,2)
+    resampled = points[ index ] + frac[:,None] * ( points[index+1] - points[index] )
+    return resampled.reshape( F, n, 2 )
+
+def orientContours(shapes, reference=None):
+    '''
+    make an (F,n,2) array of resampled contours all run the same way, reversing
+    the ones that don't: those closer (point by point) to `reference` when
+    reversed, or without a reference, those whose last point lies left of their
+    first.  Returns the oriented contours and a boolean mask of the reversed ones
+    '''
+    if reference is None:
+        flipped = shapes[:,-1,0] < shapes[:,0,0]
+    else:
+        forward = np.linalg.norm( shapes - reference, axis=2 ).mean( axis=1 )
+        backward = np.linalg.norm( shapes[:,::-1] - reference, axis=2 ).mean( axis=1 )
+        flipped = backward < forward
+    return np.where( flipped[:,None,None], shapes[:,::-1], shapes ), flipped
+
+def smoothContours(shapes, smoothing):
+    '''
+    discrete smoothing spline (Whittaker smoother) along an (F,n,2) array of
+    contours: minimizes |y - x|^2 + smoothing * |D2 y|^2 for every frame and both
+    coordinates with one linear solve
+    '''
+    F, n, _ = shapes.shape
+    if smoothing <= 0 or n < 3 or F == 0:
+        return shapes
+    d2 = np.diff( np.eye(n), n=2, axis=0 )
+    system = np.eye(n) + smoothing * d2.T.dot(d2)
+    rhs = shapes.transpose(1,0,2).reshape(n, -1)
+    return np.linalg.solve( system, rhs ).reshape(n, F, 2).transpose(1,0,2)
+
+def resampleTraceFile(job):
+    '''
+    resample and smooth every traced frame of one trace in one file; `job` is a
+    (trace, filename, {frame: [{'x':..,'y':..}, ...]}, n, smoothing, aspect) tuple
+    and the result is (trace, filename, frame numbers, (frames,n,2) array)
+
+    (a top-level function so that it can be handed to worker processes)
+    '''
+    trace, filename, frames, n, smoothing, aspect = job
+    keys = sorted( ( f for f in frames if len(frames[f]) >= 2 ), key=int )
+    if len(keys) == 0:
+        return trace, filename, np.zeros(0, dtype=int), np.zeros( (0, n, 2) )
+    contours = [ np.array( [ [pt['x'], pt['y']] for pt in frames[f] ], dtype=float ) for f in keys ]
+    shapes = smoothContours( resampleContours(contours, n, aspect), smoothing )
+    # smoothing shifts the points a little, so even out their spacing again
+    shapes = resampleContours( shapes, n, aspect )
+    return trace, filename, np.array( [ int(f) for f in keys ] ), shapes
+
+class TraceResampler(object):
+    '''
+    Resamples every trace in a project (the `data` dictionary of a MetadataModule,
+    i.e. the contents of metadata.json) to `n` equally spaced points, smoothing
+    each contour with a discrete smoothing spline on the way.  Work is vectorized
+    across the frames of each (trace, file), and for larger projects spread across
+    a pool of worker processes, one (trace, file) at a time.
+    '''
+    def __init__(self, n=_RESAMPLE_POINTS, smoothing=_RESAMPLE_SMOOTHING, workers=_WORKER_COUNT):
+        self.n = n
+        self.smoothing = smoothing
+        self.workers = workers
+
+    def getJobs(self, data, traces=None, path=None):
+        '''
+        one job per (trace, file), skipping unaccepted proposals; given the project
+        `path`, each file's contours are resampled in pixels (see getFrameAspect())
+        '''
+        entries = { entry['name']:entry for entry in data.get( 'files', [] ) }
+        aspects = {}
+        jobs = []
+        for trace, info in data.get( 'traces', {} ).items():
+            if ( traces != None and trace not in traces ) or 'proposalFor' in info:
+                continue
+            for filename, frames in info.get( 'files', {} ).items():
+                if len(frames) > 0:
+                    if filename not in aspects:
+                        aspect = getFrameAspect( entries.get(filename, {}), path ) if path != None else None
+                        aspects[ filename ] = 1.0 if aspect == None else aspect
+                    jobs.append( (trace, filename, frames, self.n, self.smoothing, aspects[filename]) )
+        return jobs
+
+    def run(self, data, traces=None, path=None):
+        ''' returns a {(trace, filename): (frame numbers, (frames,n,2) array)} dict '''
+        jobs = self.getJobs( data, traces, path )
+        if self.workers > 1 and len(jobs) >= _RESAMPLE_PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor( max_workers=self.workers ) as pool:
+                results = list( pool.map( resampleTraceFile, jobs, chunksize=max(1, len(jobs) // (4*self.workers)) ) )
+        else:
+            results = [ resampleTraceFile(job) for job in jobs ]
+        return { (trace, filename):(frames, shapes) for trace, filename, frames, shapes in results if len(frames) }
+
+    def save(self, results, path):
+        ''' write the results to a .npz with `<trace>/<file>/frames` and `<trace>/<file>/points` arrays '''
+        arrays = {}
+        for (trace, filename), (frames, shapes) in results.items():
+            arrays[ '%s/%s/frames' % (trace, filename) ] = frames
+            arrays[ '%s/%s/points' % (trace, filename) ] = shapes
+        np.savez_compressed( path, **arrays )
+
+def interpolateContours(keyframes, frames, kind='linear', aspect=1.0):
+    '''
+    given a {frame: (m,2) points} dict of at least two keyframes, returns a
+    {frame: (n,2) points} dict for each of `frames` (which should lie between
+    the first and last keyframes), where n is the largest keyframe point count.
+
+    Keyframes are resampled along arc length (and reversed where needed so that
+    they all run in the same direction as the first) and then interpolated in a
+    single pass over every point, either piecewise-linearly or (given at least
+    three keyframes) with a cubic spline.  `aspect` is the width/height of the
+    frames, see resampleContours().
+    '''
+    keys = sorted( keyframes, key=int )
+    n = max( len(keyframes[k]) for k in keys )
+    shapes = np.stack( [ resampleContour(keyframes[k], n, aspect) for k in keys ] )
+    shapes, flipped = orientContours( shapes, shapes[0] )
+    x = np.array( [ int(k) for k in keys ], dtype=float )
+    if kind == 'spline' and len(keys) > 2:
+        curve = interpolate.CubicSpline( x, shapes, axis=0 )
+    else:
+        curve = interpolate.interp1d( x, shapes, axis=0 )
+    frames = list( frames )
+    values = curve( np.array( [ int(f) for f in frames ], dtype=float ) )
+    return dict( zip( frames, values ) )
+
+def toTicks(time):
+    ''' a (Decimal) TextGrid time as an integer number of ticks '''
+    return int( round( time * _TEXTGRID_TICKS ) )
+
+def fromTicks(ticks):
+    ''' the inverse of toTicks(), giving the same Decimal as TextGrid.fromFile() '''
+    return decimal.Decimal( int(ticks) ).scaleb( -_TEXTGRID_PRECISION )
+
+def toSeconds(ticks):
+    ''' ticks as (float) seconds, e.g. for audio code '''
+    return ticks / _TEXTGRID_TICKS
+
+def compileTextGrid(textgrid):
+    '''
+    flatten a parsed TextGrid into a dict of arrays (suitable for np.savez): a json
+    `header` describing the grid and its tiers, and per tier i the integer tick
+    arrays `start<i>` (and `end<i>` for interval tiers) and the marks `label<i>`
+    '''
+    header = { 'minTime':toTicks(textgrid.minTime), 'maxTime':toTicks(textgrid.maxTime), 'tiers':[] }
+    arrays = {}
+    for i, tier in enumerate( textgrid ):
+        if isinstance( tier, IntervalTier ):
+            header['tiers'].append({ 'name':tier.name, 'class':'IntervalTier',
+                'minTime':toTicks(tier.minTime), 'maxTime':toTicks(tier.maxTime) })
+            arrays[ 'start%d' % i ] = np.array( [ toTicks(interval.minTime) for interval in tier ], dtype=np.int64 )
+            arrays[ 'end%d' % i ] = np.array( [ toTicks(interval.maxTime) for interval in tier ], dtype=np.int64 )
+        else:
+            header['tiers'].append({ 'name':tier.name, 'class':'TextTier' })
+            arrays[ 'start%d' % i ] = np.array( [ toTicks(point.time) for point in tier ], dtype=np.int64 )
+        arrays[ 'label%d' % i ] = np.array( [ item.mark for item in tier ], dtype=str )
+    arrays[ 'header' ] = np.array( json.dumps(header) )
+    return arrays
+
+def buildTextGrid(arrays):
+    ''' rebuild the TextGrid a compileTextGrid() dict was made from '''
+    header = json.loads( str(arrays['header']) )
+    textgrid = TextGrid( minTime=fromTicks(header['minTime']), maxTime=fromTicks(header['maxTime']) )
+    for i, info in enumerate( header['tiers'] ):
+        starts = [ fromTicks(t) for t in arrays[ 'start%d' % i ].tolist() ]
+        labels = arrays[ 'label%d' % i ].tolist()
+        if info['class'] == 'IntervalTier':
+            tier = IntervalTier( info['name'], fromTicks(info['minTime']), fromTicks(info['maxTime']) )
+            ends = [ fromTicks(t) for t in arrays[ 'end%d' % i ].tolist() ]
+            tier.intervals = [ Interval(start, end, label) for start, end, label in zip( starts, ends, labels ) ]
+        else:
+            tier = PointTier( info['name'] )
+            tier.points = [ Point(start, label) for start, label in zip( starts, labels ) ]
+        textgrid.append( tier )
+    return textgrid
+
+class TextGridCache(object):
+    '''
+    Compiled copies of the project's TextGrids (see compileTextGrid()), kept as
+    .npz files in a directory next to the metadata.  A cached copy is used as long
+    as the modification time and size of its TextGrid haven't changed; loading one
+    takes milliseconds where TextGrid.fromFile() can take seconds
+    '''
+    def __init__(self, path):
+        self.directory = os.path.join( path, _TEXTGRID_CACHE_DIR )
+
+    def getCachePath(self, textgridPath):
+        ''' where the compiled copy of a given TextGrid lives '''
+        key = hashlib.md5( os.path.abspath(textgridPath).encode('utf-8') ).hexdigest()[:16]
+        name = os.path.splitext( os.path.basename(textgridPath) )[0]
+        return os.path.join( self.directory, '%s-%s.npz' % (name, key) )
+
+    def getArrays(self, textgridPath):
+        ''' the compileTextGrid() arrays of a TextGrid, parsing it only if the cache is stale '''
+        stat = os.stat( textgridPath )
+        cachePath = self.getCachePath( textgridPath )
+        try:
+            with np.load( cachePath, allow_pickle=False ) as cached:
+                arrays = dict( cached )
+            header = json.loads( str(arrays['header']) )
+            if header['mtime'] == stat.st_mtime and header['size'] == stat.st_size:
+                return arrays
+        except (OSError, ValueError, KeyError):
+            pass
+        return self.store( textgridPath, TextGrid.fromFile(textgridPath) )
+
+    def load(self, textgridPath):
+        ''' a TextGrid, as TextGrid.fromFile() would return it '''
+        return buildTextGrid( self.getArrays(textgridPath) )
+
+    def store(self, textgridPath, textgrid):
+        ''' (re)compile a TextGrid that has just been read from or written to textgridPath '''
+        stat = os.stat( textgridPath )
+        arrays = compileTextGrid( textgrid )
+        header = json.loads( str(arrays['header']) )
+        header.update({ 'mtime':stat.st_mtime, 'size':stat.st_size })
+        arrays[ 'header' ] = np.array( json.dumps(header) )
+        cachePath = self.getCachePath( textgridPath )
+        try:
+            os.makedirs( self.directory, exist_ok=True )
+            with open( cachePath + '.tmp', 'wb' ) as f:
+                np.savez( f, **arrays )
+            os.replace( cachePath + '.tmp', cachePath )
+        except OSError as e:
+            warn( 'Unable to cache `%s` (%s)' % (textgridPath, e) )
+        return arrays
+
+class TextGridWriter(object):
+    '''
+    Writes TextGrids (given as compileTextGrid() arrays) on a background thread,
+    and refreshes their TextGridCache entries.  Only the latest version of each
+    file is written, and each write replaces the file in one step, so readers
+    never see a half-written TextGrid
+    '''
+    def __init__(self, cache):
+        self.cache = cache
+        self.pending = collections.OrderedDict() # path -> arrays
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def write(self, textgridPath, arrays):
+        ''' queue a write (replacing any queued write of the same file) '''
+        with self.condition:
+            self.pending[ textgridPath ] = dict( arrays )
+            if self.thread == None:
+                self.thread = threading.Thread( target=self.run )
+                self.thread.start()
+
+    def wait(self):
+        ''' block until all queued writes are on disk '''
+        with self.condition:
+            while self.thread != None:
+                self.condition.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.pending:
+                    self.thread = None
+                    self.condition.notify_all()
+                    return
+                textgridPath, arrays = self.pending.popitem( last=False )
+            try:
+                textgrid = buildTextGrid( arrays )
+                textgrid.write( textgridPath + '.tmp' )
+                os.replace( textgridPath + '.tmp', textgridPath )
+                self.cache.store( textgridPath, textgrid )
+            except Exception as e:
+                # (keep going, or write() and wait() would be left waiting on a dead thread)
+                warn( 'Unable to write `%s` (%s: %s)' % (textgridPath, type(e).__name__, e) )
+
+class TierModel(object):
+    '''
+    One tier as sorted integer-tick arrays: `starts` (the point times of a point
+    tier, or the left boundaries of an interval tier) and, for interval tiers,
+    `ends`.  Marks are stored once in `marks`, with `labels` holding the id (index
+    into `marks`) of each item
+    '''
+    def __init__(self, name, starts, ends, marks):
+        self.name = name
+        self.starts = starts
+        self.ends = ends # None for a point tier
+        self.marks, self.labels = np.unique( marks, return_inverse=True )
+        self.isInterval = ends is not None
+
+    def __len__(self):
+        return len( self.starts )
+
+    def getMark(self, i):
+        return str( self.marks[ self.labels[i] ] )
+
+    def indexContaining(self, ticks):
+        '''
+        index of the interval containing a time (as in IntervalTier.indexContaining,
+        a time on a boundary belongs to the earlier interval), or None
+        '''
+        i = int( np.searchsorted( self.ends, ticks, side='left' ) )
+        if i < len(self) and self.starts[i] <= ticks:
+            return i
+        return None
+
+    def indicesContaining(self, ticks):
+        ''' indexContaining() for an array of times, with -1 for None '''
+        index = np.searchsorted( self.ends, ticks, side='left' )
+        inside = index < len(self)
+        inside[ inside ] = self.starts[ index[inside] ] <= ticks[ inside ]
+        return np.where( inside, index, -1 )
+
+    def getRange(self, start, end):
+        ''' (i, j) such that items i..j-1 are the ones overlapping [start, end] '''
+        if self.isInterval:
+            i = np.searchsorted( self.ends, start, side='left' )
+        else:
+            i = np.searchsorted( self.starts, start, side='left' )
+        j = np.searchsorted( self.starts, end, side='right' )
+        return int(i), int(j)
+
+    def getLabel(self, mark):
+        ''' the id of a mark, adding it to `marks` if it's new '''
+        found = np.flatnonzero( self.marks == mark )
+        if len(found) > 0:
+            return int( found[0] )
+        self.marks = np.append( self.marks, mark )
+        return len( self.marks ) - 1
+
+    # the edits below replace the arrays rather than changing them in place, since
+    # earlier versions may still be queued for writing (see TextGridWriter)
+
+    def setMark(self, i, mark):
+        self.labels = self.labels.copy()
+        self.labels[i] = self.getLabel( mark )
+
+    def moveBoundary(self, i, ticks):
+        ''' move the boundary between intervals i and i+1 (it has to stay between their other boundaries) '''
+        if not self.starts[i] < ticks < self.ends[i+1]:
+            raise ValueError( 'boundary would cross a neighbouring boundary' )
+        self.ends = self.ends.copy()
+        self.starts = self.starts.copy()
+        self.ends[i] = self.starts[i+1] = ticks
+
+    def insertBoundary(self, ticks):
+        '''
+        split the interval containing `ticks` in two (the mark stays on the left);
+        returns the index of the split interval, or None if there's nothing to split
+        '''
+        i = self.indexContaining( ticks )
+        if i == None or ticks == self.starts[i] or ticks == self.ends[i]:
+            return None
+        self.starts = np.insert( self.starts, i+1, ticks )
+        self.ends = np.insert( self.ends, i, ticks )
+        self.labels = np.insert( self.labels, i+1, self.getLabel('') )
+        return i
+
+    def removeBoundary(self, i):
+        ''' merge intervals i and i+1 (joining their marks, as Praat does) '''
+        mark = self.getMark(i) + self.getMark(i+1)
+        self.starts = np.delete( self.starts, i+1 )
+        self.ends = np.delete( self.ends, i )
+        self.labels = np.delete( self.labels, i+1 )
+        self.labels[i] = self.getLabel( mark )
+
+    def shift(self, offset, minTime, maxTime):
+        ''' a copy of this (point) tier moved by `offset` ticks, without the points that end up outside [minTime, maxTime] '''
+        starts = self.starts + offset
+        keep = (minTime <= starts) & (starts <= maxTime)
+        tier = copy.copy( self )
+        tier.starts, tier.labels = starts[keep], self.labels[keep]
+        return tier
+
+class TextGridModel(object):
+    '''
+    The array form of a TextGrid (built from compileTextGrid() output) that
+    TextGridModule renders and queries: times are integer ticks and every
+    frame/interval/time lookup is a binary search
+    '''
+    def __init__(self, arrays):
+        self.arrays = arrays
+        header = json.loads( str(arrays['header']) )
+        self.minTime = header['minTime']
+        self.maxTime = header['maxTime']
+        self.tiers = collections.OrderedDict()
+        self.tierIndex = {} # name -> position in header['tiers'] (and `arrays`)
+        for i, info in enumerate( header['tiers'] ):
+            if info['name'] in self.tiers:
+                continue # like TextGrid.getFirst()
+            ends = arrays[ 'end%d' % i ] if info['class'] == 'IntervalTier' else None
+            self.tiers[ info['name'] ] = TierModel( info['name'], arrays[ 'start%d' % i ], ends, arrays[ 'label%d' % i ] )
+            self.tierIndex[ info['name'] ] = i
+        self.frameTierName = getFrameTierName( self )
+        self.setFrameTier( self.tiers[ self.frameTierName ] )
+
+    def setFrameTier(self, tier):
+        '''
+        Make `tier` the frame tier, and index every interval tier against it: for
+        each tier, the interval containing each frame (so which interval holds
+        frame N is a lookup, and which frames an interval holds a binary search)
+        '''
+        self.frameTier = tier
+        self.tiers[ self.frameTierName ] = tier
+        self.framePositions = { mark:i for i, mark in enumerate(tier.marks[tier.labels].tolist()) }
+        self.frameIntervals = { name:other.indicesContaining( tier.starts ) for name, other in self.tiers.items() if other.isInterval }
+        self.labelledFrames = {} # tier name -> positions of the frames in labelled intervals, see getLabelledFrames()
+
+    def setFrameOffset(self, offset):
+        '''
+        Move the frames to their original times (kept in a `[tiername].original`
+        tier, added on the first shift) plus `offset` ticks, dropping any frames
+        that end up outside the TextGrid.  `arrays` is updated to match
+        '''
+        originalName = self.frameTierName + '.original'
+        header = json.loads( str(self.arrays['header']) )
+        arrays = dict( self.arrays ) # a new dict, so earlier snapshots (e.g. queued writes) are unaffected
+        if originalName not in self.tiers:
+            i = len( header['tiers'] )
+            info = dict( header['tiers'][ self.tierIndex[self.frameTierName] ], name=originalName )
+            header['tiers'].append( info )
+            arrays[ 'header' ] = np.array( json.dumps(header) )
+            arrays[ 'start%d' % i ] = self.frameTier.starts
+            arrays[ 'label%d' % i ] = self.frameTier.marks[ self.frameTier.labels ]
+            self.tiers[ originalName ] = self.frameTier
+            self.tierIndex[ originalName ] = i
+        tier = self.tiers[ originalName ].shift( offset, self.minTime, self.maxTime )
+        i = self.tierIndex[ self.frameTierName ]
+        arrays[ 'start%d' % i ] = tier.starts
+        arrays[ 'label%d' % i ] = tier.marks[ tier.labels ]
+        self.arrays = arrays
+        self.setFrameTier( tier )
+
+    def getNames(self):
+        return list( self.tiers.keys() )
+
+    def getFrameTime(self, frame):
+        ''' time of a (1-indexed) frame '''
+        return int( self.frameTier.starts[ frame-1 ] )
+
+    def getFrameMark(self, i):
+        return self.frameTier.getMark( i )
+
+    def getFramePosition(self, frame):
+        ''' position in the frame tier of the frame with mark `frame` (or None) '''
+        return self.framePositions.get( str(frame) )
+
+    def setMark(self, name, i, mark):
+        self.tiers[ name ].setMark( i, mark )
+        self.updateTier( name )
+
+    def moveBoundary(self, name, i, ticks):
+        ''' move the boundary after interval i of tier `name` '''
+        tier = self.tiers[ name ]
+        old = int( tier.ends[i] )
+        tier.moveBoundary( i, ticks )
+        self.updateTier( name, min(old, ticks), max(old, ticks) )
+
+    def insertBoundary(self, name, ticks):
+        '''
+        add a boundary to tier `name`; returns how interval indices shifted, as
+        (after, change) for updateTier(), or None if there was nowhere to add it
+        '''
+        tier = self.tiers[ name ]
+        i = tier.insertBoundary( ticks )
+        if i == None:
+            return None
+        self.updateTier( name, tier.starts[i], tier.ends[i+1], i, 1 )
+        return ( i, 1 )
+
+    def removeBoundary(self, name, i):
+        '''
+        remove the boundary after interval i of tier `name`; returns how interval
+        indices shifted, as (after, change) for updateTier()
+        '''
+        tier = self.tiers[ name ]
+        tier.removeBoundary( i )
+        self.updateTier( name, tier.starts[i], tier.ends[i], i, -1 )
+        return ( i, -1 )
+
+    def updateTier(self, name, start=None, end=None, after=None, change=0):
+        '''
+        Bring what's derived from tier `name` up to date after an edit: `change`
+        intervals were inserted (or removed, if negative) after interval `after`,
+        and frames between times `start` and `end` (if given) may have changed
+        interval.  Only those frames are looked up again
+        '''
+        tier = self.tiers[ name ]
+        index = self.frameIntervals[ name ].copy()
+        if change != 0:
+            index[ index > after ] += change
+        if start != None:
+            lo, hi = self.frameTier.getRange( start, end )
+            index[ lo:hi ] = tier.indicesContaining( self.frameTier.starts[lo:hi] )
+        self.frameIntervals[ name ] = index
+        self.labelledFrames.pop( name, None )
+        i = self.tierIndex[ name ]
+        arrays = dict( self.arrays )
+        arrays[ 'start%d' % i ] = tier.starts
+        arrays[ 'end%d' % i ] = tier.ends
+        arrays[ 'label%d' % i ] = tier.marks[ tier.labels ]
+        self.arrays = arrays
+
+    def getFrameMarks(self, positions):
+        ''' marks of the frames at some positions of the frame tier '''
+        return self.frameTier.marks[ self.frameTier.labels[positions] ].tolist()
+
+    def getFrameIntervals(self, name):
+        ''' for each frame, the index of the interval of tier `name` containing it (or -1) '''
+        return self.frameIntervals[ name ]
+
+    def getFrameInterval(self, name, frame):
+        ''' index of the interval of tier `name` containing the frame with mark `frame` (or None) '''
+        position = self.getFramePosition( frame )
+        if position == None or self.frameIntervals[ name ][ position ] < 0:
+            return None
+        return int( self.frameIntervals[ name ][ position ] )
+
+    def getLabelledFrames(self, name):
+        ''' positions (in the frame tier) of the frames inside intervals of tier `name` with a non-empty mark '''
+        if name not in self.labelledFrames:
+            tier = self.tiers[ name ]
+            index = self.frameIntervals[ name ]
+            labelled = (tier.marks != '')[ tier.labels[index] ] & (index >= 0)
+            self.labelledFrames[ name ] = np.flatnonzero( labelled )
+        return self.labelledFrames[ name ]
+
+    def getIntervalFrames(self, name, i):
+        ''' positions (in the frame tier) of the frames inside interval i of tier `name` '''
+        tier = self.tiers[ name ]
+        lo, hi = self.frameTier.getRange( tier.starts[i], tier.ends[i] )
+        return lo + np.flatnonzero( self.getFrameIntervals(name)[ lo:hi ] == i )
+
+class TracedIntervalCounts(object):
+    '''
+    The number of traced frames in each interval of every tier of a
+    TextGridModel, and in all of each tier's labelled intervals (what the tier
+    labels show).  Built once per TextGrid, then updated a frame at a time by
+    setTraced(), so keeping the labels current costs O(tiers) per edit
+    '''
+    def __init__(self, model, tracedFrames):
+        self.model = model
+        self.traced = np.isin( model.frameTier.marks[ model.frameTier.labels ], list(tracedFrames) )
+        self.counts = {} # tier name -> traced frames in each interval
+        self.labelled = {} # tier name -> [traced, total] frames in labelled intervals
+        for name in model.frameIntervals:
+            self.updateTier( name )
+
+    def updateTier(self, name):
+        ''' recount tier `name` (e.g. after its boundaries or marks were edited) '''
+        index = self.model.frameIntervals[ name ]
+        self.counts[ name ] = np.bincount( index[ self.traced & (index >= 0) ], minlength=len(self.model.tiers[name]) )
+        labelled = self.model.getLabelledFrames( name )
+        self.labelled[ name ] = [ int(np.count_nonzero( self.traced[labelled] )), len(labelled) ]
+
+    def setTraced(self, frame, traced):
+        ''' mark the frame with mark `frame` as traced (or not) '''
+        position = self.model.getFramePosition( frame )
+        if position == None or self.traced[ position ] == traced:
+            return
+        self.traced[ position ] = traced
+        change = 1 if traced else -1
+        for name, index in self.model.frameIntervals.items():
+            i = index[ position ]
+            if i < 0:
+                continue
+            self.counts[ name ][ i ] += change
+            if self.model.tiers[ name ].getMark( i ) != '':
+                self.labelled[ name ][0] += change
+
+    def getIntervalCounts(self, name, i):
+        ''' (traced, total) frames in interval i of tier `name` '''
+        return int( self.counts[name][i] ), len( self.model.getIntervalFrames(name, i) )
+
+    def getTierCounts(self, name):
+        ''' (traced, total) frames in the labelled intervals of tier `name` '''
+        return tuple( self.labelled[ name ] )
+
+class Timeline(object):
+    '''
+    The window of time shown by the TextGrid canvases and the spectrogram (and
+    played back by PlaybackModule).  All times are integer ticks, as in
+    TextGridModel, so moving the window is exact integer arithmetic; times only
+    become floats when mapped to pixels (vectorized, see toX() and fromX()) or
+    handed to audio code (see toSeconds())
+    '''
+    def __init__(self, width):
+        self.width = width # pixels
+        self.minTime = 0
+        self.maxTime = 0
+        self.start = 0
+        self.end = 0
+
+    def reset(self, minTime, maxTime):
+        ''' show the whole of a new TextGrid '''
+        self.minTime = int(minTime)
+        self.maxTime = int(maxTime)
+        self.show(minTime, maxTime)
+
+    def getDuration(self):
+        return self.end - self.start
+
+    def show(self, start, end):
+        self.start = int(start)
+        self.end = int(end)
+        self.clamp()
+
+    def clamp(self):
+        ''' cut the window down to the TextGrid '''
+        self.start = max(self.start, self.minTime)
+        self.end = min(self.end, self.maxTime)
+
+    def moveTo(self, start):
+        ''' move the window (keeping its duration) to begin at `start`, but not past either end '''
+        duration = self.getDuration()
+        start = min(max(int(start), self.minTime), self.maxTime - duration)
+        self.start, self.end = start, start + duration
+
+    def centerOn(self, ticks):
+        self.moveTo(ticks - self.getDuration()//2)
+
+    def pan(self, fraction):
+        ''' move the window by a fraction of its duration '''
+        self.moveTo(self.start + int(round(self.getDuration() * fraction)))
+
+    def zoom(self, factor):
+        ''' zoom in (factor > 1) or out (factor < 1) around the middle of the window '''
+        duration = self.getDuration()
+        change = min( duration - int(round(duration / factor)), duration - 1 )
+        self.show(self.start + change//2, self.end - (change - change//2))
+
+    def toX(self, ticks):
+        ''' time(s) -> x-coord(s) on a canvas self.width pixels wide '''
+        return (np.asarray(ticks, dtype=np.int64) - self.start) * (self.width / self.getDuration())
+
+    def fromX(self, x):
+        ''' x-coord -> time, to the nearest tick '''
+        return self.start + int(round(x * self.getDuration() / self.width))
+
+def getFrameTierName(textgrid):
+    '''
+    Handle some inconsistency in how we're naming our alignment tier
+    '''
+    for name in _TEXTGRID_ALIGNMENT_TIER_NAMES:
+        if name in textgrid.getNames():
+            return name
+    raise NameError( 'Unable to find alignment tier' )
+
+def getFrameIntervals(textgrid, frameTierName=None):
+    '''
+    returns (marks, times, tiers) for the points of the alignment tier, where tiers
+    is a {tier: (index, minTimes, maxTimes, labels)} dict for the interval tiers,
+    with index[i] the interval containing frame i (-1 if there is none).  A frame
+    on a boundary belongs to the earlier interval, as in TextGridModule.fillCanvases()
+    '''
+    frameTierName = getFrameTierName( textgrid ) if frameTierName==None else frameTierName
+    frameTier = textgrid.getFirst( frameTierName )
+    marks = [ point.mark for point in frameTier ]
+    times = np.array( [ float(point.time) for point in frameTier ] )
+    tiers = {}
+    for tier in textgrid:
+        if not isinstance( tier, IntervalTier ):
+            continue
+        minTimes = np.array( [ float(interval.minTime) for interval in tier ] )
+        maxTimes = np.array( [ float(interval.maxTime) for interval in tier ] )
+        index = np.searchsorted( maxTimes, times, side='left' )
+        inside = index < len(tier)
+        inside[ inside ] = minTimes[ index[inside] ] <= times[ inside ]
+        tiers[ tier.name ] = ( np.where(inside, index, -1), minTimes, maxTimes, [ interval.mark for interval in tier ] )
+    return marks, times, tiers
+
+def getFrameLabels(textgrid, frameTierName=None):
+    '''
+    returns (marks, times, labels) for the points of the alignment tier, where
+    labels is a {tier: array} dict giving, for each frame, the mark of the interval
+    of that tier containing it ('' if there is none)
+    '''
+    marks, times, tiers = getFrameIntervals( textgrid, frameTierName )
+    labels = {}
+    for name, (index, minTimes, maxTimes, text) in tiers.items():
+        labels[ name ] = np.array( text + [''], dtype=object )[ index ] # -1 picks the ''
+    return marks, times, labels
+
+def readTierNames(path):
+    '''
+    names of the interval tiers of a TextGrid file, read without parsing the
+    whole thing (falls back to a full parse for short-format files)
+    '''
+    names, isInterval = [], False
+    with open( path, 'r', encoding='utf-8', errors='replace' ) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith( 'class =' ):
+                isInterval = ( line == 'class = "IntervalTier"' )
+            elif line.startswith( 'name =' ) and isInterval:
+                names.append( line[ line.index('"')+1 : line.rindex('"') ] )
+                isInterval = False
+    if len(names) == 0:
+        names = [ tier.name for tier in TextGrid.fromFile(path) if isinstance(tier, IntervalTier) ]
+    return names
+
+def exportTraceFile(job):
+    '''
+    collect the traces of one file along with the time and interval labels of
+    each traced frame; `job` is a (filename, TextGrid path or None, {trace: {frame:
+    points}}) tuple.  Returns a dict with the file's time span and, per trace,
+    arrays of frame numbers, times (nan if unknown), point counts, points, and
+    a {tier: labels} dict
+
+    (a top-level function so that it can be handed to worker processes)
+    '''
+    filename, textgridPath, traces = job
+    lookup, frameTimes, frameLabels, span = {}, np.zeros(0), {}, None
+    if textgridPath != None and _TEXTGRID_LIBS_INSTALLED and os.path.exists( textgridPath ):
+        try:
+            textgrid = TextGrid.fromFile( textgridPath )
+            marks, frameTimes, frameLabels = getFrameLabels( textgrid )
+            lookup = { mark:i for i, mark in enumerate(marks) }
+            span = ( float(textgrid.minTime), float(textgrid.maxTime) )
+        except Exception as e:
+            warn( 'Unable to align frames using `%s` (%s)' % (textgridPath, e) )
+            frameTimes, frameLabels = np.zeros(0), {}
+    result = { 'file':filename, 'span':span, 'traces':{} }
+    for trace, frames in traces.items():
+        keys = sorted( ( f for f in frames if len(frames[f]) > 0 ), key=int )
+        if len(keys) == 0:
+            continue
+        rows = np.array( [ lookup.get(f, -1) for f in keys ] )
+        known = rows >= 0
+        times = np.full( len(keys), np.nan )
+        times[ known ] = frameTimes[ rows[known] ]
+        result[ 'traces' ][ trace ] = {
+            'frames':np.array( [ int(f) for f in keys ] ),
+            'times':times,
+            'counts':np.array( [ len(frames[f]) for f in keys ] ),
+            'xy':np.array( [ [pt['x'], pt['y']] for f in keys for pt in frames[f] ], dtype=float ).reshape(-1,2),
+            'labels':{ tier:np.where( known, labels[ np.maximum(rows, 0) ], '' ) for tier, labels in frameLabels.items() } }
+    return result
+
+class TraceExporter(object):
+    '''
+    Exports every trace in a project (the `data` dictionary of a MetadataModule,
+    i.e. the contents of metadata.json, with `path` its directory) as:
+        - long-format CSV : one row per point, with the frame's time and the
+                            labels of the intervals containing it on every tier
+        - NumPy .npz :      per (file, trace) arrays of frames, times, point
+                            counts, points and labels
+        - TextGrids :       per file, one point tier per trace, with a point at
+                            each traced frame marked with its interval labels
+
+    The core is a generator over files: each file is aligned against its
+    TextGrid's frame tier by a pool of worker processes a few files ahead of the
+    writer, so memory use is bounded by a handful of files, not the project.
+    '''
+    def __init__(self, data, path, traces=None, workers=_WORKER_COUNT):
+        self.data = data
+        self.path = path
+        self.traces = traces
+        self.workers = workers
+        self.jobs = self.getJobs()
+        self.tiers = self.getTierNames()
+
+    def getJobs(self):
+        ''' one (filename, TextGrid path, {trace: frames}) job per traced file '''
+        jobs = []
+        for entry in self.data.get( 'files', [] ):
+            filename = entry[ 'name' ]
+            traces = {}
+            for trace, info in self.data.get( 'traces', {} ).items():
+                if ( self.traces != None and trace not in self.traces ) or 'proposalFor' in info:
+                    continue
+                if filename in info.get( 'files', {} ):
+                    traces[ trace ] = info[ 'files' ][ filename ]
+            if traces:
+                textgrid = entry.get( '.TextGrid' )
+                jobs.append( (filename, os.path.join(self.path, textgrid) if textgrid else None, traces) )
+        return jobs
+
+    def getTierNames(self):
+        ''' every interval tier name used in the project (in order of appearance) '''
+        tiers = []
+        for filename, textgridPath, traces in self.jobs:
+            if textgridPath != None and os.path.exists( textgridPath ):
+                for tier in readTierNames( textgridPath ):
+                    if tier not in tiers:
+                        tiers.append( tier )
+        return tiers
+
+    def files(self):
+        ''' generator over the exportTraceFile() result of each traced file '''
+        if self.workers > 1 and len(self.jobs) > 1:
+            for job, result in prefetched( exportTraceFile, self.jobs, self.workers, ProcessPoolExecutor ):
+                yield result
+        else:
+            for job in self.jobs:
+                yield exportTraceFile( job )
+
+    def rows(self):
+        ''' generator over long-format (file, trace, frame, time, point, x, y, *labels) rows '''
+        for result in self.files():
+            for trace, info in result[ 'traces' ].items():
+                point = 0
+                for i, frame in enumerate( info['frames'].tolist() ):
+                    time = '' if np.isnan( info['times'][i] ) else info['times'][i]
+                    labels = [ info['labels'][tier][i] if tier in info['labels'] else '' for tier in self.tiers ]
+                    for j in range( info['counts'][i] ):
+                        x, y = info['xy'][ point ]
+                        yield [ result['file'], trace, frame, time, j, x, y ] + labels
+                        point += 1
+
+    def writeCSV(self, path):
+        with open( path, 'w', newline='' ) as f:
+            writer = csv.writer( f )
+            writer.writerow( [ 'file', 'trace', 'frame', 'time', 'point', 'x', 'y' ] + self.tiers )
+            writer.writerows( self.rows() )
+
+    def writeNPZ(self, path):
+        '''
+        write `<file>/<trace>/{frames,times,counts,xy}` and `<file>/<trace>/labels/<tier>`
+        arrays, streaming each into the archive as soon as its file is done
+        '''
+        with zipfile.ZipFile( path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True ) as archive:
+            for result in self.files():
+                for trace, info in result[ 'traces' ].items():
+                    arrays = { key:info[key] for key in ('frames', 'times', 'counts', 'xy') }
+                    for tier, labels in info[ 'labels' ].items():
+                        arrays[ 'labels/' + tier ] = np.array( labels.tolist(), dtype=str )
+                    for key, array in arrays.items():
+                        with archive.open( '%s/%s/%s.npy' % (result['file'], trace, key), 'w', force_zip64=True ) as member:
+                            np.lib.format.write_array( member, array, allow_pickle=False )
+
+    def writeTextGrids(self, directory):
+        ''' write `<directory>/<file>.traces.TextGrid` for each file with a frame alignment '''
+        os.makedirs( directory, exist_ok=True )
+        for result in self.files():
+            if result[ 'span' ] == None:
+                warn( 'No frame alignment for `%s`, skipping' % result['file'] )
+                continue
+            minTime, maxTime = result[ 'span' ]
+            textgrid = TextGrid( minTime=minTime, maxTime=maxTime )
+            for trace, info in result[ 'traces' ].items():
+                tier = PointTier( trace, minTime, maxTime )
+                for i, frame in enumerate( info['frames'].tolist() ):
+                    if np.isnan( info['times'][i] ):
+                        continue
+                    labels = [ '%s=%s' % (name, labels[i]) for name, labels in info['labels'].items() if labels[i] != '' ]
+                    tier.add( info['times'][i], ' '.join( [ 'frame=%d' % frame ] + labels ) )
+                textgrid.append( tier )
+            textgrid.write( os.path.join( directory, os.path.basename(result['file']) + '.traces.TextGrid' ) )
+
+def indexTextGrid(job):
+    '''
+    the frame alignment of one TextGrid, in the (json-friendly) form kept by
+    TraceIndex; `job` is a (filename, TextGrid path) tuple.  Returns None if the
+    TextGrid can't be read or has no alignment tier
+
+    (a top-level function so that it can be handed to worker processes)
+    '''
+    filename, textgridPath = job
+    try:
+        mtime = os.path.getmtime( textgridPath )
+        marks, times, tiers = getFrameIntervals( TextGrid.fromFile(textgridPath) )
+    except Exception as e:
+        warn( 'Unable to index `%s` (%s)' % (textgridPath, e) )
+        return None
+    return { 'mtime':mtime, 'marks':marks, 'times':times.tolist(),
+        'tiers':{ name:{ 'index':index.tolist(), 'start':minTimes.tolist(), 'end':maxTimes.tolist(), 'label':labels }
+            for name, (index, minTimes, maxTimes, labels) in tiers.items() } }
+
+class TraceIndex(object):
+    '''
+    Project-wide index for queries like "all `tongue` traces on frames inside
+    intervals labelled `r` on the `phones` tier", i.e. (tier, label) -> intervals
+    -> frames -> traced points.
+
+    The expensive part (parsing every TextGrid and aligning its frames with its
+    intervals) is done once per project and saved next to the metadata; on
+    refresh() only files whose TextGrid modification time has changed are
+    re-parsed (in parallel).  Traced points are looked up in the live metadata at
+    query time, so tracing never leaves the index stale.
+    '''
+    def __init__(self, data, path, workers=_WORKER_COUNT):
+        self.data = data
+        self.path = path
+        self.workers = workers
+        self.indexfile = os.path.join( path, 'trace-index.json' )
+        self.files = {} # filename -> indexTextGrid() result
+        self.postings = {} # (tier, label) -> [ (filename, frame rows, interval indices) ]
+        self.aspects = {} # filename -> width/height of its frames, see getAspect()
+        self.version = 0 # bumped whenever refresh() changes anything
+        if os.path.exists( self.indexfile ):
+            try:
+                with open( self.indexfile, 'r' ) as f:
+                    self.files = json.load( f )
+            except ValueError:
+                warn( 'Ignoring unreadable index `%s`' % self.indexfile )
+        self.refresh()
+
+    def refresh(self):
+        ''' re-index files whose TextGrid changed (or appeared), and drop missing ones '''
+        textgrids = {}
+        for entry in self.data.get( 'files', [] ):
+            if entry.get( '.TextGrid' ):
+                textgrids[ entry['name'] ] = os.path.join( self.path, entry['.TextGrid'] )
+        stale = []
+        for filename, textgridPath in textgrids.items():
+            try:
+                mtime = os.path.getmtime( textgridPath )
+            except OSError:
+                continue
+            if filename not in self.files or self.files[ filename ] == None or self.files[ filename ][ 'mtime' ] != mtime:
+                stale.append( (filename, textgridPath) )
+        changed = len(stale) > 0 or any( filename not in textgrids for filename in self.files )
+        self.files = { filename:entry for filename, entry in self.files.items() if filename in textgrids }
+        if len(stale) > 1 and self.workers > 1:
+            results = prefetched( indexTextGrid, stale, self.workers, ProcessPoolExecutor )
+        else:
+            results = ( (job, indexTextGrid(job)) for job in stale )
+        for (filename, textgridPath), entry in results:
+            self.files[ filename ] = entry
+        if changed or not self.postings:
+            self.buildPostings()
+        if changed:
+            self.version += 1
+            self.save()
+        return len(stale)
+
+    def buildPostings(self):
+        ''' group the frames of every file by (tier, label) '''
+        self.postings = {}
+        for filename, entry in self.files.items():
+            if entry == None:
+                continue
+            for tier, info in entry[ 'tiers' ].items():
+                index = np.asarray( info['index'], dtype=int )
+                labels = np.array( info['label'] + [''], dtype=object )[ index ]
+                for label in set( labels.tolist() ):
+                    if label == '':
+                        continue
+                    rows = np.flatnonzero( labels == label )
+                    self.postings.setdefault( (tier, label), [] ).append( (filename, rows, index[rows]) )
+
+    def save(self):
+        try:
+            with open( self.indexfile, 'w' ) as f:
+                json.dump( self.files, f )
+        except OSError as e:
+            warn( 'Unable to save index `%s` (%s)' % (self.indexfile, e) )
+
+    def getAspect(self, filename):
+        ''' width/height of the frames of a file (1.0 until it has been processed) '''
+        if filename not in self.aspects:
+            entry = next( ( entry for entry in self.data.get( 'files', [] ) if entry['name'] == filename ), {} )
+            aspect = getFrameAspect( entry, self.path )
+            if aspect == None:
+                return 1.0
+            self.aspects[ filename ] = aspect
+        return self.aspects[ filename ]
+
+    def getTiers(self):
+        return sorted( set( tier for tier, label in self.postings ) )
+
+    def getLabels(self, tier):
+        return sorted( label for t, label in self.postings if t == tier )
+
+    def query(self, trace, tier, label, n=None, files=None):
+        '''
+        returns a dict of arrays with one entry per traced frame of `trace` that
+        lies inside an interval labelled `label` on `tier`:
+            file, frame, time, interval (index on the tier), start, end (of the interval),
+            counts (points per frame), xy (all the points, stacked)
+        and, if n is given, points: an (frames,n,2) array of the contours resampled
+        to n points along their length (in pixels, see getAspect())
+        '''
+        traced = self.data.get( 'traces', {} ).get( trace, {} ).get( 'files', {} )
+        columns = { key:[] for key in ('file', 'frame', 'time', 'interval', 'start', 'end', 'counts') }
+        contours, aspects = [], []
+        for filename, rows, intervals in self.postings.get( (tier, label), [] ):
+            if ( files != None and filename not in files ) or filename not in traced:
+                continue
+            entry, frames = self.files[ filename ], traced[ filename ]
+            info = entry[ 'tiers' ][ tier ]
+            for row, interval in zip( rows.tolist(), intervals.tolist() ):
+                points = frames.get( entry['marks'][row], [] )
+                if len(points) == 0:
+                    continue
+                columns[ 'file' ].append( filename )
+                columns[ 'frame' ].append( int(entry['marks'][row]) )
+                columns[ 'time' ].append( entry['times'][row] )
+                columns[ 'interval' ].append( interval )
+                columns[ 'start' ].append( info['start'][interval] )
+                columns[ 'end' ].append( info['end'][interval] )
+                columns[ 'counts' ].append( len(points) )
+                contours.append( [ [pt['x'], pt['y']] for pt in points ] )
+                aspects.append( self.getAspect(filename) if n != None else 1.0 )
+        result = {
+            'file':np.array( columns['file'], dtype=str ),
+            'frame':np.array( columns['frame'], dtype=int ),
+            'time':np.array( columns['time'], dtype=float ),
+            'interval':np.array( columns['interval'], dtype=int ),
+            'start':np.array( columns['start'], dtype=float ),
+            'end':np.array( columns['end'], dtype=float ),
+            'counts':np.array( columns['counts'], dtype=int ),
+            'xy':np.array( [ pt for contour in contours for pt in contour ], dtype=float ).reshape(-1,2) }
+        if n != None:
+            # (single points are doubled up so that they resample to themselves)
+            contours = [ contour if len(contour) >= 2 else contour*2 for contour in contours ]
+            result[ 'points' ] = resampleContours( contours, n, np.array(aspects) ) if contours else np.zeros( (0, n, 2) )
+        return result
+
+class ContourStatistics(object):
+    '''
+    Mean contour and pointwise spread for each (trace, tier, label), i.e. over all
+    the traced frames of a trace lying inside intervals with a given label.
+
+    Contours are resampled to `n` points along their length (measured in pixels,
+    see TraceIndex.getAspect()) and accumulated into running sums (count, sum, and
+    sums of squares and cross-products), grouped with np.add.at, so update() only
+    has to resample the frames that were added or changed since the last call (and
+    subtract the ones that changed or went away).  Given the (trace, file, frame)
+    entries that were written since, it looks at nothing else.  The spread at each point is the standard deviation across the mean
+    contour, i.e. along its normal, which gives a band of mean +/- k*sd.
+
+    The frame -> interval mapping comes from a TraceIndex.
+    '''
+    def __init__(self, index, n=_RESAMPLE_POINTS):
+        self.index = index
+        self.n = n
+        self.groups = {} # (trace, tier, label) -> row of the accumulators
+        self.counts = np.zeros( 0 )
+        self.sums = np.zeros( (0, n, 2) )
+        self.squares = np.zeros( (0, n, 3) ) # xx, yy, xy
+        self.contributions = {} # (trace, file, frame) -> (fingerprint, rows, resampled points)
+        self.labelMaps = {} # file -> (index mtime, { frame: [ (tier, label), ... ] })
+
+    def getRow(self, group):
+        ''' accumulator row for a group, growing the arrays as needed '''
+        if group not in self.groups:
+            row = len( self.groups )
+            if row == len( self.counts ):
+                grow = max( 16, row )
+                self.counts = np.concatenate( [ self.counts, np.zeros(grow) ] )
+                self.sums = np.concatenate( [ self.sums, np.zeros( (grow, self.n, 2) ) ] )
+                self.squares = np.concatenate( [ self.squares, np.zeros( (grow, self.n, 3) ) ] )
+            self.groups[ group ] = row
+        return self.groups[ group ]
+
+    def getLabelMap(self, filename):
+        ''' { frame: [ (tier, label), ... ] } for the labelled intervals containing each frame of a file '''
+        entry = self.index.files.get( filename )
+        if entry == None:
+            return {}
+        if filename not in self.labelMaps or self.labelMaps[ filename ][0] != entry[ 'mtime' ]:
+            labelMap = { mark:[] for mark in entry['marks'] }
+            for tier, info in entry[ 'tiers' ].items():
+                for row, interval in enumerate( info['index'] ):
+                    if interval >= 0 and info['label'][ interval ] != '':
+                        labelMap[ entry['marks'][row] ].append( (tier, info['label'][interval]) )
+            self.labelMaps[ filename ] = ( entry['mtime'], labelMap )
+        return self.labelMaps[ filename ][1]
+
+    def accumulate(self, rows, shapes, sign):
+        ''' add (sign=1) or subtract (sign=-1) the (k,n,2) `shapes` to/from the accumulator `rows` '''
+        x, y = shapes[...,0], shapes[...,1]
+        np.add.at( self.counts, rows, sign )
+        np.add.at( self.sums, rows, sign * shapes )
+        np.add.at( self.squares, rows, sign * np.stack( [x*x, y*y, x*y], axis=-1 ) )
+
+    def getKeys(self):
+        ''' (trace, file, frame) of every traced frame, proposals aside '''
+        for trace, info in self.index.data.get( 'traces', {} ).items():
+            if 'proposalFor' in info:
+                continue
+            for filename, frames in info.get( 'files', {} ).items():
+                for frame, points in frames.items():
+                    if len(points) > 0:
+                        yield ( trace, filename, frame )
+
+    def update(self, keys=None):
+        '''
+        bring the statistics up to date with the metadata, looking only at the
+        (trace, file, frame) `keys` if given, or else at every traced frame; returns
+        the number of frames (re)added
+        '''
+        if keys == None:
+            keys = set( self.getKeys() ) | set( self.contributions )
+        traces = self.index.data.get( 'traces', {} )
+        added, removed = [], []
+        for key in keys:
+            trace, filename, frame = key
+            info = traces.get( trace, {} )
+            points = [] if 'proposalFor' in info else info.get( 'files', {} ).get( filename, {} ).get( frame, [] )
+            entry = self.index.files.get( filename )
+            groups = self.getLabelMap( filename ).get( frame, [] ) if len(points) > 0 and entry != None else []
+            if len(groups) == 0:
+                if key in self.contributions:
+                    removed.append( self.contributions.pop(key) )
+                continue
+            aspect = self.index.getAspect( filename )
+            fingerprint = hash( (entry['mtime'], aspect) + tuple( (pt['x'], pt['y']) for pt in points ) )
+            if key in self.contributions:
+                if self.contributions[ key ][0] == fingerprint:
+                    continue
+                removed.append( self.contributions.pop(key) )
+            rows = [ self.getRow( (trace,) + group ) for group in groups ]
+            added.append( (key, fingerprint, rows, [ [pt['x'], pt['y']] for pt in points ], aspect) )
+
+        if removed:
+            rows = np.concatenate( [ rows for fingerprint, rows, shape in removed ] )
+            shapes = np.concatenate( [ np.repeat( shape[None], len(rows), axis=0 ) for fingerprint, rows, shape in removed ] )
+            self.accumulate( rows.astype(int), shapes, -1 )
+        if added:
+            # (single points are doubled up so that they resample to themselves)
+            shapes = resampleContours( [ c if len(c) >= 2 else c*2 for key, fingerprint, rows, c, aspect in added ], self.n,
+                np.array( [ aspect for key, fingerprint, rows, c, aspect in added ] ) )
+            # (so that a frame traced right to left lines up with the others)
+            shapes, flipped = orientContours( shapes )
+            owners = np.concatenate( [ [i] * len(rows) for i, (key, fingerprint, rows, c, aspect) in enumerate(added) ] ).astype(int)
+            rows = np.concatenate( [ rows for key, fingerprint, rows, c, aspect in added ] ).astype(int)
+            self.accumulate( rows, shapes[ owners ], 1 )
+            for i, (key, fingerprint, rows, c, aspect) in enumerate( added ):
+                self.contributions[ key ] = ( fingerprint, np.array(rows), shapes[i] )
+        return len( added )
+
+    def get(self, trace, tier, label):
+        ''' returns (mean contour (n,2), sd across it (n,), number of frames), or None '''
+        row = self.groups.get( (trace, tier, label) )
+        if row == None or self.counts[ row ] < 1:
+            return None
+        count = self.counts[ row ]
+        mean = self.sums[ row ] / count
+        mx, my = mean[:,0], mean[:,1]
+        vxx = self.squares[ row, :, 0 ] / count - mx*mx
+        vyy = self.squares[ row, :, 1 ] / count - my*my
+        vxy = self.squares[ row, :, 2 ] / count - mx*my
+        nx, ny = getNormals( mean ).T
+        sd = np.sqrt( np.maximum( nx*nx*vxx + 2*nx*ny*vxy + ny*ny*vyy, 0 ) )
+        return mean, sd, int( round(count) )
+
+    def getBand(self, trace, tier, label, k=1.0):
+        ''' returns (mean, mean + k*sd, mean - k*sd) contours, or None '''
+        stats = self.get( trace, tier, label )
+        if stats == None:
+            return None
+        mean, sd, count = stats
+        offset = k * sd[:,None] * getNormals( mean )
+        return mean, mean + offset, mean - offset
+
+    def save(self, path):
+        ''' write `<trace>/<tier>/<label>/{mean,sd,count}` arrays to a .npz '''
+        arrays = {}
+        for trace, tier, label in sorted( self.groups ):
+            stats = self.get( trace, tier, label )
+            if stats != None:
+                mean, sd, count = stats
+                arrays[ '%s/%s/%s/mean' % (trace, tier, label) ] = mean
+                arrays[ '%s/%s/%s/sd' % (trace, tier, label) ] = sd
+                arrays[ '%s/%s/%s/count' % (trace, tier, label) ] = np.array( count )
+        np.savez_compressed( path, **arrays )
+
+class TracedFrameCounts(object):
+    '''
+    For every file, the number of traces with points on each of its frames
+    (proposal traces aside).  Built once from the metadata, then kept up to date
+    by MetadataModule.setTraceFrame() a frame at a time, so telling which frames
+    are traced never needs a pass over every trace
+    '''
+    def __init__(self, data):
+        self.counts = {} # filename -> { frame: number of traces with points on it }
+        for trace, info in data.get( 'traces', {} ).items():
+            if 'proposalFor' in info:
+                continue
+            for filename, frames in info.get( 'files', {} ).items():
+                counts = self.counts.setdefault( filename, {} )
+                for frame, points in frames.items():
+                    if len(points) > 0:
+                        counts[ frame ] = counts.get( frame, 0 ) + 1
+
+    def update(self, filename, frame, before, after):
+        '''
+        record one trace's points on a frame changing from `before` to `after`;
+        returns 1 if the frame just gained its first traced points, -1 if it just
+        lost its last ones, and 0 otherwise
+        '''
+        change = int( len(after) > 0 ) - int( len(before) > 0 )
+        if change == 0:
+            return 0
+        counts = self.counts.setdefault( filename, {} )
+        count = counts.get( frame, 0 ) + change
+        if count > 0:
+            counts[ frame ] = count
+        else:
+            counts.pop( frame, None )
+        return change if count == max( change, 0 ) else 0
+
+    def getTracedFrames(self, filename):
+        ''' the (string) frames of a file with at least one trace '''
+        return set( self.counts.get( filename, {} ) )
+
+    def getProgress(self, index):
+        '''
+        { filename: { tier: (traced, total) } }: the number of frames inside
+        labelled intervals of each tier, and how many of them are traced, using
+        the frame alignment of a TraceIndex
+        '''
+        progress = {}
+        for filename, entry in index.files.items():
+            if entry == None:
+                continue
+            traced = np.array( [ mark in self.counts.get(filename, {}) for mark in entry['marks'] ], dtype=bool )
+            progress[ filename ] = {}
+            for tier, info in entry[ 'tiers' ].items():
+                labels = np.array( info['label'] + [''], dtype=object )[ np.asarray( info['index'], dtype=int ) ]
+                labelled = labels != ''
+                progress[ filename ][ tier ] = ( int(np.count_nonzero( traced & labelled )), int(np.count_nonzero( labelled )) )
+        return progress
+
+class TraceQA(object):
+    '''
+    Temporal quality checks for the frames of one trace in one file.  Contours
+    are resampled to `n` points along their length so that frames can be compared
+    point by point.  The displacement between consecutive traced frames is the
+    mean point distance per frame of gap.  A frame's score is the smaller of its
+    displacements in and out (so a single bad frame scores high, but its neighbours
+    don't).  Frames whose robust z-score (median / MAD) exceeds `threshold` are
+    flagged.  smooth() applies a running median across time over runs of
+    consecutive frames.  `aspect` is the width/height of the frames, see
+    resampleContours().
+    '''
+    def __init__(self, n=_QA_POINTS, threshold=_QA_OUTLIER_THRESHOLD, window=_QA_SMOOTHING_WINDOW, aspect=1.0):
+        self.n = n
+        self.threshold = threshold
+        self.window = window
+        self.aspect = aspect
+
+    def resample(self, frames):
+        '''
+        {frame: crosshairs} -> (frame numbers, (frames,n,2) array, mask of the
+        contours that were reversed so that they all run left to right)
+        '''
+        trace, filename, numbers, shapes = resampleTraceFile( (None, None, frames, self.n, 0, self.aspect) )
+        shapes, flipped = orientContours( shapes )
+        return numbers, shapes, flipped
+
+    def getScores(self, numbers, shapes):
+        ''' per-frame displacement scores (nan for a frame with no traced neighbours) '''
+        if len(numbers) < 2:
+            return np.full( len(numbers), np.nan )
+        moved = np.linalg.norm( np.diff(shapes, axis=0), axis=2 ).mean( axis=1 ) / np.diff( numbers )
+        into = np.concatenate( [ [np.nan], moved ] )
+        out = np.concatenate( [ moved, [np.nan] ] )
+        return np.fmin( into, out )
+
+    def check(self, frames):
+        ''' returns (frame numbers, scores, boolean mask of flagged frames) '''
+        numbers, shapes, flipped = self.resample( frames )
+        scores = self.getScores( numbers, shapes )
+        flagged = np.zeros( len(numbers), dtype=bool )
+        if np.count_nonzero( ~np.isnan(scores) ) >= 3:
+            median = np.nanmedian( scores )
+            mad = np.nanmedian( np.abs(scores - median) )
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = 0.6745 * ( scores - median ) / max( mad, 1e-12 )
+            flagged = np.nan_to_num( z ) > self.threshold
+        return numbers, scores, flagged
+
+    def smooth(self, frames):
+        '''
+        returns a {frame: crosshairs} dict with each contour replaced by the running
+        median (across time) of its run of consecutive traced frames, resampled
+        back to its original number of points
+        '''
+        numbers, shapes, flipped = self.resample( frames )
+        if len(numbers) == 0:
+            return {}
+        smoothed = np.empty_like( shapes )
+        breaks = np.flatnonzero( np.diff(numbers) != 1 ) + 1
+        for run in np.split( np.arange(len(numbers)), breaks ):
+            smoothed[ run ] = ndimage.median_filter( shapes[run], size=(self.window, 1, 1), mode='nearest' )
+        result = {}
+        # (reversed contours are turned back, to keep each frame's point order)
+        smoothed = np.where( flipped[:,None,None], smoothed[:,::-1], smoothed )
+        for number, shape in zip( numbers.tolist(), smoothed ):
+            count = len( frames[ str(number) ] )
+            result[ str(number) ] = [ { 'x':x, 'y':y } for x, y in resampleContour(shape, count, self.aspect).tolist() ]
+        return result
+
+class FrameCache(object):
+    '''
+    Least-recently-used cache of decoded ultrasound frames (greyscale float arrays
+    scaled to [0,1]) and their edge maps, so that tracing helpers don't have to
+    re-read and re-filter the processed PNGs.  Safe to fill from worker threads.
+    '''
+    def __init__(self, app, size=_FRAME_CACHE_SIZE):
+        self.app = app
+        self.size = size
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        ''' return the cached value for key, calling compute() on a miss '''
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end( key )
+                return self.items[ key ]
+        value = compute() # outside the lock so that workers decode in parallel
+        with self.lock:
+            self.items[ key ] = value
+            while len(self.items) > self.size:
+                self.items.popitem( last=False )
+        return value
+
+    def getImage(self, frame, _fileid=None):
+        ''' returns the frame as an (h,w) float32 array, or None if it isn't processed '''
+        fileid = self.app.currentFID if _fileid==None else _fileid
+        def load():
+            path = self.app.Data.getPreprocessedDicom( frame, fileid )
+            if path == None or not os.path.exists(path):
+                return None
+            return np.asarray( Image.open(path).convert('L'), dtype=np.float32 ) / 255
+        return self.get( (fileid, str(frame), 'image'), load )
+
+    def getEdges(self, frame, _fileid=None):
+        '''
+        returns the gradient magnitude of the (gaussian-smoothed) frame, scaled
+        to [0,1], or None if the frame isn't processed
+        '''
+        fileid = self.app.currentFID if _fileid==None else _fileid
+        def compute():
+            image = self.getImage( frame, fileid )
+            if image is None:
+                return None
+            smooth = ndimage.gaussian_filter( image, _EDGE_SMOOTHING_SIGMA )
+            edges = np.hypot( ndimage.sobel(smooth, axis=0), ndimage.sobel(smooth, axis=1) )
+            peak = edges.max()
+            return edges / peak if peak > 0 else edges
+        return self.get( (fileid, str(frame), 'edges'), compute )
+
+    def getForce(self, frame, _fileid=None):
+        '''
+        returns the (fy, fx) gradient of the further-smoothed edge map, which
+        points towards the nearest strong edge, or None if the frame isn't processed
+        '''
+        fileid = self.app.currentFID if _fileid==None else _fileid
+        def compute():
+            edges = self.getEdges( frame, fileid )
+            if edges is None:
+                return None
+            return tuple( np.gradient( ndimage.gaussian_filter(edges, _SNAKE_FORCE_SIGMA) ) )
+        return self.get( (fileid, str(frame), 'force'), compute )
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+class ContourPropagator(object):
+    '''
+    Carries a contour traced on one frame forward onto following frames.  On each
+    frame, every point searches along its contour normal (up to `radius` pixels
+    either way) for the strongest edge, with a small penalty for moving further
+    (`stiffness`); the offsets are median-filtered so neighbouring points move
+    together, and the fitted contour seeds the search on the next frame.
+
+    Points must be in contour order, and are given and returned in "true" (0-1)
+    coordinates.  The edge maps are computed by a pool of worker threads running
+    ahead of the (vectorized, and therefore cheap) fitting.
+    '''
+    def __init__(self, cache, radius=_PROPAGATE_SEARCH_RADIUS, stiffness=_PROPAGATE_STIFFNESS, workers=_WORKER_COUNT):
+        self.cache = cache
+        self.radius = radius
+        self.stiffness = stiffness
+        self.workers = workers
+
+    def fit(self, points, edges):
+        ''' fit an (n,2) array of pixel (x,y) points to the nearby edges '''
+        offsets = np.arange( -self.radius, self.radius+1, dtype=float )
+        normals = getNormals( points )
+        # (n, k, 2) candidate positions for each point
+        candidates = points[:,None,:] + offsets[None,:,None] * normals[:,None,:]
+        strength = ndimage.map_coordinates( edges,
+            [ candidates[...,1].ravel(), candidates[...,0].ravel() ],
+            order=1, mode='nearest' ).reshape( candidates.shape[:2] )
+        strength -= self.stiffness * np.abs( offsets )[None,:]
+        peak = np.clip( np.argmax(strength, axis=1), 1, len(offsets)-2 )
+        # sub-pixel peak from a parabola through the best sample and its neighbours
+        rows = np.arange( len(points) )
+        left, mid, right = strength[rows,peak-1], strength[rows,peak], strength[rows,peak+1]
+        curvature = left - 2*mid + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = np.where( curvature < 0, 0.5 * (left - right) / curvature, 0 )
+        best = offsets[ peak ] + np.clip( shift, -0.5, 0.5 )
+        if len(best) >= 3:
+            best = ndimage.median_filter( best, size=3, mode='nearest' )
+        moved = points + best[:,None] * normals
+        h, w = edges.shape
+        moved[:,0] = np.clip( moved[:,0], 0, w-1 )
+        moved[:,1] = np.clip( moved[:,1], 0, h-1 )
+        return moved
+
+    def propagate(self, points, frames, _fileid=None):
+        '''
+        generator yielding (frame, points) for each of `frames` in turn, stopping
+        early at the first frame that hasn't been processed
+        '''
+        points = np.asarray( points, dtype=float ).reshape(-1,2)
+        if len(points) < 2:
+            return
+        fileid = self.cache.app.currentFID if _fileid==None else _fileid
+        load = lambda frame: self.cache.getEdges( frame, fileid )
+        for frame, edges in prefetched( load, frames, self.workers ):
+            if edges is None:
+                return
+            size = np.array( edges.shape[::-1], dtype=float ) # (w, h)
+            points = self.fit( points * size, edges ) / size
+            yield frame, points
+
+class ActiveContour(object):
+    '''
+    Snaps a (noisy, hand-placed) open contour onto nearby edges with a Kass-style
+    snake.  Internal energy (elasticity `alpha`, rigidity `beta`) is handled
+    implicitly through the precomputed inverse of the pentadiagonal system
+    (A + gamma*I), and the image force (the gradient of the smoothed edge map,
+    weighted by `kappa`) explicitly, so each iteration is one bilinear lookup and
+    one small matrix product for all points at once.  Each step is projected onto
+    the contour normals, so points don't slide along the edge or off its ends.
+
+    Points are given and returned in "true" (0-1) coordinates.
+    '''
+    def __init__(self, cache, alpha=_SNAKE_ALPHA, beta=_SNAKE_BETA, gamma=_SNAKE_GAMMA,
+            kappa=_SNAKE_KAPPA, iterations=_SNAKE_ITERATIONS, workers=_WORKER_COUNT):
+        self.cache = cache
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.kappa = kappa
+        self.iterations = iterations
+        self.workers = workers
+        self.inverses = {} # number of points -> (A + gamma*I)^-1
+
+    def getInverse(self, n):
+        ''' (A + gamma*I)^-1 for an open contour of n points (free ends) '''
+        if n not in self.inverses:
+            d1 = np.diff( np.eye(n), n=1, axis=0 )
+            d2 = np.diff( np.eye(n), n=2, axis=0 )
+            A = self.alpha * d1.T.dot(d1) + self.beta * d2.T.dot(d2)
+            self.inverses[ n ] = np.linalg.inv( A + self.gamma * np.eye(n) )
+        return self.inverses[ n ]
+
+    def fit(self, points, force):
+        ''' iterate an (n,2) array of pixel (x,y) points under the (fy,fx) force field '''
+        fy, fx = force
+        h, w = fx.shape
+        inverse = self.getInverse( len(points) )
+        for i in range(self.iterations):
+            coords = [ points[:,1], points[:,0] ]
+            pull = np.stack( [
+                ndimage.map_coordinates( fx, coords, order=1, mode='nearest' ),
+                ndimage.map_coordinates( fy, coords, order=1, mode='nearest' ) ], axis=1 )
+            moved = inverse.dot( self.gamma * points + self.kappa * pull )
+            # only move across the contour, so that points don't bunch up or slide off the ends
+            normals = getNormals( points )
+            moved = points + np.sum( (moved - points) * normals, axis=1, keepdims=True ) * normals
+            moved[:,0] = np.clip( moved[:,0], 0, w-1 )
+            moved[:,1] = np.clip( moved[:,1], 0, h-1 )
+            converged = np.abs( moved - points ).max() < 1e-2
+            points = moved
+            if converged:
+                break
+        return points
+
+    def refine(self, points, frame, _fileid=None):
+        ''' refine one contour on one frame; returns None if the frame isn't processed '''
+        points = np.asarray( points, dtype=float ).reshape(-1,2)
+        force = self.cache.getForce( frame, _fileid )
+        if force is None or len(points) < 3:
+            return None
+        size = np.array( force[0].shape[::-1], dtype=float ) # (w, h)
+        return self.fit( points * size, force ) / size
+
+    def refineFrames(self, contours, _fileid=None):
+        '''
+        generator yielding (frame, refined points) for a {frame: points} dict,
+        with the force fields computed ahead by a pool of worker threads
+        '''
+        fileid = self.cache.app.currentFID if _fileid==None else _fileid
+        load = lambda frame: self.cache.getForce( frame, fileid )
+        for frame, force in prefetched( load, sorted(contours, key=int), self.workers ):
+            points = np.asarray( contours[frame], dtype=float ).reshape(-1,2)
+            if force is None or len(points) < 3:
+                continue
+            size = np.array( force[0].shape[::-1], dtype=float )
+            yield frame, self.fit( points * size, force ) / size
+
 class MetadataModule(object):
     def __init__(self, app, path):
         '''
@@ -454,6 +2322,22 @@ class MetadataModule(object):
 
         self.mdfile = os.path.join( self.path, 'metadata.json' )
 
+        # write() calls are postponed while inside a transaction()
+        self.deferred = 0
+        self.dirty = False
+
+        # built on first use, see getTraceIndex(), getContourStatistics() and getTracedFrameCounts()
+        self.traceIndex = None
+        self.contourStatistics = None
+        self.tracedFrameCounts = None
+        self.revision = 0 # bumped on every write()
+        self.changedFrames = None # (trace, file, frame) set since the statistics were updated (None: all of them)
+        self.statisticsVersion = None # index version of the last statistics update
+
+        # compiled copies of the TextGrids, see TextGridCache
+        self.textgridCache = TextGridCache( self.path )
+        self.textgridWriter = TextGridWriter( self.textgridCache )
+
         # either load up existing metadata
         if os.path.exists( self.mdfile ):
             print( "   - found metadata file: `%s`" % self.mdfile )
@@ -580,9 +2464,64 @@ class MetadataModule(object):
         # print()
         # print(self.data, 'write')
         # print()
+        if _mdfile==None:
+            self.revision += 1
+        if _mdfile==None and self.deferred > 0:
+            self.dirty = True
+            return
         mdfile = self.mdfile if _mdfile==None else _mdfile
         with open( mdfile, 'w' ) as f:
             json.dump( self.data, f, indent=3 )
+        if _mdfile==None:
+            self.dirty = False
+
+    def getTraceIndex(self):
+        ''' the project-wide TraceIndex (see refreshTraceIndex()) '''
+        if self.traceIndex == None:
+            self.traceIndex = TraceIndex( self.data, self.path )
+        return self.traceIndex
+
+    def refreshTraceIndex(self):
+        ''' bring the TraceIndex (if it's been built) up to date with any TextGrid changes '''
+        if self.traceIndex != None:
+            self.traceIndex.refresh()
+
+    def getContourStatistics(self):
+        ''' per-(trace, tier, label) ContourStatistics, updated with the frames set since the last call '''
+        index = self.getTraceIndex()
+        if self.contourStatistics == None:
+            self.contourStatistics = ContourStatistics( index )
+        if self.changedFrames == None or self.statisticsVersion != index.version:
+            self.contourStatistics.update()
+        elif len(self.changedFrames) > 0:
+            self.contourStatistics.update( self.changedFrames )
+        self.changedFrames = set()
+        self.statisticsVersion = index.version
+        return self.contourStatistics
+
+    def getTracedFrameCounts(self):
+        ''' the TracedFrameCounts of the project (rebuilt after traces are added, renamed or removed) '''
+        if self.tracedFrameCounts == None:
+            self.tracedFrameCounts = TracedFrameCounts( self.data )
+        return self.tracedFrameCounts
+
+    def getProgress(self):
+        ''' traced/total labelled frames per file and tier, see TracedFrameCounts.getProgress() '''
+        return self.getTracedFrameCounts().getProgress( self.getTraceIndex() )
+
+    @contextlib.contextmanager
+    def transaction(self):
+        '''
+        postpone write() until the end of the block (transactions can nest), so a
+        batch of edits costs a single metadata write
+        '''
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if self.deferred == 0 and self.dirty:
+                self.write()
 
     def getFilenames( self ):
         '''
@@ -590,12 +2529,20 @@ class MetadataModule(object):
         '''
         return [ f['name'] for f in self.data['files'] ]
 
-    def getPreprocessedDicom( self, _frame=None ):
+    def getFrameAspect( self, _fileid=None ):
+        '''
+        Width/height of the frames of a file (1.0 until it has been processed)
+        '''
+        fileid = self.app.currentFID if _fileid==None else _fileid
+        aspect = getFrameAspect( self.data[ 'files' ][ fileid ], self.path )
+        return 1.0 if aspect == None else aspect
+
+    def getPreprocessedDicom( self, _frame=None, _fileid=None ):
         '''
         Gets preprocessed (.dicom->.png) picture data for a given frame
         '''
         frame = self.app.frame if _frame==None else _frame #int(_frame)-1
-        processed = self.getFileLevel( 'processed' )
+        processed = self.getFileLevel( 'processed', _fileid )
         try:
             return self.unrelativize(processed[str(frame)])
         except: # catches missing frames and missing preprocessed data
@@ -615,6 +2562,9 @@ class MetadataModule(object):
         Set directory-level metadata
         '''
         self.data[ key ] = value
+        if key == 'traces':
+            self.tracedFrameCounts = None
+            self.changedFrames = None
         self.write()
 
     def getFileLevel( self, key, _fileid=None ):
@@ -698,26 +2648,61 @@ class MetadataModule(object):
         Returns a list of the crosshairs for the given trace at the current file
         and current frame
         '''
-        filename = self.getCurrentFilename()
-        frame    = str(self.app.frame)# if _frame==None else str(_frame)
+        return self.getTraceFrame( trace, self.getCurrentFilename(), self.app.frame )
+
+    def getTraceFrame( self, trace, filename, frame ):
+        '''
+        Returns a list of the crosshairs for the given trace, file, and frame
+        '''
         try:
-            return self.data[ 'traces' ][ trace ][ 'files' ][ filename ][ frame ]
+            return self.data[ 'traces' ][ trace ][ 'files' ][ filename ][ str(frame) ]
         except KeyError:
             return []
 
+    def getTraceFrames( self, trace, filename, frames ):
+        '''
+        Returns a {frame: crosshairs} dict for several frames of the given trace
+        and file at once (missing frames map to [])
+        '''
+        try:
+            traced = self.data[ 'traces' ][ trace ][ 'files' ][ filename ]
+        except KeyError:
+            traced = {}
+        return { frame:traced.get( str(frame), [] ) for frame in frames }
+
     def setCurrentTraceCurrentFrame( self, crosshairs ):
         '''
         Writes an array of the current crosshairs to the metadata dictionary at
         the current trace, current file, and current frame
         '''
-        trace = self.app.Trace.getCurrentTraceName()
-        filename = self.getCurrentFilename()
-        frame = self.app.frame
+        self.setTraceCurrentFrame( self.app.Trace.getCurrentTraceName(), crosshairs )
+
+    def setTraceCurrentFrame( self, trace, crosshairs ):
+        '''
+        Writes an array of crosshairs to the metadata dictionary at the given
+        trace, current file, and current frame
+        '''
+        self.setTraceFrame( trace, self.getCurrentFilename(), self.app.frame, crosshairs )
+
+    def setTraceFrame( self, trace, filename, frame, crosshairs ):
+        '''
+        Writes an array of crosshairs to the metadata dictionary at the given
+        trace, file, and frame (batches of these go inside a transaction())
+        '''
+        counts = self.getTracedFrameCounts() # (before the change, in case it's built now)
+        before = self.getTraceFrame( trace, filename, frame )
         if trace not in self.data[ 'traces' ]:
             self.data[ 'traces' ][ trace ] = { 'files':{}, 'color':None }
         if filename not in self.data[ 'traces' ][ trace ][ 'files' ]:
             self.data[ 'traces' ][ trace ][ 'files' ][ filename ] = {}
         self.data[ 'traces' ][ trace ][ 'files' ][ filename ][ str(frame) ] = crosshairs
+        if self.changedFrames != None:
+            self.changedFrames.add( (trace, filename, str(frame)) )
+        # keep the traced frame counters (and so the tier labels) up to date
+        if 'proposalFor' not in self.data[ 'traces' ][ trace ]:
+            change = counts.update( filename, str(frame), before, crosshairs )
+            if change != 0 and filename == self.getCurrentFilename():
+                self.app.TextGrid.setFrameTraced( str(frame), change > 0 )
         # print('line 701')
         self.write()
 
@@ -733,6 +2718,126 @@ class MetadataModule(object):
         except KeyError:
             return []
 
+class CanvasIndex(object):
+    '''
+    Sorted x-coords of the things drawn on a canvas (rebuilt on every redraw), so
+    that hit-testing is a binary search rather than a Tcl round-trip per item.
+    `items` holds whatever the queries should return for each position (item ids,
+    marks, ...), and `rights` the right edges if the things are cells rather than
+    ticks
+    '''
+    def __init__(self, x=None, items=None, rights=None):
+        self.x = np.zeros(0) if x is None else np.asarray(x, dtype=float)
+        self.items = [] if items is None else items
+        self.rights = None if rights is None else np.asarray(rights, dtype=float)
+
+    def __len__(self):
+        return len(self.x)
+
+    def nearest(self, x, radius=None):
+        ''' the item closest to x (None if there's none within `radius` pixels) '''
+        i = int( np.searchsorted(self.x, x) )
+        candidates = [ j for j in (i-1, i) if 0 <= j < len(self) ]
+        if len(candidates) == 0:
+            return None
+        j = min( candidates, key=lambda j: abs(self.x[j]-x) )
+        if radius != None and abs(self.x[j]-x) > radius:
+            return None
+        return self.items[j]
+
+    def containing(self, x):
+        '''
+        the cell containing x (one exactly on a boundary belongs to the cell on its
+        right); x beyond either end gives the first/last cell
+        '''
+        if len(self) == 0:
+            return None
+        i = int( np.searchsorted(self.rights, x, side='right') )
+        return self.items[ min(i, len(self)-1) ]
+
+class TimelineView(object):
+    '''
+    What frames_canvas currently shows, kept numerically: the range of frame
+    positions on screen, the tick drawn for each of them, and the fill each tick
+    has.  Checking whether a frame is in view is then a comparison, and
+    repainting only touches the ticks whose fill changes
+    '''
+    def __init__(self):
+        self.first = 0
+        self.last = 0 # frame positions [first, last) are on screen
+        self.ticks = np.zeros(0, dtype=int) # the tick item of each of them
+        self.begins = np.zeros(0, dtype=int) # offsets (from first) where a new tick starts
+        self.base = {} # tick -> fill when it's neither current nor selected
+        self.fills = {} # tick -> fill it has now
+        self.highlighted = set() # ticks whose fill isn't their base fill
+        self.revision = None # Data revision the base fills were worked out at
+        self.selection = None # (selected item, ticks of its frames)
+
+    def reset(self, first, last, ticks, begins, base, revision):
+        self.first = first
+        self.last = last
+        self.ticks = np.repeat( ticks, np.diff(np.append(begins, last-first)) ) if len(ticks) else np.zeros(0, dtype=int)
+        self.begins = begins
+        self.base = dict( base )
+        self.fills = dict( base )
+        self.highlighted = set()
+        self.revision = revision
+        self.selection = None
+
+    def isVisible(self, position):
+        return position != None and self.first <= position < self.last
+
+    def getTick(self, position):
+        if self.isVisible(position):
+            return int( self.ticks[ position-self.first ] )
+        return None
+
+    def getTicks(self, positions):
+        ''' the set of ticks drawn for some frame positions (those on screen) '''
+        positions = np.asarray( positions, dtype=int )
+        positions = positions[ (self.first <= positions) & (positions < self.last) ]
+        return set( self.ticks[ positions-self.first ].tolist() )
+
+    def paint(self, canvas, fills):
+        ''' give ticks new fills ({tick: fill}), skipping those that already have them '''
+        for tick, fill in fills.items():
+            if self.fills.get(tick) != fill:
+                canvas.itemconfig(tick, fill=fill)
+                self.fills[tick] = fill
+        self.highlighted = ( self.highlighted | set(fills) ) - { tick for tick in fills if fills[tick] == self.base[tick] }
+
+class ItemPool(object):
+    '''
+    Canvas items of one kind, reused across redraws instead of being deleted and
+    recreated: call start(), take items with next() (they're created as needed,
+    so their ids stay in creation order), then park() to hide the ones that
+    weren't used this time
+    '''
+    def __init__(self, canvas, create, park):
+        self.canvas = canvas
+        self.create = create # -> item id, or tuple of item ids
+        self.parking = park # coords that keep an item out of the way
+        self.items = []
+        self.used = 0
+        self.shown = 0
+
+    def start(self):
+        self.used = 0
+
+    def next(self):
+        if self.used == len(self.items):
+            self.items.append( self.create() )
+        item = self.items[ self.used ]
+        self.used += 1
+        return item
+
+    def park(self):
+        for items in self.items[ self.used:self.shown ]:
+            for item, coords in zip( items if isinstance(items, tuple) else (items,), self.parking ):
+                self.canvas.coords( item, *coords )
+                self.canvas.itemconfig( item, state='hidden', tags=() )
+        self.shown = self.used
+
 class TextGridModule(object):
     '''
     Manages all the widgets related to TextGrid files, including the tier name
@@ -749,7 +2854,14 @@ class TextGridModule(object):
         self.canvas_frame = Frame(self.app.BOTTOM)#, padx=self.label_padx)
         self.frame.grid( row=1, column=0, sticky=NE)
         self.canvas_frame.grid(row=1, column=1 )
-        self.TextGrid = None
+        self.TextGrid = None # the textgrid lib object, only built when needed (see getTextGrid())
+        self.model = None # TextGridModel
+        self.intervalItems = {} # tier canvas -> { text item: interval index }
+        self.selectedSpan = None # (start, end) ticks of a selection made on the spectrogram
+        self.pools = {} # canvas -> ItemPool, see fillCanvases()
+        self.canvasIndex = {} # tier canvas/frames_canvas -> CanvasIndex of its intervals/ticks
+        self.frameIndex = CanvasIndex() # the marks of the frames on frames_canvas, by x-coord
+        self.view = TimelineView()
         self.selectedTier = StringVar()
         self.tg_zoom_factor = 1.5
         self.canvas_width=800
@@ -757,10 +2869,15 @@ class TextGridModule(object):
         self.collapse_height=15
         self.selectedIntvlFrames = []
         self.selectedItem = None
-        self.start = 0
-        self.end = 0
+        self.flaggedFrames = [] # frames flagged by TraceQA, marked on frames_canvas
+        self.progress = None # TracedIntervalCounts, see getProgress()
+        self.progressSource = None # the (TracedFrameCounts, frame tier) it was built from
+        self.boundaryDrag = None # [canvas, tier name, boundary, drag line, new time] while a boundary is dragged
+        self.timeline = Timeline(self.canvas_width) # the visible window, shared with Spectrogram & Playback
         self.current = 0
         self.frame_shift = DoubleVar()
+        self.pendingShift = None # (fileid, shift, path, model) not written yet, see shiftFrames()
+        self.shiftAfterId = None
 
         self.startup()
 
@@ -813,15 +2930,15 @@ class TextGridModule(object):
             # print(filename)
             if filename:
                 try:
-                    # try to load up our TextGrid using the textgrid lib
-                    self.TextGrid = TextGrid.fromFile( self.app.Data.unrelativize(filename) )
+                    # try to load up our TextGrid
+                    self.loadTextGrid( filename )
                     # reset default Label to actually be useful
                     # self.TkWidgets = [{ 'label':Label(self.frame, text="TextGrid tiers:") }]
                     self.TkWidgets = []
                     # iterate the tiers
                     self.frameTierName = self.getFrameTierName()
-                    self.app.frames = len(self.TextGrid.getFirst(self.frameTierName))
-                    for tier in self.TextGrid.getNames():
+                    self.app.frames = len(self.model.frameTier)
+                    for tier in self.model.getNames():
                         if tier != self.frameTierName and tier != self.frameTierName + '.original':
                             # make some widgets for each tier
                             tierWidgets = self.makeTierWidgets( tier )
@@ -832,9 +2949,9 @@ class TextGridModule(object):
                     #put items on canvases
                     self.fillCanvases()
                     #calculate first and last frames
-                    self.firstFrame = int(self.TextGrid.getFirst(self.frameTierName)[0].mark) + 1
+                    self.firstFrame = int(self.model.getFrameMark(0)) + 1
                     self.startFrame = self.firstFrame
-                    self.lastFrame = int(self.TextGrid.getFirst(self.frameTierName)[-1].mark) + 1
+                    self.lastFrame = int(self.model.getFrameMark(-1)) + 1
                     self.endFrame = self.lastFrame
                 except:
                     pass
@@ -853,8 +2970,10 @@ class TextGridModule(object):
         #     if 'frames' in tierWidgets:
         #         tierWidgets['frames-label'].config(width=self.app.LEFT.winfo_width())
         # print(self.pp)
+        self.writeFrameShift() # before we move on to another file
         self.selectedIntvlFrames = []
         self.selectedItem = None
+        self.flaggedFrames = []
         #destroy
         # for wframe in [self.frame, self.canvas_frame]:
         #     for child in wframe.winfo_children():
@@ -867,22 +2986,21 @@ class TextGridModule(object):
             # print(filename)
             if filename:
                 try:
-                    # try to load up our TextGrid using the textgrid lib
-                    self.TextGrid = TextGrid.fromFile( self.app.Data.unrelativize(filename) )
+                    # try to load up our TextGrid
+                    self.loadTextGrid( filename )
                     # reset default Label to actually be useful
                     # self.TkWidgets = [{ 'label':Label(self.frame, text="TextGrid tiers:") }]
                     # self.TkWidgets = []
                     # iterate the tiers
                     self.frameTierName = self.getFrameTierName()
-                    self.app.frames = len(self.TextGrid.getFirst(self.frameTierName))
+                    self.app.frames = len(self.model.frameTier)
                     # for tier in self.TextGrid.getNames():
                     #     if tier != self.frameTierName and tier != self.frameTierName + '.original':
                     #         # make some widgets for each tier
                     #         tierWidgets = self.makeTierWidgets( tier )
                     #         self.TkWidgets.append( tierWidgets )
-                    self.start = self.TextGrid.minTime
-                    self.end = self.TextGrid.maxTime
-                    self.current = self.TextGrid.getFirst(self.frameTierName)[self.app.frame-1].time
+                    self.timeline.reset(self.model.minTime, self.model.maxTime)
+                    self.current = self.model.getFrameTime(self.app.frame)
                     #make other widgets
                     # self.makeFrameWidget()
                     #reset offset
@@ -895,9 +3013,9 @@ class TextGridModule(object):
                     #put items on canvases
                     self.fillCanvases()
                     #calculate first and last frames
-                    self.firstFrame = int(self.TextGrid.getFirst(self.frameTierName)[0].mark) + 1
+                    self.firstFrame = int(self.model.getFrameMark(0)) + 1
                     self.startFrame = self.firstFrame
-                    self.lastFrame = int(self.TextGrid.getFirst(self.frameTierName)[-1].mark) + 1
+                    self.lastFrame = int(self.model.getFrameMark(-1)) + 1
                     self.endFrame = self.lastFrame
                 except:
                     pass
@@ -906,53 +3024,177 @@ class TextGridModule(object):
 
     def shiftFrames(self):
         '''
-        Replicate original TextGrid point tier (renamed [tiername].original)
-        Shift points on TextGrid tier in accordance with self.frame_shift
+        Shift points on TextGrid tier in accordance with self.frame_shift (see TextGridModel.setFrameOffset())
             Shift value is relative to 0, i.e. inputting the same shift amount a second time will not change the shift
-        Redisplay shifted points
+        Redisplay shifted points straight away; the TextGrid and metadata are only
+        written once the shift has stayed put for a moment (see writeFrameShift())
         '''
         shift = self.frame_shift.get()
         if type(shift) == float:
-            self.app.Data.setFileLevel( 'offset', shift )
-            # diff = shift - self.app.Data.data['offset']
-            originalTier = self.TextGrid.getFirst(self.frameTierName+'.original')
-            if originalTier: pass
-            else:
-                orig = copy.deepcopy(self.TextGrid.getFirst(self.frameTierName))
-                orig.name += '.original'
-                self.TextGrid.append(orig)
-                originalTier = self.TextGrid.getFirst(self.frameTierName+'.original')
-
-            oldTier = self.TextGrid.getFirst(self.frameTierName)
-            allPoints = oldTier[:]
-            for point in allPoints:
-                oldTier.removePoint(point)
-
-            for point in originalTier:
-                new_time = point.time + decimal.Decimal(shift/1000) ## NOTE: currently in ms
-                if self.TextGrid.minTime <= new_time <= self.TextGrid.maxTime:
-                    self.TextGrid.getFirst(self.frameTierName).add(new_time, point.mark)
-
-            # self.app.frames = len(self.TextGrid.getFirst(self.frameTierName))            #FIXME I feel like I shouldn't have to run the getFirst function every time, but I'm not sure when I have to go back to the original textgrid, and when I can just use a variable...
-            self.firstFrame = int(self.TextGrid.getFirst(self.frameTierName)[0].mark) + 1
-            self.lastFrame = int(self.TextGrid.getFirst(self.frameTierName)[-1].mark) + 1
-            self.app.Data.data['offset'] = shift
-            # self.frame_shift.set(shift)
-            self.app.Data.write()
-            # newTier.write(self.TextGrid.getFirst(self.frameTierName))
+            self.model.setFrameOffset( int(round(shift*_TEXTGRID_TICKS/1000)) ) ## NOTE: currently in ms
+            self.TextGrid = None # rebuilt from self.model when needed
+            self.firstFrame = int(self.model.getFrameMark(0)) + 1
+            self.lastFrame = int(self.model.getFrameMark(-1)) + 1
             self.fillCanvases()
-            self.TextGrid.write(self.app.Data.unrelativize(self.app.Data.getFileLevel( '.TextGrid' )))
 
+            path = self.app.Data.unrelativize(self.app.Data.getFileLevel( '.TextGrid' ))
+            self.pendingShift = ( self.app.currentFID, shift, path, self.model )
+            if self.shiftAfterId != None:
+                self.app.after_cancel( self.shiftAfterId )
+            self.shiftAfterId = self.app.after( _FRAME_SHIFT_WRITE_DELAY, self.writeFrameShift )
 
         #except ValueError:
         else:
             print('Not a float!')
 
+    def writeFrameShift(self):
+        '''
+        Save the last frame shift (if it hasn't been saved yet): the offset goes
+        into the metadata, and the shifted TextGrid is written in the background
+        '''
+        if self.shiftAfterId != None:
+            self.app.after_cancel( self.shiftAfterId )
+            self.shiftAfterId = None
+        if self.pendingShift == None:
+            return
+        fileid, shift, path, model = self.pendingShift
+        self.pendingShift = None
+        self.app.Data.data['offset'] = shift
+        self.app.Data.setFileLevel( 'offset', shift, _fileid=fileid )
+        self.app.Data.textgridWriter.write( path, model.arrays ) # (including any edits since)
+
+    def getBoundaryNear(self, canvas, x):
+        '''
+        index i of the boundary (between intervals i and i+1) of the tier on
+        `canvas` within _BOUNDARY_GRAB_RADIUS pixels of x, or None
+        '''
+        tier = self.model.tiers[self.getTierName(canvas)]
+        ticks = self.timeline.fromX(x)
+        i = int(np.searchsorted(tier.ends, ticks))
+        candidates = [ j for j in (i-1, i) if 0 <= j < len(tier)-1 and self.timeline.start < tier.ends[j] < self.timeline.end ]
+        if not candidates:
+            return None
+        j = min(candidates, key=lambda j: abs(int(tier.ends[j]) - ticks))
+        if abs(float(self.timeline.toX(tier.ends[j])) - x) <= _BOUNDARY_GRAB_RADIUS:
+            return j
+        return None
+
+    def onTierPress(self, event):
+        '''
+        Pick up a boundary, or (away from boundaries) select an interval
+        '''
+        canvas = event.widget
+        i = self.getBoundaryNear(canvas, event.x)
+        if i == None:
+            self.genFrameList(event)
+            return
+        line = canvas.create_line(event.x, 0, event.x, self.canvas_height, fill='blue', width=2, tags='drag')
+        self.boundaryDrag = [canvas, self.getTierName(canvas), i, line, None]
+
+    def onTierDrag(self, event):
+        ''' move the picked-up boundary (only its line, until it's dropped) '''
+        if self.boundaryDrag == None:
+            return
+        canvas, name, i, line, ticks = self.boundaryDrag
+        tier = self.model.tiers[name]
+        ticks = min(max(self.timeline.fromX(event.x), int(tier.starts[i])+1), int(tier.ends[i+1])-1)
+        x = float(self.timeline.toX(ticks))
+        canvas.coords(line, x, 0, x, self.canvas_height)
+        self.boundaryDrag[4] = ticks
+
+    def onTierRelease(self, event):
+        ''' drop the picked-up boundary '''
+        if self.boundaryDrag == None:
+            return
+        canvas, name, i, line, ticks = self.boundaryDrag
+        self.boundaryDrag = None
+        canvas.delete(line)
+        if ticks != None and ticks != self.model.tiers[name].ends[i]:
+            self.model.moveBoundary(name, i, ticks)
+            self.onTierEdited(name)
+
+    def onTierDoubleClick(self, event):
+        ''' remove the boundary under the pointer, or add one if there isn't one '''
+        canvas = event.widget
+        name = self.getTierName(canvas)
+        i = self.getBoundaryNear(canvas, event.x)
+        if i != None:
+            shift = self.model.removeBoundary(name, i)
+        else:
+            shift = self.model.insertBoundary(name, self.timeline.fromX(event.x))
+            if shift == None:
+                return
+        self.onTierEdited(name, *shift)
+
+    def editLabel(self, event):
+        '''
+        Edit the mark of the interval under the pointer in place (<Return> to
+        keep the change, <Escape> or clicking elsewhere to drop it)
+        '''
+        canvas = event.widget
+        item = self.my_find_closest(canvas, event.x)
+        if item not in self.intervalItems.get(canvas, {}):
+            return
+        name = self.getTierName(canvas)
+        i = self.intervalItems[canvas][item]
+        entry = Entry(canvas, justify=CENTER)
+        entry.insert(0, self.model.tiers[name].getMark(i))
+        entry.select_range(0, END)
+        # keep the app's own key bindings (<BackSpace>, arrows...) out of the entry
+        entry.bindtags((str(entry), 'Entry', 'all'))
+        window = canvas.create_window(canvas.coords(item)[0], self.canvas_height/2, window=entry)
+        def finish(keep):
+            if entry.winfo_exists():
+                if keep and entry.get() != self.model.tiers[name].getMark(i):
+                    self.model.setMark(name, i, entry.get())
+                    self.onTierEdited(name)
+                canvas.delete(window)
+                entry.destroy()
+        entry.bind('<Return>', lambda ev: finish(True))
+        entry.bind('<Escape>', lambda ev: finish(False))
+        entry.bind('<FocusOut>', lambda ev: finish(False))
+        entry.focus_set()
+
+    def onTierEdited(self, name, after=None, change=0):
+        '''
+        Show an edit to tier `name` (redrawing just its canvas) and save it in the
+        background; `change` intervals were inserted (or removed) after interval
+        `after`, as for TextGridModel.updateTier()
+        '''
+        self.TextGrid = None # rebuilt from self.model when needed
+        if self.progress != None:
+            self.progress.updateTier(name)
+        self.view.selection = None # the selected interval's frames may have changed
+        self.wipeFill()
+        selected = None
+        if self.selectedItem:
+            wdg,itm = self.selectedItem
+            if itm in self.intervalItems.get(wdg, {}):
+                i = self.intervalItems[wdg][itm]
+                # follow the selected interval to its new index
+                if change != 0 and self.getTierName(wdg) == name and i > after:
+                    i += change
+                selected = (wdg, i)
+        for el in self.TkWidgets:
+            if el.get('name') == name and 'canvas' in el:
+                self.fillTierCanvas(el, self.timeline.start, self.timeline.end, self.timeline.toX, selected)
+        if self.selectedItem:
+            self.setSelectedIntvlFrames(self.selectedItem)
+        self.updateTierLabels()
+        self.paintCanvases()
+        self.app.Spectrogram.update()
+        self.saveTextGrid()
+
+    def saveTextGrid(self):
+        ''' write self.model to the current TextGrid file, in the background (see TextGridWriter) '''
+        path = self.app.Data.unrelativize(self.app.Data.getFileLevel( '.TextGrid' ))
+        self.app.Data.textgridWriter.write( path, self.model.arrays )
+
     def makeTimeWidget(self):
         self.time_canvas = Canvas(self.canvas_frame, width=self.canvas_width, height=self.canvas_height/3, highlightthickness=0)
-        s = self.time_canvas.create_text(3,0, anchor=NW, text=self.start)
-        e = self.time_canvas.create_text(self.canvas_width,0, anchor=NE, text=self.end)
-        c = self.time_canvas.create_text(self.canvas_width/2,0, anchor=N, text=self.current)
+        s = self.time_canvas.create_text(3,0, anchor=NW, text=toSeconds(self.timeline.start))
+        e = self.time_canvas.create_text(self.canvas_width,0, anchor=NE, text=toSeconds(self.timeline.end))
+        c = self.time_canvas.create_text(self.canvas_width/2,0, anchor=N, text=toSeconds(self.current))
         self.TkWidgets.append({'times':self.time_canvas})
 
     def makeFrameWidget(self):
@@ -973,7 +3215,7 @@ class TextGridModule(object):
             self.frame_shift.set(offset)
         go_btn = Button(sbframe, text='Offset', command=self.shiftFrames, takefocus=0)
         # minmax = len(self.app.Audio.sfile)*1000
-        txtbox = Spinbox(sbframe, textvariable=self.frame_shift, width=7, from_=-10000000, to=10000000)
+        txtbox = Spinbox(sbframe, textvariable=self.frame_shift, width=7, from_=-10000000, to=10000000, command=self.shiftFrames)
         txtbox.bind('<Escape>', lambda ev: sbframe.focus())
         go_btn.grid(row=0, column=0, sticky=E)
         txtbox.grid(row=0, column=1, sticky=E)
@@ -984,15 +3226,68 @@ class TextGridModule(object):
                                'frames-label':frames_label})
 
         self.frames_canvas.bind("<Button-1>", self.getClickedFrame)
+        self.frameTooltip = CanvasHoverTooltip(self.frames_canvas, self.getHoveredFrame)
+
+    def getHoveredFrame(self, x):
+        '''
+        The mark of the frame within _TOOLTIP_HOVER_RADIUS pixels of x on
+        frames_canvas (the nearest one), or None
+        '''
+        mark = self.frameIndex.nearest(x, _TOOLTIP_HOVER_RADIUS)
+        return None if mark is None else str(mark)
 
     def getFrameTierName(self):
         '''
         Handle some inconsistency in how we're naming our alignment tier
         '''
-        for name in _TEXTGRID_ALIGNMENT_TIER_NAMES:
-            if name in self.TextGrid.getNames():
-                return name
-        raise NameError( 'Unable to find alignment tier' )
+        return self.model.frameTierName
+
+    def loadTextGrid(self, filename):
+        '''
+        Read a TextGrid (through the Data module's TextGridCache) into self.model
+        '''
+        path = self.app.Data.unrelativize(filename)
+        self.app.Data.textgridWriter.wait() # don't read a TextGrid that's still being written
+        self.model = TextGridModel( self.app.Data.textgridCache.getArrays(path) )
+        self.TextGrid = None
+
+    def getTextGrid(self):
+        '''
+        The textgrid lib object for the current file (for editing and writing)
+        '''
+        if self.TextGrid == None:
+            self.TextGrid = buildTextGrid( self.model.arrays )
+        return self.TextGrid
+
+    def setFlaggedFrames(self, frames):
+        ''' mark a list of frames (e.g. from TraceQA) on frames_canvas '''
+        self.flaggedFrames = sorted( int(frame) for frame in frames )
+        self.drawFlaggedFrames()
+
+    def drawFlaggedFrames(self):
+        ''' draw a marker above each visible flagged frame '''
+        self.frames_canvas.delete( 'flagged' )
+        for frame in self.flaggedFrames:
+            line = self.frames_canvas.find_withtag( 'frame%d' % frame )
+            if line:
+                x = self.frames_canvas.coords( line[0] )[0]
+                self.frames_canvas.create_polygon( x-4, 0, x+4, 0, x, 7, fill='orange', outline='', tags='flagged' )
+
+    def nextFlaggedFrame(self, event=None):
+        ''' jump to the next flagged frame (wrapping around) '''
+        if len(self.flaggedFrames) == 0:
+            return
+        later = [ frame for frame in self.flaggedFrames if frame > self.app.frame ]
+        self.app.frame = later[0] if later else self.flaggedFrames[0]
+        self.app.framesUpdate()
+
+    def getSelectedTierName(self):
+        ''' name of the tier holding the selected interval (default: the first tier) '''
+        tiers = [ el for el in self.TkWidgets if 'canvas' in el ]
+        for el in tiers:
+            if self.selectedItem and el['canvas'] == self.selectedItem[0]:
+                return el['name']
+        return tiers[0]['name'] if tiers else None
 
     def getClickedFrame(self, event):
         '''
@@ -1017,12 +3312,11 @@ class TextGridModule(object):
         # self.app.Trace.frame.update()
         self.label_width=300#self.app.Trace.frame.winfo_width()+self.label_padx
         # print(self.label_width, 739)
-        self.end = self.TextGrid.maxTime#float(self.TextGrid.maxTime)
+        self.timeline.reset(self.model.minTime, self.model.maxTime)
         # self.first_frame = 1
         # print('line 805')
         # self.last_frame = self.TextGrid.getFirst(self.frameTierName)[-1].mark
         # print('line 807')
-        tier_obj = self.TextGrid.getFirst(tier)
         widgets = { 'name':tier,
                          #'label':Label(self.frame, text=('- '+tier+':'), wraplength=200, justify=LEFT),
                          'canvas-label':Canvas(self.frame, width=self.label_width, height=self.canvas_height, highlightthickness=0),
@@ -1036,7 +3330,11 @@ class TextGridModule(object):
         label_text = label.create_text(self.label_width, self.canvas_height/2, anchor=E, justify=CENTER,
                                         text='temp', width=self.label_width/2, activefill='blue')
 
-        canvas.bind("<Button-1>", self.genFrameList)
+        canvas.bind("<Button-1>", self.onTierPress)
+        canvas.bind("<B1-Motion>", self.onTierDrag)
+        canvas.bind("<ButtonRelease-1>", self.onTierRelease)
+        canvas.bind("<Double-Button-1>", self.onTierDoubleClick)
+        canvas.bind("<Button-2>" if _PLATFORM == 'Darwin' else "<Button-3>", self.editLabel)
         label.bind("<Button-1>", self.genFrameList)
         label.bind("<Double-Button-1>", self.collapse)
         label.bind("<Button-4>", self.collapse)
@@ -1053,8 +3351,6 @@ class TextGridModule(object):
 
         '''
         if self.selectedItem:
-            duration = self.end - self.start
-
             # There might be a more efficient way to get the tier name:
             widg = self.selectedItem[0]
             itm = self.selectedItem[1]
@@ -1063,54 +3359,27 @@ class TextGridModule(object):
                     tier_name = el['name']
                     break
 
-            #finding Interval mintime and maxtime
-            oldMinTime = None
-            oldMaxTime = None
-            q=0
-            tags = widg.gettags(itm)
-            while oldMinTime == None or oldMaxTime == None:
-                if tags[q][:7] == 'minTime':
-                    oldMinTime = float(tags[q][7:])
-                elif tags[q][:7] == 'maxTime':
-                    oldMaxTime = float(tags[q][7:])
-                q+=1
-
-            tier = self.TextGrid.getFirst(tier_name)
-            intvl_i = tier.indexContaining(oldMaxTime-((oldMaxTime-oldMinTime)/2))
+            #finding the selected interval
+            if itm not in self.intervalItems.get(widg, {}):
+                return
+            tier = self.model.tiers[tier_name]
+            intvl_i = self.intervalItems[widg][itm]
 
             if event.keysym == 'Left':
                 new_intvl_i = intvl_i-1
             elif event.keysym == 'Right':
                 new_intvl_i = intvl_i+1
             if 0 <= new_intvl_i < len(tier):
-                #find characteristics of new adjacent interval
-                newMinTime = tier[new_intvl_i].minTime
-                newMaxTime = tier[new_intvl_i].maxTime
-                itvlDuration = newMaxTime - newMinTime
-                newCenter = newMinTime + itvlDuration/2
-
-                #figure out new window parameters based on new interval
-                start = newCenter - duration/2
-                end = newCenter + duration/2
-                if start < 0:
-                    self.start = 0
-                    self.end = duration
-                elif end > self.TextGrid.maxTime:
-                    self.start = self.TextGrid.maxTime - duration
-                    self.end = self.TextGrid.maxTime
-                else:
-                    self.start = newCenter - duration/2
-                    self.end = newCenter + duration/2
-                relDuration = self.end - self.start
+                #center the window on the new adjacent interval
+                newCenter = (int(tier.starts[new_intvl_i]) + int(tier.ends[new_intvl_i]))//2
+                self.timeline.centerOn(newCenter)
+                self.fillCanvases()
 
                 # select new item
-                rel_time = newCenter - self.start
-                x_loc = float(rel_time/relDuration*self.canvas_width)
+                x_loc = float(self.timeline.toX(newCenter))
                 item = self.my_find_closest(widg, x_loc)
                 self.selectedItem = (widg, item)
                 self.setSelectedIntvlFrames(self.selectedItem)
-
-                self.fillCanvases()
                 self.genFrameList(widg=widg, x_loc=x_loc)
 
     def changeTiers(self, event):
@@ -1131,7 +3400,9 @@ class TextGridModule(object):
                 else:
                     return
 
-                new_item = new_widg.find_withtag("frame"+str(self.app.frame))[0]
+                new_item = self.getFrameItem(new_widg, self.app.frame)
+                if new_item == None:
+                    return
                 self.selectedItem = (new_widg, new_item)
 
                 self.fillCanvases()
@@ -1140,22 +3411,25 @@ class TextGridModule(object):
 
     def getMinMaxTime(self):
         '''
-        Returns minTime and maxTime tags from selected interval
-        If no minTime or maxTime, returns start or end time of viewed section of TextGrid
+        Returns minTime and maxTime (in ticks) of selected interval (or spectrogram selection)
+        If there's neither, returns start or end time of viewed section of TextGrid
         '''
         start=None
         end=None
 
-        for tag in self.selectedItem[0].gettags(self.selectedItem[1]):
-            if tag[:7] == 'minTime':
-                start = decimal.Decimal(tag[7:])
-            elif tag[:7] == 'maxTime':
-                end = decimal.Decimal(tag[7:])
+        wdg,itm = self.selectedItem
+        if itm in self.intervalItems.get(wdg, {}):
+            i = self.intervalItems[wdg][itm]
+            tier = self.model.tiers[self.getSelectedTierName()]
+            start = int(tier.starts[i])
+            end = int(tier.ends[i])
+        elif wdg == self.app.Spectrogram.canvas and self.selectedSpan:
+            start, end = self.selectedSpan
 
         if start==None:
-            start=self.start
+            start=self.timeline.start
         if end==None:
-            end=self.end
+            end=self.timeline.end
 
         return (start,end)
 
@@ -1165,154 +3439,61 @@ class TextGridModule(object):
         '''
         # print(event.char, event.keysym, event.keycode)
         # print(self.app.frame)
-        f = decimal.Decimal(self.tg_zoom_factor)
-        a = self.end - self.start
-        z_out = (a-(a/f))/2
-        z_in = ((f*a)-a)/2
-        old_start = self.start
-        old_end = self.end
+        f = self.tg_zoom_factor
 
         if event.keysym == 'n':
             if self.selectedItem:
-                self.start, self.end = self.getMinMaxTime()
+                self.timeline.show(*self.getMinMaxTime())
             # for tag in self.selectedItem[0].gettags(self.selectedItem[1]):
             #     if tag[:7] == 'minTime':
             #         self.start = decimal.Decimal(tag[7:])
             #     elif tag[:7] == 'maxTime':
             #         self.end = decimal.Decimal(tag[7:])
         if event.keysym == 'a':
-            self.start = 0
-            self.end = self.TextGrid.maxTime
+            self.timeline.show(self.model.minTime, self.model.maxTime)
         if event.keysym == 'o':
-            self.start = self.start - z_in
-            self.end = self.end + z_in
+            self.timeline.zoom(1/f)
         if event.keysym == 'i':
-            self.start = self.start + z_out
-            self.end = self.end - z_out
+            self.timeline.zoom(f)
         if event.keysym == 'Left':
-            start = self.start - a/(10*f)
-            end = self.end - a/(10*f)
-            if (start < 0):
-                self.start = 0
-                self.end = a
-            else:
-                self.start = start
-                self.end = end
+            self.timeline.pan(-1/(10*f))
         if event.keysym == 'Right':
-            start = self.start + a/(10*f)
-            end = self.end + a/(10*f)
-            if end > self.TextGrid.maxTime:
-                self.start = self.TextGrid.maxTime - a
-                self.end = self.TextGrid.maxTime
-            else:
-                self.start = start
-                self.end = end
+            self.timeline.pan(1/(10*f))
 
         self.fillCanvases()
 
-    def getTracedFrames(self,frames):
-        '''
-
-        '''
-        frames = [frame[5:] for frame in frames] #to get rid of word "frame in tag"
-        tracedFrames = []
-        for trace in self.app.Data.data['traces']:
-            tracedFrames = tracedFrames+self.app.Data.tracesExist(trace)
-
-        return set(frames).intersection(tracedFrames)
-
     def fillCanvases(self):
         '''
+        Render the visible part of self.model onto the tier and frame canvases
 
+        Only items at least a pixel apart are drawn: intervals narrower than a pixel
+        are merged (and shown by the widest of them), and frames are drawn as one
+        tick per pixel column, with a density strip underneath once there's more
+        than one frame per pixel.  Items are reused across redraws (see ItemPool),
+        so a redraw costs the same whatever the zoom level
         '''
-        if self.start < 0:
-            self.start = 0
-        if self.end > self.TextGrid.maxTime:
-            self.end = self.TextGrid.maxTime
+        self.timeline.width = self.canvas_width
+        self.timeline.clamp()
         self.updateTimeLabels()
 
+        start, end = self.timeline.start, self.timeline.end
+        toX = self.timeline.toX
+
+        # the selected interval, to be re-selected among the new items
+        selected = None
         if self.selectedItem:
-            old_selected_tags = self.selectedItem[0].gettags(self.selectedItem[1])
-        duration = self.end - self.start
-        self.frameTier = self.TextGrid.getFirst(self.frameTierName)
+            wdg,itm = self.selectedItem
+            if itm in self.intervalItems.get(wdg, {}):
+                selected = (wdg, self.intervalItems[wdg][itm])
+
         for el in self.TkWidgets:
-            if 'name' in el:
-                tier = self.TextGrid.getFirst(el['name'])
-                # print(tier)
             if 'canvas' in el:
-                canvas = el['canvas']
-                #remove previous intervals
-                canvas.delete(ALL)
-                #get starting interval
-                i = tier.indexContaining(self.start)
-                time = tier[i].maxTime
-                frame_i = 0
-                while i < len(tier) and tier[i].minTime <= self.end:
-                    if self.start >= tier[i].minTime:
-                        strtime = self.start
-                    else:
-                        strtime = tier[i].minTime
-                    if self.end <= tier[i].maxTime:
-                        time = self.end
-                    length = time - strtime
-                    pixel_length = length/duration*self.canvas_width
-
-                    mod = length/2
-                    rel_time = time-self.start
-                    loc=(rel_time-mod)/duration*self.canvas_width
-
-                    text = canvas.create_text(loc, self.canvas_height/2, justify=CENTER,
-                                        text=tier[i].mark, width=pixel_length, activefill='blue')
-                    minTimetag = "minTime"+str(tier[i].minTime)
-                    maxTimetag = "maxTime"+str(tier[i].maxTime)
-                    canvas.addtag_withtag(minTimetag, text)
-                    canvas.addtag_withtag(maxTimetag, text)
-                    #add containted frames to tags
-                    while frame_i < len(self.frameTier) and self.frameTier[frame_i].time <= tier[i].maxTime:
-                        if self.frameTier[frame_i].time >= tier[i].minTime:
-                            canvas.addtag_withtag("frame"+self.frameTier[frame_i].mark, text)
-                            if tier[i].mark != '':
-                                el['canvas-label'].addtag_all("frame"+self.frameTier[frame_i].mark)
-                        frame_i+=1
-                    #pass on selected-ness
-                    if self.selectedItem:
-                        if self.selectedItem[0] != self.app.Spectrogram.canvas:
-                            # old_selected_tags = self.selectedItem[0].gettags(self.selectedItem[1])
-                            if minTimetag in old_selected_tags and maxTimetag in old_selected_tags:
-                                self.selectedItem = (canvas, text)
-                    #create line
-                    loc=rel_time/duration*self.canvas_width
-                    i+=1
-                    if i < len(tier) and loc < self.canvas_width:
-                        canvas.create_line(loc,0,loc,self.canvas_height, tags='line')
-                        time = tier[i].maxTime #here so that loop doesn't run an extra time
-
+                self.fillTierCanvas(el, start, end, toX, selected)
                 #fills labels with info about tiers w/traces
                 self.updateTierLabels()
-
             elif 'frames' in el:
-                frames = el['frames']
-                i = 0
-                frames.delete(ALL)
-                first_frame_found = False
-                while i < len(tier) and tier[i].time <= self.end :
-                    # print(tier[i].time, i,'frame time and frame number (line 1076)')
-                    if tier[i].time >= self.start:
-                        # x_coord = (tier[i].time-self.start)/duration*self.canvas_width
-                        x_coord = ((tier[i].time-self.start)*self.canvas_width)/duration
-                        #determine fill
-                        if tier[i].mark in self.app.Data.getCurrentTraceTracedFrames():
-                            fill = 'black'
-                        else:
-                            fill = 'gray50'
-                        frame = frames.create_line(x_coord, 0, x_coord, self.canvas_height, tags="frame"+tier[i].mark, fill=fill)
-                        if first_frame_found == False:
-                            self.firstFrame = int(tier[i].mark) + 1
-                            first_frame_found = True
-                            self.frame_len = tier[i+1].time - tier[i].time
-                        CanvasTooltip(frames, frame,text=tier[i].mark)
-                    i+=1
-                self.lastFrame = int(tier[i-1].mark)
+                self.fillFramesCanvas(el['frames'], start, end, toX)
+                self.drawFlaggedFrames()
 
         self.paintCanvases()
         try:
@@ -1321,82 +3502,233 @@ class TextGridModule(object):
         except AttributeError:
             pass
 
+    def getPool(self, canvas, kind):
+        ''' the ItemPool of a canvas '''
+        if canvas not in self.pools:
+            w, h = -10*self.canvas_width, self.canvas_height
+            if kind == 'intervals': # text and right boundary of each interval
+                create = lambda: ( canvas.create_text(w, h/2, justify=CENTER, activefill='blue'),
+                                   canvas.create_line(w, 0, w, h, tags='line') )
+                park = ( (w, h/2), (w, 0, w, h) )
+            else:
+                create = lambda: canvas.create_line(w, 0, w, h)
+                park = ( (w, 0, w, h), )
+            self.pools[canvas] = ItemPool(canvas, create, park)
+        return self.pools[canvas]
+
+    def fillTierCanvas(self, el, start, end, toX, selected):
+        '''
+        Draw the intervals of one tier between times `start` and `end`
+        '''
+        canvas = el['canvas']
+        name = el['name']
+        tier = self.model.tiers[name]
+        pool = self.getPool(canvas, 'intervals')
+        pool.start()
+        self.intervalItems[canvas] = {}
+        lefts, rights, texts = [], [], []
+        first, last = tier.getRange(start, end)
+        if first < last:
+            left = toX( np.maximum(tier.starts[first:last], start) )
+            right = toX( np.minimum(tier.ends[first:last], end) )
+            # cells: runs of intervals whose right boundaries fall in the same pixel
+            column = np.floor( right )
+            ends = np.flatnonzero( np.diff(column, append=np.inf) != 0 )
+            begins = np.concatenate( ([0], ends[:-1]+1) )
+            # shown by their widest interval
+            cell = np.repeat( np.arange(len(ends)), ends-begins+1 )
+            widest = np.lexsort( (left-right, cell) )[ begins ]
+            for b, e, k in zip( begins.tolist(), ends.tolist(), widest.tolist() ):
+                i = first + k
+                l, r = float(left[b]), float(right[e])
+                text, line = pool.next()
+                canvas.coords(text, (l+r)/2, self.canvas_height/2)
+                canvas.itemconfig(text, text=tier.getMark(i), width=r-l, state='normal')
+                self.intervalItems[canvas][text] = i
+                lefts.append(l)
+                rights.append(r)
+                texts.append(text)
+                #pass on selected-ness
+                if selected == (canvas, i):
+                    self.selectedItem = (canvas, text)
+                #boundary after the cell
+                if first+e+1 < len(tier) and r < self.canvas_width:
+                    canvas.coords(line, r, 0, r, self.canvas_height)
+                    canvas.itemconfig(line, tags='line', state='normal')
+                else:
+                    canvas.coords(line, *pool.parking[1])
+                    canvas.itemconfig(line, tags=(), state='hidden')
+        pool.park()
+        self.canvasIndex[canvas] = CanvasIndex(lefts, texts, rights)
+
+    def fillFramesCanvas(self, canvas, start, end, toX):
+        '''
+        Draw the frames between times `start` and `end`, one tick per pixel column
+        (tagged with every frame in that column)
+        '''
+        frameTier = self.model.frameTier
+        pool = self.getPool(canvas, 'frames')
+        pool.start()
+        first, last = frameTier.getRange(start, end)
+        x = toX( frameTier.starts[first:last] )
+        column = np.clip( np.floor(x), 0, self.canvas_width-1 ).astype(int)
+        marks = frameTier.marks[ frameTier.labels[first:last] ]
+        begins = np.flatnonzero( np.diff(column, prepend=-1) != 0 )
+        fills = self.getBaseFills(first, last, begins)
+        ticks = []
+        dense = len(begins) < len(x)
+        height = self.canvas_height - (_DENSITY_STRIP_HEIGHT if dense else 0)
+        for b, e, fill in zip( begins.tolist(), np.append(begins[1:], len(x)).tolist(), fills ):
+            frame = pool.next()
+            ticks.append(frame)
+            canvas.coords(frame, float(x[b]), 0, float(x[b]), height)
+            canvas.itemconfig(frame, tags=[ 'frame'+str(mark) for mark in marks[b:e] ]+['tick'], fill=fill, state='normal')
+        pool.park()
+        self.drawDensityStrip(canvas, column if dense else None)
+        self.canvasIndex[canvas] = CanvasIndex(x[begins], ticks)
+        self.frameIndex = CanvasIndex(x, marks)
+        self.view.reset(first, last, ticks, begins, zip(ticks, fills), self.app.Data.revision)
+
+        if first < last:
+            self.firstFrame = int(frameTier.getMark(first)) + 1
+            self.lastFrame = int(frameTier.getMark(last-1))
+            if first+1 < len(frameTier):
+                self.frame_len = toSeconds(frameTier.starts[first+1] - frameTier.starts[first])
+
+    def getBaseFills(self, first, last, begins):
+        '''
+        Fills of the ticks for frame positions [first, last), each tick starting at
+        one of `begins`: black if any of its frames is traced (in the current
+        trace), gray otherwise
+        '''
+        if len(begins) == 0:
+            return []
+        frameTier = self.model.frameTier
+        marks = frameTier.marks[ frameTier.labels[first:last] ]
+        traced = np.isin( marks, list(self.app.Data.getCurrentTraceTracedFrames()) )
+        return np.where( np.logical_or.reduceat(traced, begins), 'black', 'gray50' ).tolist()
+
+    def drawDensityStrip(self, canvas, column):
+        '''
+        Shade the bottom of the frames canvas by the number of frames in each pixel
+        column (or hide the strip if `column` is None)
+        '''
+        if column is None:
+            canvas.itemconfig('density', state='hidden')
+            return
+        counts = np.bincount(column, minlength=self.canvas_width)[:self.canvas_width]
+        shade = ( 255 - np.round(255 * counts / counts.max()) ).astype(np.uint8)
+        img = Image.fromarray( np.tile(shade, (_DENSITY_STRIP_HEIGHT, 1)) )
+        self.density_img = ImageTk.PhotoImage(img)
+        if canvas.find_withtag('density'):
+            canvas.itemconfig('density', image=self.density_img, state='normal')
+        else:
+            canvas.create_image(0, self.canvas_height, anchor=SW, image=self.density_img, tags='density')
+
     def updateTimeLabels(self):
         '''
 
         '''
-        self.current = self.TextGrid.getFirst(self.frameTierName)[self.app.frame-1].time
-        self.TkWidgets[-1]['times'].itemconfig(1,text='{:.6f}'.format(self.start))
-        self.TkWidgets[-1]['times'].itemconfig(2,text='{:.6f}'.format(self.end))
-        self.TkWidgets[-1]['times'].itemconfig(3,text='{:.6f}'.format(self.current))
+        self.current = self.model.getFrameTime(self.app.frame)
+        self.TkWidgets[-1]['times'].itemconfig(1,text='{:.6f}'.format(toSeconds(self.timeline.start)))
+        self.TkWidgets[-1]['times'].itemconfig(2,text='{:.6f}'.format(toSeconds(self.timeline.end)))
+        self.TkWidgets[-1]['times'].itemconfig(3,text='{:.6f}'.format(toSeconds(self.current)))
 
     def updateTierLabels(self):
         '''
-
+        Show the traced/total frames inside labelled intervals next to each tier name
         '''
+        if self.model == None:
+            return
+        progress = self.getProgress()
         for el in self.TkWidgets:
             if 'canvas' in el:
                 current_label = el['canvas-label'].find_all()[0]
-                nonempty_frames = el['canvas-label'].gettags(current_label)
                 el['canvas-label'].itemconfig(current_label,
-                  text='{}:\n({}/{})'.format(el['name'],len(self.getTracedFrames(nonempty_frames)), len(nonempty_frames)))
+                  text='{}:\n({}/{})'.format(el['name'], *progress.getTierCounts(el['name'])))
+
+    def getProgress(self):
+        '''
+        The TracedIntervalCounts of the current TextGrid (rebuilt when the
+        TextGrid or the set of traces changes)
+        '''
+        counts = self.app.Data.getTracedFrameCounts()
+        if self.progressSource != (counts, self.model.frameTier):
+            self.progress = TracedIntervalCounts(self.model, counts.getTracedFrames(self.app.Data.getCurrentFilename()))
+            self.progressSource = (counts, self.model.frameTier)
+        return self.progress
+
+    def setFrameTraced(self, frame, traced):
+        ''' called by the Data module when a frame gains its first / loses its last traced points '''
+        if self.progress != None and self.progressSource[1] == self.model.frameTier:
+            self.progress.setTraced(frame, traced)
 
 
     def my_find_closest(self, widg, x_loc):
         '''
-        replaces TkInter's find_closest function, which is buggy, determines
-        whether found item is text, line, or label, and returns corresponding item
+        replaces TkInter's find_closest function, which is buggy: on a tier canvas
+        returns the text item of the interval at x_loc (a click on a boundary counts
+        as being to the right of it), on frames_canvas the nearest frame tick, and
+        on a tier-label canvas its label.  Uses the CanvasIndex built by the last
+        fillCanvases(), so there are no per-item Tcl calls
         '''
-        #could be more efficient FIXME
-        maybe_item = None
-        dist = 999999999999
-        for el in widg.find_all():
-            obj_x = widg.coords(el)[0]
-            if abs(obj_x-x_loc) < dist:
-                dist = abs(obj_x-x_loc)
-                maybe_item = el
-
         if widg in self.tier_pairs.keys(): #on tier-label canvas
-            #fill selected tier frames
-            # self.setSelectedIntvlFrames(widg,item)
-            item = maybe_item
-
-        elif widg in self.tier_pairs.values(): #on canvas with intervals/frames
-            if isinstance(maybe_item, int):
-                # #if item found is a boundary
-                # if len(widg.gettags(maybe_item)) == 0 or widg.gettags(maybe_item) == ('current',):
-                if 'line' in widg.gettags(maybe_item):
-                    #determine on which side of the line the event occurred
-                    if widg.coords(maybe_item)[0] > x_loc:
-                        item = maybe_item-1
-                    else: #i.e. event was on line or to the right of it
-                        item = maybe_item+1
-                else:
-                    item = maybe_item
+            return widg.find_all()[0]
+        index = self.canvasIndex.get(widg, CanvasIndex())
+        if widg in self.tier_pairs.values(): #on canvas with intervals/frames
+            return index.containing(x_loc)
+        return index.nearest(x_loc)
 
-                # self.setSelectedIntvlFrames(widg,item)
-        else:
-            item = maybe_item
-
-        return item
     def setSelectedIntvlFrames(self,tupl):
         ''' '''
         widg,item=tupl
-        self.selectedIntvlFrames = []
-        for x in widg.gettags(item):
-            if x[:5] == 'frame':
-                self.selectedIntvlFrames.append(x[5:])
+        self.selectedIntvlFrames = self.getItemFrames(widg, item)
+
+    def getItemPositions(self, widg, item):
+        '''
+        Positions (in the frame tier) of the frames belonging to a canvas item,
+        looked up in self.model: an interval on a tier canvas, the labelled
+        intervals of a tier (on its label canvas), or the selected span of the
+        spectrogram.  Returns None for other items (e.g. frame ticks)
+        '''
+        if item in self.intervalItems.get(widg, {}):
+            return self.model.getIntervalFrames(self.getTierName(widg), self.intervalItems[widg][item])
+        if widg in self.tier_pairs:
+            return self.model.getLabelledFrames(self.getTierName(self.tier_pairs[widg]))
+        if widg == self.app.Spectrogram.canvas and self.selectedSpan:
+            return np.arange(*self.model.frameTier.getRange(*self.selectedSpan))
+        return None
+
+    def getItemFrames(self, widg, item):
+        ''' marks of the frames belonging to a canvas item (see getItemPositions()), falling back on its tags '''
+        positions = self.getItemPositions(widg, item)
+        if positions is None:
+            return [ tag[5:] for tag in widg.gettags(item) if tag[:5] == 'frame' ]
+        return self.model.getFrameMarks(positions)
+
+    def getFrameItem(self, canvas, frame):
+        ''' the item on a tier canvas showing the interval that contains `frame` (or None if it's not in view) '''
+        name = self.getTierName(canvas)
+        i = self.model.getFrameInterval(name, frame)
+        if i == None:
+            return None
+        tier = self.model.tiers[name]
+        if tier.ends[i] < self.timeline.start or tier.starts[i] > self.timeline.end:
+            return None
+        center = ( max(int(tier.starts[i]), self.timeline.start) + min(int(tier.ends[i]), self.timeline.end) )//2
+        return self.canvasIndex[canvas].containing( float(self.timeline.toX(center)) )
+
+    def getTierName(self, canvas):
+        ''' name of the tier drawn on a tier canvas '''
+        for el in self.TkWidgets:
+            if el.get('canvas') == canvas:
+                return el['name']
 
     def wipeFill(self):
         '''
-        Turns selected frame and interval back to black
+        Turns selected interval back to black (frames are taken care of by
+        repaintFrames(), called from paintCanvases())
         '''
-        for frame in range(1,self.app.frames+1):
-            if str(frame) in self.app.Data.getCurrentTraceTracedFrames():
-                fill = 'black'
-            else:
-                fill = 'gray50'
-            self.frames_canvas.itemconfig('frame'+str(frame), fill=fill)
         if self.selectedItem:
             wdg,itm = self.selectedItem
             # print('line 1381', len(wdg.find_withtag(itm+1)), len(wdg.find_withtag(itm-1)))
@@ -1413,7 +3745,6 @@ class TextGridModule(object):
             if wdg in self.tier_pairs.keys():
                 wdg.itemconfig(1, fill='black')
                 self.tier_pairs[wdg].itemconfig(ALL, fill='black')
-                self.frames_canvas.itemconfig(ALL, fill='black')
 
     def genFrameList(self, event=None, widg=None, x_loc=None, SI=False):
         '''
@@ -1510,24 +3841,48 @@ class TextGridModule(object):
                     # if canvas.type(canvas.find_withtag(el)) == 'text':
                     canvas.itemconfig(el, fill='blue')
 
-            #paint frames
-            frames = wdg.gettags(itm)
-            # print(frames, wdg, 'line1453')
-            for frame in frames:
-                if frame[:5] == 'frame':
-                    frame_obj = self.frames_canvas.find_withtag(frame)
-                    #detect whether frame contains any traces
-                    framenum = frame[5:]
-                    if framenum in self.app.Data.getCurrentTraceTracedFrames():
-                        fill = 'blue'
-                    else:
-                        fill = 'dodger blue'
-                    self.frames_canvas.itemconfig(frame_obj, fill=fill)
+        #paint frames
+        self.repaintFrames()
 
+    def getSelectedTicks(self):
+        '''
+        The frames_canvas ticks of the frames in the selected interval (cached
+        until the selection or the view changes)
+        '''
+        if not self.selectedItem:
+            return set()
+        key = self.selectedItem + (self.selectedSpan,)
+        if self.view.selection == None or self.view.selection[0] != key:
+            wdg,itm = self.selectedItem
+            positions = self.getItemPositions(wdg, itm)
+            if positions is None:
+                positions = [ self.model.getFramePosition(frame) for frame in self.getItemFrames(wdg, itm) ]
+                positions = [ position for position in positions if position != None ]
+            self.view.selection = (key, self.view.getTicks(positions))
+        return self.view.selection[1]
+
+    def repaintFrames(self):
+        '''
+        Bring the fills of the frame ticks up to date: the current frame red, the
+        selected interval's frames blue (dark if traced), the rest black (traced)
+        or gray.  Only ticks that were or are now highlighted are looked at, so
+        this costs the same however long the recording is
+        '''
+        view = self.view
+        if view.revision != self.app.Data.revision: # something was (un)traced
+            fills = self.getBaseFills(view.first, view.last, view.begins)
+            view.base = dict(zip(list(view.base), fills)) # (in tick order)
+            view.revision = self.app.Data.revision
+            view.paint(self.frames_canvas, { tick:fill for tick, fill in view.base.items() if tick not in view.highlighted })
+        fills = { tick:view.base[tick] for tick in view.highlighted }
+        for tick in self.getSelectedTicks():
+            fills[tick] = 'blue' if view.base[tick] == 'black' else 'dodger blue'
         #current frame highlighted in red
-        if self.app.frame:
-            self.highlighted_frame = self.frames_canvas.find_withtag('frame'+str(self.app.frame))
-            self.frames_canvas.itemconfig(self.highlighted_frame, fill='red')
+        current = view.getTick(self.model.getFramePosition(self.app.frame))
+        if current != None:
+            fills[current] = 'red'
+        view.paint(self.frames_canvas, fills)
+        self.highlighted_frame = current if current != None else ()
 
     def update(self):
         '''
@@ -1540,29 +3895,23 @@ class TextGridModule(object):
         #     self.reset()
 
         # print(self.frames_canvas)
-        #create list of displayed frames' tags
-        itrobj = []
-        for itm in self.frames_canvas.find_all():
-            itrobj += list(self.frames_canvas.gettags(itm))
         #if selected frame is out of view
-        if "frame"+str(self.app.frame) not in itrobj:
-            duration = self.end - self.start
+        if not self.view.isVisible(self.model.getFramePosition(self.app.frame)):
             #recenter view on selected frame
-            new_time = self.TextGrid.getFirst(self.frameTierName)[self.app.frame-1].time
-            self.start = new_time - (duration/2)
-            self.end = new_time + (duration/2)
+            self.timeline.centerOn(self.model.getFrameTime(self.app.frame))
             #redraw
             self.fillCanvases()
         self.wipeFill()
         #if selected frame outside selected interval, select interval on same tier containing frame
         if self.selectedItem:
             if self.selectedItem[0] in self.tier_pairs.keys() or self.selectedItem[0] in self.tier_pairs.values():
-                if "frame"+str(self.app.frame) not in self.selectedItem[0].gettags(self.selectedItem[1]): #FIXME should also detect if on label canvas
+                if str(self.app.frame) not in self.getItemFrames(*self.selectedItem):
                     widg = self.selectedItem[0]
                     if widg in self.tier_pairs:
                         widg = self.tier_pairs[widg]
-                    new_interval = widg.find_withtag("frame"+str(self.app.frame))[0]
-                    self.selectedItem = (self.selectedItem[0], new_interval)
+                    new_interval = self.getFrameItem(widg, self.app.frame)
+                    if new_interval != None:
+                        self.selectedItem = (self.selectedItem[0], new_interval)
 
         # repaint all frames
         self.paintCanvases()
@@ -1605,7 +3954,7 @@ class SpectrogramModule(object):
         self.spec_freq_max = DoubleVar()
         self.wl = DoubleVar()
         self.dyn_range = DoubleVar()
-        self.clicktime = -1
+        self.clicktime = None # ticks
         self.specClick = False
         self.oldSelected = None
         self.doDefaults()
@@ -1663,13 +4012,13 @@ class SpectrogramModule(object):
         '''
         Extracts spectrogram data from sound, and draws it to canvas
         '''
-        if self.app.Audio.current:
-            sound = parselmouth.Sound(self.app.Audio.current)
+        if self.app.Audio.sound != None:
+            sound = self.app.Audio.sound
 
-            ts_fac = decimal.Decimal(10000.0)
-            wl = decimal.Decimal(self.wl.get())
-            start_time = self.app.TextGrid.start
-            end_time = self.app.TextGrid.end
+            ts_fac = 10000.0
+            wl = self.wl.get()
+            start_time = toSeconds(self.app.TextGrid.timeline.start)
+            end_time = toSeconds(self.app.TextGrid.timeline.end)
             duration = end_time - start_time
             self.ts = duration / ts_fac
             # the amount taken off in spectrogram creation seems to be
@@ -1680,7 +4029,7 @@ class SpectrogramModule(object):
             extra = self.ts * math.floor( wl / self.ts )
             start_time = max(0, start_time - extra)
             end_time = min(end_time + extra, sound.get_total_duration())
-            sound_clip = sound.extract_part(from_time=start_time, to_time=end_time)
+            sound_clip = self.app.Audio.getSoundPart(start_time, end_time)
 
             spec = sound_clip.to_spectrogram(window_length=wl, time_step=self.ts, maximum_frequency=self.spec_freq_max.get())
             self.spectrogram = 10 * np.log10(np.flip(spec.values, 0))
@@ -1710,8 +4059,6 @@ class SpectrogramModule(object):
 
             # self.canvas.create_image(0,0, anchor=NW, image=photo_img)
             # self.canvas.create_image(self.canvas_width/2,self.canvas_height/2, image=photo_img)
-            if self.app.TextGrid.selectedItem:
-                tags = self.app.TextGrid.selectedItem[0].gettags(self.app.TextGrid.selectedItem[1])
             self.canvas.delete(ALL)
             img = self.canvas.create_image(self.canvas_width, self.canvas_height, anchor=SE, image=photo_img)
             self.img = photo_img
@@ -1719,9 +4066,6 @@ class SpectrogramModule(object):
             if self.app.TextGrid.selectedItem:
                 if self.app.TextGrid.selectedItem[0] == self.canvas:
                     self.app.TextGrid.selectedItem = (self.canvas, img)
-                    #pass on tags
-                    for tag in tags:
-                        self.canvas.addtag_all(tag)
 
     def drawInterval(self):
         '''
@@ -1747,8 +4091,8 @@ class SpectrogramModule(object):
                     self.canvas.create_line(r_loc, 0, r_loc, self.canvas_height, tags='line', fill='blue')
             elif widg == self.canvas:
                 l_time, r_time = self.app.TextGrid.getMinMaxTime()
-                l_loc = self.timeToX(float(l_time))
-                r_loc = self.timeToX(float(r_time))
+                l_loc = self.timeToX(l_time)
+                r_loc = self.timeToX(r_time)
                 self.canvas.create_line(l_loc, 0, l_loc, self.canvas_height, tags='line', fill='blue')
                 self.canvas.create_line(r_loc, 0, r_loc, self.canvas_height, tags='line', fill='blue')
 
@@ -1757,7 +4101,7 @@ class SpectrogramModule(object):
                 xcoord = self.app.TextGrid.frames_canvas.coords(self.app.TextGrid.highlighted_frame)[0]
                 self.canvas.create_line(xcoord,0,xcoord,self.canvas_height, tags='line', fill='red')
             #draw line where user last clicked on spectrogram
-            if self.clicktime != -1 and self.specClick == False:
+            if self.clicktime != None and self.specClick == False:
                 x = self.timeToX(self.clicktime)
                 self.canvas.create_line(x,0,x,self.canvas_height, tags='line', fill='green')
 
@@ -1789,11 +4133,11 @@ class SpectrogramModule(object):
             self.specClick = True
 
     def xToTime(self, x):
-        ''' converts from a x coordinate (relative to the canvas) to the timestamp at that coordinate'''
-        return (x*float(self.app.TextGrid.end - self.app.TextGrid.start)/self.canvas_width) + float(self.app.TextGrid.start)
+        ''' converts from a x coordinate (relative to the canvas) to the time (in ticks) at that coordinate'''
+        return self.app.TextGrid.timeline.fromX(x)
     def timeToX(self,time):
-        ''' converts from a time to the x coordinate on a canvas representing that time'''
-        return self.canvas_width*(time - float(self.app.TextGrid.start))/float(self.app.TextGrid.end - self.app.TextGrid.start)
+        ''' converts from a time (in ticks) to the x coordinate on a canvas representing that time'''
+        return float(self.app.TextGrid.timeline.toX(time))
 
     def grid(self):
         '''
@@ -1840,6 +4184,34 @@ class TraceModule(object):
         # set of copied crosshairs
         self.copied = []
 
+        # hit-testing for box & lasso selections
+        self.selector = SelectionEngine()
+        self.selectModeSV = StringVar()
+        self.selectModeSV.set( self.selector.mode )
+        self.lassoBV = BooleanVar()
+        self.lassoBV.set( False )
+
+        # snap traces to the image edges on every release
+        self.snapBV = BooleanVar()
+        self.snapBV.set( False )
+        self.snake = None # ActiveContour shared by every refine, see getSnake()
+        self.propagation = None # (thread, results, proposal, filename, frame count) while propagate() runs
+
+        # how keyframes are interpolated
+        self.interpolationSV = StringVar()
+        self.interpolationSV.set( _INTERPOLATION_KINDS[0] )
+
+        # overlay the mean contour (and its spread) for the current interval label
+        self.meanBV = BooleanVar()
+        self.meanBV.set( False )
+
+        # overlay the neighbouring frames' contours
+        self.onionSkin = OnionSkin( self.app )
+        self.onionBV = BooleanVar()
+        self.onionBV.set( False )
+        self.onionIV = IntVar()
+        self.onionIV.set( self.onionSkin.radius )
+
         # declare & init trace string variable
         self.traceSV = StringVar()
         self.traceSV.set( '' )
@@ -1876,7 +4248,23 @@ class TraceModule(object):
             self.getWidget( Button(self.frame, text='Clear', command=self.clear, takefocus=0), row=15, column=2, columnspan=2 ),
             self.getWidget( Entry( self.frame, width=12, textvariable=self.traceSV), row=100, column=0, sticky=W ),
             self.getWidget( Button(self.frame, text='New', command=self.newTrace, takefocus=0), row=100, column=2 ),
-            self.getWidget( Button(self.frame, text='Rename', command=self.renameTrace, takefocus=0), row=100, column=3 ) ]
+            self.getWidget( Button(self.frame, text='Rename', command=self.renameTrace, takefocus=0), row=100, column=3 ),
+            self.getWidget( OptionMenu(self.frame, self.selectModeSV, self.selector.mode, *_SELECTION_MODES, command=self.setSelectMode), row=16, column=2, columnspan=2 ),
+            self.getWidget( Checkbutton(self.frame, text='Lasso', variable=self.lassoBV, command=self.setSelectShape, takefocus=0), row=17, column=2, columnspan=2 ),
+            self.getWidget( Button(self.frame, text='Propagate', command=self.propagate, takefocus=0), row=18, column=2, columnspan=2 ),
+            self.getWidget( Button(self.frame, text='Accept', command=self.acceptProposal, takefocus=0), row=19, column=2 ),
+            self.getWidget( Button(self.frame, text='Reject', command=self.rejectProposal, takefocus=0), row=19, column=3 ),
+            self.getWidget( Button(self.frame, text='Refine', command=self.refine, takefocus=0), row=20, column=2 ),
+            self.getWidget( Button(self.frame, text='Refine all', command=self.refineInterval, takefocus=0), row=20, column=3 ),
+            self.getWidget( Checkbutton(self.frame, text='Snap on release', variable=self.snapBV, takefocus=0), row=21, column=2, columnspan=2 ),
+            self.getWidget( Button(self.frame, text='Interpolate', command=self.interpolate, takefocus=0), row=22, column=2 ),
+            self.getWidget( OptionMenu(self.frame, self.interpolationSV, _INTERPOLATION_KINDS[0], *_INTERPOLATION_KINDS), row=22, column=3 ),
+            self.getWidget( Checkbutton(self.frame, text='Mean ± SD', variable=self.meanBV, command=self.showMeanLayer, takefocus=0), row=23, column=2, columnspan=2 ),
+            self.getWidget( Checkbutton(self.frame, text='Onion skin', variable=self.onionBV, command=self.showOnionSkin, takefocus=0), row=24, column=2 ),
+            self.getWidget( Spinbox(self.frame, textvariable=self.onionIV, from_=1, to=10, width=3, command=self.showOnionSkin), row=24, column=3 ),
+            self.getWidget( Button(self.frame, text='Check', command=self.checkTrace, takefocus=0), row=25, column=2 ),
+            self.getWidget( Button(self.frame, text='Next flagged', command=self.nextFlagged, takefocus=0), row=25, column=3 ),
+            self.getWidget( Button(self.frame, text='Smooth', command=self.smoothTrace, takefocus=0), row=26, column=2, columnspan=2 ) ]
 
         # there's probably a better way to do this than indexing into self.TkWidgets
         self.TkWidgets[6]['widget'].bind('<Return>', lambda ev: self.TkWidgets[0]['widget'].focus())
@@ -1888,10 +4276,12 @@ class TraceModule(object):
             self.app.bind('<Control-r>', self.recolor )
             self.app.bind('<Control-c>', self.copy )
             self.app.bind('<Control-v>', self.paste )
+            self.app.bind('<Control-f>', self.refine )
         else:
             self.app.bind('<Command-r>', self.recolor )
             self.app.bind('<Command-c>', self.copy )
             self.app.bind('<Command-v>', self.paste )
+            self.app.bind('<Command-f>', self.refine )
         self.grid()
 
     def update(self):
@@ -1921,7 +4311,7 @@ class TraceModule(object):
 
         trace = self.getCurrentTraceName() if _trace==None else _trace
         color  = self.available[ trace ]['color']
-        ch = Crosshairs( self.app.Dicom.zframe, x, y, color, transform )
+        ch = Crosshairs( self.app.Dicom.zframe, x, y, color, transform, trace=trace )
         if trace not in self.crosshairs:
             self.crosshairs[ trace ] = []
         self.crosshairs[ trace ].append( ch )
@@ -1953,22 +4343,16 @@ class TraceModule(object):
         frame = self.app.frame
         for trace in self.available:
             try:
-                newCrosshairs = []
                 for item in self.app.Data.getTraceCurrentFrame(trace):
-                    ch = self.add( item['x'], item['y'], _trace=trace, transform=False )
-                    if trace not in self.crosshairs:
-                        self.crosshairs[ trace ] = []
-                    self.crosshairs[ trace ].append( ch )
-                    newCrosshairs.append( ch )
-                self.app.Control.push({ 'type':'add', 'chs':newCrosshairs })
+                    self.add( item['x'], item['y'], _trace=trace, transform=False ) # (add() keeps track of it)
             except KeyError:
                 pass
-    def write(self):
+    def write(self, _trace=None):
         '''
         write out the coordinates of all of our crosshairs to the metadata file:
         '''
 
-        trace = self.getCurrentTraceName()
+        trace = self.getCurrentTraceName() if _trace==None else _trace
         traces = []
 
         # prepare trace data in format for metadata array
@@ -1980,8 +4364,11 @@ class TraceModule(object):
                     if data not in traces:
                         # add trace to temporary array for including in metadata array
                         traces.append(data)
+        # journal the change for undo/redo
+        before = self.app.Data.getTraceCurrentFrame( trace )
+        self.app.Control.record( trace, self.app.Data.getCurrentFilename(), self.app.frame, before, traces )
         # add to metadata array and update file
-        self.app.Data.setCurrentTraceCurrentFrame( traces )
+        self.app.Data.setTraceCurrentFrame( trace, traces )
         # update tier labels for number of annotated frames
         self.app.TextGrid.updateTierLabels()
 
@@ -2020,6 +4407,43 @@ class TraceModule(object):
             ch.unselect()
         self.selected = set()
 
+    def moveSelected(self, dx, dy):
+        ''' move all selected crosshairs by a canvas offset, using a single canvas call '''
+        self.app.Dicom.zframe.canvas.move( 'selectedCrosshairs', dx, dy )
+        for ch in self.selected:
+            ch.shift( dx, dy )
+    def getVisibleCoords(self):
+        '''
+        returns a list of the visible crosshairs (across all traces) along with an
+        (n,2) array of their canvas coordinates, in the same order
+        '''
+        chs = [ ch for trace in self.crosshairs for ch in self.crosshairs[ trace ] if ch.isVisible ]
+        coords = np.array([ (ch.x, ch.y) for ch in chs ], dtype=float).reshape(-1,2)
+        return chs, coords
+    def selectRegion(self, box=None, path=None):
+        '''
+        select the crosshairs of every visible trace that fall within a box
+        (x1,y1,x2,y2) or a lasso path, using the current selection mode
+        '''
+        chs, coords = self.getVisibleCoords()
+        selected = np.array([ ch in self.selected for ch in chs ], dtype=bool)
+        mask = self.selector.select( coords, selected, box=box, path=path )
+        for ch, was, now in zip(chs, selected, mask):
+            if now and not was:
+                self.select(ch)
+            elif was and not now:
+                self.unselect(ch)
+    def getSelectedTraces(self):
+        ''' return the set of trace names with at least one selected crosshairs '''
+        return { ch.trace for ch in self.selected }
+    def setSelectMode(self, mode=None):
+        ''' wrapper for changing how box/lasso selections combine with the current selection '''
+        self.selector.mode = self.selectModeSV.get() if mode==None else mode
+    def setSelectShape(self):
+        ''' toggle between box and lasso selections '''
+        self.selector.shape = 'lasso' if self.lassoBV.get() else 'box'
+        self.app.Dicom.zframe.rect.lasso = self.lassoBV.get()
+
     def getNearClickAllTraces(self, click):
         '''
         takes a click object ( (x,y) tuple ) and returns a list of crosshairs
@@ -2043,10 +4467,7 @@ class TraceModule(object):
                 # if we got something
                 if nearby != None:
                     # switch to that trace and exit the loop
-                    for i, item in enumerate(self.listbox.get(0, END)):
-                        if item==trace:
-                            self.listbox.selection_clear(0, END)
-                            self.listbox.select_set( i )
+                    self.selectTrace( trace )
                     return nearby
 
         return None
@@ -2087,12 +4508,9 @@ class TraceModule(object):
     def paste(self, event=None):
         ''' pastes copied crosshairs and add them to undo/redo buffer '''
         if len(self.copied) > 0:
-            newChs = []
             for xy in self.copied:
-                ch = self.add(xy[0],xy[1], transform=False)
-                newChs.append(ch)
-            self.write()
-            self.app.Control.push({ 'type':'add', 'chs':newChs })
+                self.add(xy[0],xy[1], transform=False)
+            self.write() # also journals the pasted points
 
     def recolor(self, event=None, trace=None, color=None):
         ''' change the color of a particular trace '''
@@ -2122,16 +4540,11 @@ class TraceModule(object):
         ''' remove all crosshairs for the current trace '''
 
         # now we remove all the traces and save
-        deleted = []
         trace = self.getCurrentTraceName()
         if trace in self.crosshairs:
             for ch in self.crosshairs[ trace ]:
-                if ch.isVisible:
-                    deleted.append( ch )
                 self.remove( ch, write=False )
             self.write()
-
-        self.app.Control.push({ 'type':'delete', 'chs':deleted })
     def newTrace(self):
         ''' add a new trace to our listbox '''
 
@@ -2181,6 +4594,286 @@ class TraceModule(object):
             if not( fromUndo ):
                 self.app.Control.push({ 'type':'rename', 'old':oldName, 'new':newName })
 
+    def selectTrace(self, trace):
+        ''' make `trace` the selected item in our listbox '''
+        for i, item in enumerate(self.listbox.get(0, END)):
+            if item==trace:
+                self.listbox.selection_clear(0, END)
+                self.listbox.select_set( i )
+    def removeTrace(self, trace):
+        ''' drop a trace (and all of its data) from the metadata and our listbox '''
+        if trace in self.available:
+            self.available.pop( trace )
+            self.app.Data.setTopLevel( 'traces', self.available )
+            self.app.Control.forget( trace )
+        for i, item in enumerate(self.listbox.get(0, END)):
+            if item==trace:
+                self.listbox.delete( i )
+                break
+    def getProposalName(self, trace=None):
+        '''
+        returns the name of the proposal trace belonging to `trace` (default: the
+        current trace, which may itself be a proposal)
+        '''
+        trace = self.getCurrentTraceName() if trace==None else trace
+        if trace in self.available and 'proposalFor' in self.available[ trace ]:
+            return trace
+        return trace + _PROPOSAL_SUFFIX
+    def propagate(self, event=None):
+        '''
+        fit the current trace on the current frame to each following frame of the
+        selected TextGrid interval, and save the results to a proposal trace (named
+        with a trailing _PROPOSAL_SUFFIX) that can then be accepted or rejected.
+        The fitting runs on a background thread, see finishPropagation()
+        '''
+        trace = self.getCurrentTraceName()
+        if trace == None or not self.app.Dicom.isLoaded:
+            return
+        if self.propagation != None:
+            print( 'Still propagating, please wait for it to finish' )
+            return
+        if 'proposalFor' in self.available[ trace ]:
+            trace = self.available[ trace ][ 'proposalFor' ]
+        points = [ (pt['x'], pt['y']) for pt in self.app.Data.getTraceCurrentFrame( trace ) ]
+        frames = sorted( int(f) for f in self.app.TextGrid.selectedIntvlFrames if int(f) > self.app.frame )
+        if len(points) < 2 or len(frames) == 0:
+            print( 'To propagate, select an interval and trace at least two points on one of its frames' )
+            return
+
+        # start a fresh proposal for this file
+        proposal = self.getProposalName( trace )
+        filename = self.app.Data.getCurrentFilename()
+        if proposal not in self.available:
+            self.available[ proposal ] = { 'color':_PROPOSAL_COLOR, 'files':{}, 'proposalFor':trace }
+            self.listbox.insert(END, proposal)
+        self.available[ proposal ][ 'files' ][ filename ] = {}
+
+        # each frame is seeded by the one before, so the frames are fitted in turn,
+        # but off the Tk thread so that the app stays responsive meanwhile
+        propagator = ContourPropagator( self.app.Dicom.frameCache )
+        fileid = self.app.currentFID
+        results = []
+        def run():
+            for frame, fitted in propagator.propagate( points, frames, fileid ):
+                results.append( (frame, fitted) )
+                printProgressBar(len(results), len(frames), prefix = 'Propagating:', suffix = 'Complete', length = 50)
+        thread = threading.Thread( target=run, daemon=True )
+        self.propagation = ( thread, results, proposal, filename, len(frames) )
+        thread.start()
+        self.app.after( _PROPAGATE_POLL_MS, self.finishPropagation )
+    def finishPropagation(self):
+        '''
+        save the results of propagate() to the proposal trace once the background
+        thread is done (until then, check again every _PROPAGATE_POLL_MS)
+        '''
+        thread, results, proposal, filename, total = self.propagation
+        if thread.is_alive():
+            self.app.after( _PROPAGATE_POLL_MS, self.finishPropagation )
+            return
+        self.propagation = None
+        if proposal not in self.available: # (rejected in the meantime)
+            return
+        with self.app.Data.transaction():
+            for frame, fitted in results:
+                crosshairs = [ { 'x':x, 'y':y } for x, y in fitted.tolist() ]
+                self.app.Data.setTraceFrame( proposal, filename, frame, crosshairs )
+        if len(results) < total:
+            print()
+            warn( 'Propagation stopped after %d of %d frames (missing processed frames)' % (len(results), total) )
+        self.app.TextGrid.updateTierLabels()
+    def acceptProposal(self, event=None):
+        ''' copy the proposal frames onto the trace it was made for, as a single undo entry '''
+        proposal = self.getProposalName()
+        if proposal not in self.available:
+            return
+        trace = self.available[ proposal ][ 'proposalFor' ]
+        self.app.Control.beginGesture()
+        with self.app.Data.transaction():
+            for filename, frames in self.available[ proposal ][ 'files' ].items():
+                for frame, crosshairs in frames.items():
+                    before = self.app.Data.getTraceFrame( trace, filename, frame )
+                    self.app.Control.record( trace, filename, frame, before, crosshairs )
+                    self.app.Data.setTraceFrame( trace, filename, frame, crosshairs )
+            self.app.Control.endGesture()
+            self.removeTrace( proposal )
+        self.selectTrace( trace )
+        self.update()
+        self.app.TextGrid.updateTierLabels()
+    def rejectProposal(self, event=None):
+        ''' throw away the proposal trace '''
+        proposal = self.getProposalName()
+        if proposal not in self.available:
+            return
+        trace = self.available[ proposal ][ 'proposalFor' ]
+        self.removeTrace( proposal )
+        self.selectTrace( trace )
+        self.update()
+        self.app.TextGrid.updateTierLabels()
+    def refine(self, event=None, trace=None, write=True):
+        '''
+        snap the crosshairs of a trace (default: the current one) on the current
+        frame to the nearby edges; pass write=False to leave the write (and undo
+        entry) to the caller
+        '''
+        trace = self.getCurrentTraceName() if trace==None else trace
+        # fit each point once, as write() saves them: crosshairs on the same spot
+        # would give the snake zero-length tangents, so they move together
+        points = collections.OrderedDict()
+        for ch in self.crosshairs.get( trace, [] ):
+            if ch.isVisible:
+                points.setdefault( ch.getTrueCoords(), [] ).append( ch )
+        if len(points) < 3 or not self.app.Dicom.isLoaded:
+            return
+        refined = self.getSnake().refine( list(points), self.app.frame )
+        if refined is None:
+            return
+        for chs, (x, y) in zip( points.values(), refined.tolist() ):
+            for ch in dict.fromkeys( chs ):
+                ch.dragTo( ch.transformTrueToCoords(x, y) )
+        if write:
+            self.write( trace )
+    def getSnake(self):
+        '''
+        the ActiveContour used for refining, made once (the Dicom module and its
+        frame cache don't exist yet when we're initialized) so that its
+        precomputed inverses carry over between refines
+        '''
+        if self.snake == None:
+            self.snake = ActiveContour( self.app.Dicom.frameCache )
+        return self.snake
+    def refineInterval(self, event=None):
+        '''
+        snap the current trace to the nearby edges on every traced frame of the
+        selected TextGrid interval, as a single undo entry
+        '''
+        trace = self.getCurrentTraceName()
+        if trace == None or not self.app.Dicom.isLoaded:
+            return
+        filename = self.app.Data.getCurrentFilename()
+        contours = {}
+        for frame in self.app.TextGrid.selectedIntvlFrames:
+            points = self.app.Data.getTraceFrame( trace, filename, frame )
+            if len(points) >= 3:
+                contours[ frame ] = [ (pt['x'], pt['y']) for pt in points ]
+        if len(contours) == 0:
+            print( 'To refine, select an interval containing traced frames' )
+            return
+
+        self.app.Control.beginGesture()
+        with self.app.Data.transaction():
+            for i, (frame, refined) in enumerate( self.getSnake().refineFrames(contours) ):
+                before = self.app.Data.getTraceFrame( trace, filename, frame )
+                after = [ { 'x':x, 'y':y } for x, y in refined.tolist() ]
+                self.app.Control.record( trace, filename, frame, before, after )
+                self.app.Data.setTraceFrame( trace, filename, frame, after )
+                printProgressBar(i+1, len(contours), prefix = 'Refining:', suffix = 'Complete', length = 50)
+        self.app.Control.endGesture()
+        self.update()
+    def interpolate(self, event=None):
+        '''
+        fill the untraced frames of the selected TextGrid interval that lie between
+        traced keyframes of the current trace, as a single undo entry and a single
+        metadata write
+        '''
+        trace = self.getCurrentTraceName()
+        if trace == None:
+            return
+        filename = self.app.Data.getCurrentFilename()
+        frames = sorted( self.app.TextGrid.selectedIntvlFrames, key=int )
+        keyframes = {}
+        for frame in frames:
+            points = self.app.Data.getTraceFrame( trace, filename, frame )
+            if len(points) >= 2:
+                keyframes[ frame ] = [ (pt['x'], pt['y']) for pt in points ]
+        if len(keyframes) < 2:
+            print( 'To interpolate, select an interval with at least two traced frames' )
+            return
+        first, last = min( map(int, keyframes) ), max( map(int, keyframes) )
+        missing = [ f for f in frames if first < int(f) < last and f not in keyframes ]
+        if len(missing) == 0:
+            return
+
+        filled = interpolateContours( keyframes, missing, self.interpolationSV.get(), self.app.Data.getFrameAspect() )
+        self.app.Control.beginGesture()
+        with self.app.Data.transaction():
+            for frame, points in filled.items():
+                before = self.app.Data.getTraceFrame( trace, filename, frame )
+                after = [ { 'x':x, 'y':y } for x, y in points.tolist() ]
+                self.app.Control.record( trace, filename, frame, before, after )
+                self.app.Data.setTraceFrame( trace, filename, frame, after )
+        self.app.Control.endGesture()
+        self.update()
+        self.app.TextGrid.updateTierLabels()
+    def checkTrace(self, event=None):
+        ''' flag frames of the current trace whose contour jumps relative to its neighbours '''
+        numbers, scores, flagged = TraceQA( aspect=self.app.Data.getFrameAspect() ).check( self.app.Data.getCurrentTraceAllFrames() )
+        self.app.TextGrid.setFlaggedFrames( numbers[ flagged ] )
+        print( 'flagged %d of %d traced frames' % (np.count_nonzero(flagged), len(numbers)) )
+    def nextFlagged(self, event=None):
+        self.app.TextGrid.nextFlaggedFrame()
+    def smoothTrace(self, event=None):
+        ''' smooth the current trace across time, as a single undo entry '''
+        trace = self.getCurrentTraceName()
+        if trace == None:
+            return
+        filename = self.app.Data.getCurrentFilename()
+        smoothed = TraceQA( aspect=self.app.Data.getFrameAspect() ).smooth( self.app.Data.getCurrentTraceAllFrames() )
+        self.app.Control.beginGesture()
+        with self.app.Data.transaction():
+            for frame, after in smoothed.items():
+                before = self.app.Data.getTraceFrame( trace, filename, frame )
+                self.app.Control.record( trace, filename, frame, before, after )
+                self.app.Data.setTraceFrame( trace, filename, frame, after )
+        self.app.Control.endGesture()
+        self.update()
+        if self.app.TextGrid.flaggedFrames:
+            self.checkTrace()
+    def showMeanLayer(self):
+        ''' toggle the mean-contour overlay '''
+        if not _DICOM_LIBS_INSTALLED:
+            return
+        if self.meanBV.get():
+            self.app.Dicom.zframe.addLayer( 'mean', self.drawMeanLayer )
+            self.update() # keep the crosshairs on top
+        else:
+            self.app.Dicom.zframe.removeLayer( 'mean' )
+    def showOnionSkin(self):
+        ''' toggle the onion-skin overlay (or apply a new radius) '''
+        if not _DICOM_LIBS_INSTALLED:
+            return
+        zframe = self.app.Dicom.zframe
+        self.onionSkin.clear( zframe.canvas )
+        try:
+            self.onionSkin.radius = max( 1, self.onionIV.get() )
+        except TclError:
+            pass # not a number (yet)
+        if self.onionBV.get():
+            zframe.addLayer( 'onion', self.onionSkin.draw )
+            self.update() # keep the crosshairs on top
+        else:
+            zframe.removeLayer( 'onion' )
+    def drawMeanLayer(self, zframe):
+        '''
+        draw the mean (+/- 1 SD) of the current trace over frames with the same
+        label as the current frame, on the selected TextGrid tier
+        '''
+        zframe.canvas.delete( 'layer-mean' )
+        trace = self.getCurrentTraceName()
+        tier = self.app.TextGrid.getSelectedTierName()
+        if trace == None or tier == None:
+            return
+        statistics = self.app.Data.getContourStatistics()
+        labels = dict( statistics.getLabelMap( self.app.Data.getCurrentFilename() ).get( str(self.app.frame), [] ) )
+        if tier not in labels:
+            return
+        band = statistics.getBand( trace, tier, labels[tier] )
+        if band == None:
+            return
+        mean, upper, lower = band
+        color = self.available[ trace ][ 'color' ]
+        zframe.canvas.create_line( *zframe.toCanvas(upper), fill=color, dash=(4,4), tags='layer-mean' )
+        zframe.canvas.create_line( *zframe.toCanvas(lower), fill=color, dash=(4,4), tags='layer-mean' )
+        zframe.canvas.create_line( *zframe.toCanvas(mean), fill=color, width=2, tags='layer-mean' )
     def getRandomHexColor(self):
         ''' helper for getting a random color '''
         return '#%06x' % random.randint(0, 0xFFFFFF)
@@ -2216,6 +4909,8 @@ class PlaybackModule(object):
     def __init__(self, app):
         self.app = app
         self.current = None
+        self.sound = None # parselmouth.Sound of self.current, decoded once per recording (see loadSound())
+        self.samples = None # its samples, one row per channel
         if _AUDIO_LIBS_INSTALLED:
             print( ' - initializing module: Audio' )
             self.sfile = None
@@ -2248,9 +4943,12 @@ class PlaybackModule(object):
         '''
         if _AUDIO_LIBS_INSTALLED:
             self.current = None
+            self.sound = None
+            self.samples = None
             audioFallbacks = [ '.wav', '.flac', '.ogg', '.mp3' ]
             for codec in audioFallbacks:
                 if self.loadAudio( codec ) == True:
+                    self.loadSound()
                     self.playBtn.config( state=NORMAL )
                     return
 
@@ -2269,6 +4967,29 @@ class PlaybackModule(object):
                 print('Unable to load audio file: `%s`' % audiofile)
                 return False
 
+    def loadSound(self):
+        '''
+        decode the current audio file for the spectrogram, which then only takes
+        slices of it (see getSoundPart())
+        '''
+        try:
+            self.sound = parselmouth.Sound( self.current )
+            self.samples = self.sound.values
+        except parselmouth.PraatError:
+            print('Unable to decode audio file for the spectrogram: `%s`' % self.current)
+            self.sound = None
+            self.samples = None
+
+    def getSoundPart(self, start, end):
+        '''
+        parselmouth.Sound of the samples between `start` and `end` (in seconds)
+        of the current recording
+        '''
+        rate = self.sound.sampling_frequency
+        first = max(0, int(math.floor(start*rate)))
+        last = min(self.samples.shape[1], int(math.ceil(end*rate)))
+        return parselmouth.Sound( self.samples[:,first:last], sampling_frequency=rate )
+
     def playpauseAV(self, event):
         '''
 
@@ -2283,8 +5004,8 @@ class PlaybackModule(object):
             if self.app.TextGrid.selectedItem:
                 start, end = self.app.TextGrid.getMinMaxTime()
             else:
-                start = self.app.TextGrid.start
-                end = self.app.TextGrid.end
+                start = self.app.TextGrid.timeline.start
+                end = self.app.TextGrid.timeline.end
 
             # if _VIDEO_LIBS_INSTALLED and _AUDIO_LIBS_INSTALLED:
             #     self.readyVideo()
@@ -2303,7 +5024,7 @@ class PlaybackModule(object):
             if self.app.Dicom.isLoaded:
                 self.readyVideo()
             if _AUDIO_LIBS_INSTALLED:
-                self.readyAudio(start, end)
+                self.readyAudio(toSeconds(start), toSeconds(end))
                 self.playAudio()
             elif self.app.Dicom.isLoaded:
                 self.dicomframeQ = queue.Queue()
@@ -2353,8 +5074,7 @@ class PlaybackModule(object):
         '''
 
         '''
-        tags = self.app.TextGrid.selectedItem[0].gettags(self.app.TextGrid.selectedItem[1])
-        framenums = [tag[5:] for tag in tags if tag[:5]=='frame']
+        framenums = self.app.TextGrid.getItemFrames(*self.app.TextGrid.selectedItem)
         self.framestart = int(framenums[0])
         png_locs = [self.app.Data.getPreprocessedDicom(frame) for frame in framenums]
         canvas = self.app.Dicom.zframe.canvas
@@ -2529,6 +5249,9 @@ class DicomModule(object):
             # zoom frame (contains our tracing canvas)
             self.zframe = ZoomFrame(self.app.RIGHT, 1.3, app)
 
+            # decoded frames for the tracing helpers
+            self.frameCache = FrameCache(app)
+
             # reset zoom button
             self.zoomResetBtn = Button(self.app.LEFT, text='Reset image', command=self.zoomReset, takefocus=0)#, pady=7 )
 
@@ -2689,6 +5412,7 @@ class DicomModule(object):
         self.isLoaded = False
         self.dicom = None
         self.zframe.shown = False
+        self.frameCache.clear()
         pngs_missing = False
 
         # detect if processed pngs listed in metadata file actually exist on system
@@ -2745,17 +5469,35 @@ class ControlModule(object):
     execute the inverse of that action, pushing the inverse action to the other
     stack (so its inversion can also be executed).
 
-    Note: both stacks get cleared on
-        - change files
-        - change frames
-        - Dicom.resetZoom()
+    Actions are recorded in terms of the metadata rather than live Crosshairs
+    objects, i.e. as (trace, file, frame, point indices, coordinates), so that
+    the stacks survive changing frames and files.  Together they form a journal
+    whose (JSON-encoded) size is capped at `maxBytes` (oldest entries get dropped
+    first) and which is optionally saved next to the metadata file, so that a
+    session can still be undone after a restart.  Both can be configured with the
+    `undoJournal` key of the metadata, e.g. { "maxBytes":1048576, "persist":true }
+
+    Actions recorded between beginGesture() and endGesture() (e.g. everything that
+    happens between pressing and releasing the mouse) are coalesced into a single
+    entry, and the buttons are only updated once the gesture ends.
     '''
     def __init__(self, app):
         print( ' - initializing module: Control' )
         # reference to our main object containing other functionality managers
         self.app = app
+        # journal settings
+        config = self.app.Data.getTopLevel( 'undoJournal' )
+        config = {} if config==None else config
+        self.maxBytes = config.get( 'maxBytes', _UNDO_JOURNAL_MAX_BYTES )
+        self.persist = config.get( 'persist', _UNDO_JOURNAL_PERSIST )
+        self.journalfile = os.path.join( self.app.Data.path, 'undo-journal.json' )
         # initialize our stacks
+        self.uStack = [] # undo
+        self.rStack = [] # redo
+        self.bytes = 0 # total size of the items on both stacks
+        self.saveAfterId = None # pending save(), see requestSave()
         self.reset()
+        self.load()
         # bind Ctrl+z to UNDO and Ctrl+Shift+Z to REDO
         if _PLATFORM == 'Linux':
             self.app.bind('<Control-z>', self.undo )
@@ -2774,89 +5516,261 @@ class ControlModule(object):
         add an item to the undo-stack
         and empty out the redo-stack
         '''
-        self.uStack.append( item )
+        if item == None:
+            return
+        if self.gesture != None:
+            self.gesture[ len(self.gesture) ] = item
+            return
+        self.uStack.append( self.stamp(item) )
+        self.bytes += item['bytes'] - sum( it['bytes'] for it in self.rStack )
         self.rStack = []
+        self.trim()
+        self.requestSave()
         self.updateButtons()
+    def record(self, trace, filename, frame, before, after):
+        '''
+        journal a change to the points (lists of {'x':..,'y':..}) of a trace on a
+        given file and frame
+        '''
+        key = ( trace, filename, str(frame) )
+        if self.gesture != None:
+            # keep the state from before the gesture, and the latest state
+            if key in self.gesture:
+                before = self.gesture[ key ][0]
+            self.gesture[ key ] = ( before, after )
+            return
+        self.push( self.diff(key, before, after) )
+    def diff(self, key, before, after):
+        '''
+        compact representation of the change between two lists of points:
+            - same number of points : a `move` of the points at `indices`
+            - otherwise : a `splice` replacing before[index:...] with after[index:...]
+        returns None if nothing changed
+        '''
+        trace, filename, frame = key
+        b = [ [ pt['x'], pt['y'] ] for pt in before ]
+        a = [ [ pt['x'], pt['y'] ] for pt in after ]
+        item = { 'trace':trace, 'file':filename, 'frame':frame }
+        if len(b) == len(a):
+            if len(b) == 0:
+                return None
+            changed = np.flatnonzero( np.any( np.abs(np.array(b) - np.array(a)) > _UNDO_JOURNAL_TOLERANCE, axis=1 ) )
+            if len(changed) == 0:
+                return None
+            item.update({ 'type':'move', 'indices':changed.tolist(),
+                'start':[ b[i] for i in changed ], 'end':[ a[i] for i in changed ] })
+        else:
+            same = lambda p, q: abs(p[0]-q[0]) <= _UNDO_JOURNAL_TOLERANCE and abs(p[1]-q[1]) <= _UNDO_JOURNAL_TOLERANCE
+            prefix = 0
+            while prefix < min(len(b), len(a)) and same(b[prefix], a[prefix]):
+                prefix += 1
+            suffix = 0
+            while suffix < min(len(b), len(a)) - prefix and same(b[-1-suffix], a[-1-suffix]):
+                suffix += 1
+            item.update({ 'type':'splice', 'index':prefix,
+                'before':b[ prefix:len(b)-suffix ], 'after':a[ prefix:len(a)-suffix ] })
+        return item
+    def beginGesture(self):
+        ''' start collecting recorded changes into a single undo entry '''
+        self.gesture = {}
+    def endGesture(self):
+        ''' push everything collected since beginGesture() as one entry '''
+        if self.gesture == None:
+            return
+        gesture, self.gesture = self.gesture, None
+        items = []
+        for key, value in gesture.items():
+            item = self.diff( key, *value ) if isinstance(key, tuple) else value
+            if item != None:
+                items.append( item )
+        if items:
+            self.push( items[0] if len(items)==1 else { 'type':'compound', 'items':items } )
     def reset(self):
-        ''' reset our stacks '''
-        self.uStack = [] # undo
-        self.rStack = [] # redo
+        ''' drop any unfinished gesture (the stacks themselves survive navigation) '''
+        self.gesture = None # changes collected during a press-to-release gesture
     def update(self):
         ''' changing files and changing frames should have the same effect '''
         self.reset()
+    def stamp(self, item):
+        ''' remember the (JSON-encoded) size of an item for enforcing the memory cap '''
+        item.pop( 'bytes', None )
+        item[ 'bytes' ] = len( json.dumps(item, separators=(',',':')) )
+        return item
+    def trim(self):
+        ''' drop the oldest entries until the journal fits in maxBytes '''
+        while self.bytes > self.maxBytes and len(self.uStack) + len(self.rStack) > 1:
+            stack = self.uStack if len(self.uStack) else self.rStack
+            self.bytes -= stack.pop(0)[ 'bytes' ]
+    def forget(self, trace):
+        '''
+        drop everything journaled for a trace that's being removed (e.g. a
+        proposal that was accepted or rejected), so undo can't bring it back
+        '''
+        def keep(item):
+            if item['type'] == 'compound':
+                items = [ it for it in map(keep, item['items']) if it != None ]
+                return self.stamp( dict(item, items=items) ) if items else None
+            return None if trace in ( item.get('trace'), item.get('old'), item.get('new') ) else item
+        self.uStack = [ item for item in map(keep, self.uStack) if item != None ]
+        self.rStack = [ item for item in map(keep, self.rStack) if item != None ]
+        self.bytes = sum( item['bytes'] for item in self.uStack + self.rStack )
+        self.requestSave()
+        self.updateButtons()
+    def requestSave(self):
+        '''
+        save() once there have been no changes for _UNDO_JOURNAL_WRITE_DELAY ms,
+        rather than rewriting the journal on every gesture
+        '''
+        if self.persist:
+            if self.saveAfterId != None:
+                self.app.after_cancel( self.saveAfterId )
+            self.saveAfterId = self.app.after( _UNDO_JOURNAL_WRITE_DELAY, self.save )
+    def flush(self):
+        ''' save() now if there's a save pending (e.g. when closing the app) '''
+        if self.saveAfterId != None:
+            self.save()
+    def save(self):
+        ''' write the journal next to the metadata file '''
+        if self.saveAfterId != None:
+            self.app.after_cancel( self.saveAfterId )
+            self.saveAfterId = None
+        if self.persist:
+            tmpfile = self.journalfile + '.tmp'
+            with open( tmpfile, 'w' ) as f:
+                json.dump({ 'undo':self.uStack, 'redo':self.rStack }, f, separators=(',',':'))
+            os.replace( tmpfile, self.journalfile )
+    def load(self):
+        ''' read the journal from a previous session (if there is one) '''
+        if self.persist and os.path.exists( self.journalfile ):
+            try:
+                with open( self.journalfile, 'r' ) as f:
+                    journal = json.load( f )
+                self.uStack = [ self.stamp(item) for item in journal['undo'] ]
+                self.rStack = [ self.stamp(item) for item in journal['redo'] ]
+                self.bytes = sum( item['bytes'] for item in self.uStack + self.rStack )
+                self.trim()
+                print( '   - found undo journal with %d entries' % len(self.uStack) )
+            except (ValueError, KeyError, OSError) as e:
+                warn( 'Unable to read undo journal `%s` (%s)' % (self.journalfile, e) )
+    def applies(self, item):
+        '''
+        whether an item still describes the metadata, i.e. its trace exists and
+        holds the points it left behind (entries from a previous session can be
+        stale, e.g. if the metadata was edited or traces were removed since)
+        '''
+        traces = self.app.Data.getTopLevel( 'traces' )
+        same = lambda pt, xy: abs(pt['x']-xy[0]) <= _UNDO_JOURNAL_TOLERANCE and abs(pt['y']-xy[1]) <= _UNDO_JOURNAL_TOLERANCE
+        if item['type'] in ( 'move', 'splice' ):
+            if item['trace'] not in traces:
+                return False
+            points = self.app.Data.getTraceFrame( item['trace'], item['file'], item['frame'] )
+            if item['type'] == 'move':
+                return all( i < len(points) and same(points[i], xy) for i, xy in zip(item['indices'], item['end']) )
+            index = item['index']
+            after = points[ index:index+len(item['after']) ]
+            return len(after) == len(item['after']) and all( same(pt, xy) for pt, xy in zip(after, item['after']) )
+        elif item['type'] == 'recolor':
+            return item['trace'] in traces
+        elif item['type'] == 'rename':
+            return item['new'] in traces and item['old'] not in traces
+        elif item['type'] == 'compound':
+            return all( self.applies(it) for it in item['items'] )
+        return False
+    def pop(self, stack):
+        '''
+        pop the newest item of a stack that still applies (see applies()),
+        dropping (with a warning) any that don't; None if there are none
+        '''
+        while len(stack):
+            item = stack.pop()
+            self.bytes -= item['bytes']
+            if self.applies( item ):
+                return item
+            warn( 'Dropping %s journal entry for `%s` that no longer matches the metadata' % (item['type'], item.get('trace', item.get('new'))) )
+        return None
+    def revert(self, item, touched):
+        '''
+        execute the inverse of an item and return the item describing what we did
+        (so that reverting the returned item re-does the original); (file, frame)
+        pairs whose points changed are appended to `touched`
+        '''
+        if item['type'] in ( 'move', 'splice' ):
+            points = list( self.app.Data.getTraceFrame( item['trace'], item['file'], item['frame'] ) )
+            inverse = dict( item )
+            if item['type'] == 'move':
+                for i, (x, y) in zip( item['indices'], item['start'] ):
+                    if i < len(points):
+                        points[i] = { 'x':x, 'y':y }
+                inverse.update({ 'start':item['end'], 'end':item['start'] })
+            else:
+                index = item['index']
+                points[ index:index+len(item['after']) ] = [ { 'x':x, 'y':y } for x, y in item['before'] ]
+                inverse.update({ 'before':item['after'], 'after':item['before'] })
+            self.app.Data.setTraceFrame( item['trace'], item['file'], item['frame'], points )
+            touched.append( (item['file'], item['frame']) )
+            return inverse
+        elif item['type'] == 'recolor':
+            oldColor = self.app.Trace.recolor( trace=item['trace'], color=item['color'] )
+            return { 'type':'recolor', 'trace':item['trace'], 'color':oldColor }
+        elif item['type'] == 'rename':
+            self.app.Trace.renameTrace( oldName=item['new'], newName=item['old'] )
+            return { 'type':'rename', 'old':item['new'], 'new':item['old'] }
+        elif item['type'] == 'compound':
+            # undo the parts in reverse order
+            return { 'type':'compound', 'items':[ self.revert(it, touched) for it in reversed(item['items']) ] }
+        else:
+            print (item)
+            raise NotImplementedError
+    def refresh(self, touched):
+        '''
+        show the result of an undo/redo: redraw the current frame if it changed,
+        otherwise jump to the (first) file and frame that did
+        '''
+        if len(touched) == 0:
+            return
+        if ( self.app.Data.getCurrentFilename(), str(self.app.frame) ) in touched:
+            self.app.Trace.update()
+            self.app.TextGrid.updateTierLabels()
+            return
+        filename, frame = touched[0]
+        if filename != self.app.Data.getCurrentFilename() and filename in self.app.Data.files:
+            self.app.currentFID = self.app.Data.files.index( filename )
+            self.app.filesUpdate()
+        self.app.frame = int( frame )
+        self.app.framesUpdate()
     def undo(self, event=None):
         ''' perform the undo-ing '''
 
-        if len(self.uStack):
-            item = self.uStack.pop()
-
-            if item['type'] == 'add':
-                chs = item['chs']
-                for ch in chs:
-                    self.app.Trace.remove( ch )
-                self.rStack.append({ 'type':'delete', 'chs':chs })
-            elif item['type'] == 'delete':
-                chs = item['chs']
-                for ch in chs:
-                    ch.draw()
-                self.rStack.append({ 'type':'add', 'chs':chs })
-            elif item['type'] == 'move':
-                chs = item['chs']
-                coords = item['coords']
-                for i in range(len(chs)):
-                    chs[i].dragTo( coords[i] )
-                self.rStack.append({ 'type':'move', 'chs':chs, 'coords':coords })
-            elif item['type'] == 'recolor':
-                oldColor = self.app.Trace.recolor( item['trace'], item['color'] )
-                self.rStack.append({ 'type':'recolor', 'trace':item['trace'], 'color':oldColor })
-            elif item['type'] == 'rename':
-                self.app.Trace.renameTrace( newName=item['old'], oldName=item['new'] ) # this is backwards on purpose
-                self.rStack.append({ 'type':'rename', 'old':item['old'], 'new':item['new'] })
-            else:
-                print (item)
-                raise NotImplementedError
-
-            self.app.Trace.unselectAll()
-            self.app.Trace.write()
+        item = self.pop( self.uStack )
+        if item != None:
+            touched = []
+            with self.app.Data.transaction():
+                self.rStack.append( self.stamp(self.revert(item, touched)) )
+            self.bytes += self.rStack[-1]['bytes']
+            self.trim()
+            self.requestSave()
             self.updateButtons()
+            self.refresh( touched )
         else:
+            self.requestSave() # (stale entries may have been dropped)
+            self.updateButtons()
             print( 'Nothing to undo!' )
     def redo(self, event=None):
         ''' perform the redo-ing '''
 
-        if len(self.rStack):
-            item = self.rStack.pop()
-
-            if item['type'] == 'add':
-                chs = item['chs']
-                for ch in chs:
-                    self.app.Trace.remove( ch )
-                self.uStack.append({ 'type':'delete', 'chs':chs })
-            elif item['type'] == 'delete':
-                chs = item['chs']
-                for ch in chs:
-                    ch.draw()
-                self.uStack.append({ 'type':'add', 'chs':chs })
-            elif item['type'] == 'move':
-                chs = item['chs']
-                coords = item['coords']
-                for i in range(len(chs)):
-                    chs[i].dragTo( coords[i] )
-                self.uStack.append({ 'type':'move', 'chs':chs, 'coords':coords })
-            elif item['type'] == 'recolor':
-                oldColor = self.app.Trace.recolor( item['trace'], item['color'] )
-                self.uStack.append({ 'type':'recolor', 'trace':item['trace'], 'color':oldColor })
-            elif item['type'] == 'rename':
-                self.app.Trace.renameTrace( newName=item['new'], oldName=item['old'] )
-                self.uStack.append({ 'type':'rename', 'old':item['old'], 'new':item['new'] })
-            else:
-                print (item)
-                raise NotImplementedError
-
-            self.app.Trace.unselectAll()
-            self.app.Trace.write()
+        item = self.pop( self.rStack )
+        if item != None:
+            touched = []
+            with self.app.Data.transaction():
+                self.uStack.append( self.stamp(self.revert(item, touched)) )
+            self.bytes += self.uStack[-1]['bytes']
+            self.trim()
+            self.requestSave()
             self.updateButtons()
+            self.refresh( touched )
         else:
+            self.requestSave()
+            self.updateButtons()
             print( 'Nothing to redo!' )
     def updateButtons(self):
         '''
@@ -2919,9 +5833,8 @@ class App(ThemedTk):
             super().__init__()
 
         # check if we were passed a command line argument
-        parser = argparse.ArgumentParser()
-        parser.add_argument('path', help='path (unique to a participant) where subdirectories contain raw data', default=None, nargs='?')
-        args = parser.parse_args()
+        args = parseArgs()
+        self.reportLatency = args.latency
 
         # initialize data module
         self.Data = MetadataModule( self, args.path )
@@ -2961,6 +5874,7 @@ class App(ThemedTk):
         self.frame = 0            # current frame of dicom file
         self.isClicked = False    # used in handling of canvas click events
         self.isDragging = False # used in handling of canvas click events
+        self.motion = MotionPipeline(self, self.processMotion) # throttles <Motion> events
         # self.resized = False     #for changing widgets after window resize
         self.selectBoxX = False
         self.selectBoxY = False
@@ -3056,6 +5970,7 @@ class App(ThemedTk):
         self.bind('<ButtonRelease-1>', self.onRelease)
         self.bind('<Double-Button-1>', self.onDoubleClick)
         self.bind('<Escape>', self.onEscape )
+        self.protocol('WM_DELETE_WINDOW', self.onClose )
         # self.count = 0
 
         self.framesEntryText.bind('<Return>', self.unfocusAndJump)
@@ -3108,6 +6023,7 @@ class App(ThemedTk):
         self.Spectrogram.canvas_width = x
         self.Spectrogram.canvas.config(width=x)
         self.TextGrid.canvas_width = x
+        self.TextGrid.timeline.width = x
         for t in range(len(self.TextGrid.TkWidgets)):
             tierWidgets = self.TextGrid.TkWidgets[t]
             canvas = None
@@ -3149,12 +6065,13 @@ class App(ThemedTk):
 
             # if we didn't click near anything ...
             if nearby == None:
-                self.Trace.unselectAll()
                 if event.state != 1:
                     # unselect crosshairs
+                    self.Trace.unselectAll()
                     self.isClicked = True
+                    # everything added until release is one undo entry
+                    self.Control.beginGesture()
                     ch = self.Trace.add( *self.click )
-                    self.Control.push({ 'type':'add', 'chs':[ch] })
                 else:
                     self.selectBoxX = self.Dicom.zframe.canvas.canvasx(event.x)
                     self.selectBoxY = self.Dicom.zframe.canvas.canvasy(event.y)
@@ -3182,6 +6099,8 @@ class App(ThemedTk):
                 # set dragging variables
                 self.isDragging = True
                 self.dragClick = self.click
+                # the whole drag is one undo entry
+                self.Control.beginGesture()
 
     def onReleaseZoom(self, event):
         '''
@@ -3189,6 +6108,11 @@ class App(ThemedTk):
         '''
         if self.Dicom.isLoaded:
 
+            # apply whatever motion hasn't been processed yet
+            self.motion.drain()
+            if self.reportLatency and ( self.isDragging or self.isClicked ):
+                print( self.motion.report() )
+
             # select multiple crosshairs
             if self.selectBoxX!=False:
                 canvas = self.Dicom.zframe.canvas
@@ -3199,23 +6123,22 @@ class App(ThemedTk):
                 self.selectBoxX = False
                 self.selectBoxY = False
 
-                trace = self.Trace.getCurrentTraceName()
-                coords = []
-                x1True = None
-
-                if trace in self.Trace.crosshairs:
-                    for ch in self.Trace.crosshairs[ trace ]:
-                        if x1True == None:
-                            x1True, y1True = ch.transformCoordsToTrue(x1,y1)
-                            x2True, y2True = ch.transformCoordsToTrue(x2,y2)
-                        if ch.isVisible:
-                            x,y = ch.getTrueCoords()
-                            if min(x1True,x2True) < x < max(x1True,x2True) and min(y1True,y2True) < y < max(y1True,y2True):
-                                self.Trace.select(ch)
+                # hit-test all visible traces at once (box or lasso)
+                if self.Trace.selector.shape == 'lasso':
+                    self.Trace.selectRegion( path=self.Dicom.zframe.rect.lastPath )
+                else:
+                    self.Trace.selectRegion( box=(x1,y1,x2,y2) )
 
+            edited = self.isDragging or self.isClicked
             self.isDragging = False
             self.isClicked = False
-            self.Trace.write()
+            # selections (and therefore drags) can span several traces
+            for trace in self.Trace.getSelectedTraces() | { self.Trace.getCurrentTraceName() }:
+                if edited and self.Trace.snapBV.get():
+                    self.Trace.refine( trace=trace, write=False )
+                self.Trace.write( trace )
+            # journal everything since the click as a single entry
+            self.Control.endGesture()
     def onReleaseSpec(self,event):
         '''shift + release zooms textgrid & spectrogram to selected interval'''
         if self.Spectrogram.specClick==True:
@@ -3227,25 +6150,13 @@ class App(ThemedTk):
             # self.TextGrid.end = decimal.Decimal(max(t1,t2))
             # for itm in canvas.find_all()[0]:
                 # for tag in canvas.gettags(itm): #canvas.dtag() does not seem to work with one argument
-            if max(t1,t2) - min(t1,t2) > self.Spectrogram.ts: #if selected area is larger than one strip of Spectrogram
-                #gets rid of previous tags
-                for tag in canvas.gettags(canvas.find_all()[0]):
-                    canvas.dtag(canvas.find_all()[0],tag)
+            if toSeconds(abs(t2-t1)) > self.Spectrogram.ts: #if selected area is larger than one strip of Spectrogram
                 a = self.Spectrogram.timeToX(self.Spectrogram.clicktime)
                 b = event.x
                 x1 = min(a,b)
                 x2 = max(a,b)
-                #find all frames within range, and add them as tags
-                frame_i = self.TextGrid.frames_canvas.find_all()[0]
-                current_loc = self.TextGrid.frames_canvas.coords(frame_i)[0]
-                while current_loc < x2:
-                    if current_loc > x1:
-                        tag = self.TextGrid.frames_canvas.gettags(frame_i)[0]
-                        canvas.addtag_all(tag)
-                    frame_i += 1
-                    current_loc = self.TextGrid.frames_canvas.coords(frame_i)[0]
-                canvas.addtag_all('minTime'+str(self.Spectrogram.xToTime(x1)))
-                canvas.addtag_all('maxTime'+str(self.Spectrogram.xToTime(x2)))
+                #the frames within range are looked up from the span, see TextGridModule.getItemPositions()
+                self.TextGrid.selectedSpan = (self.Spectrogram.xToTime(x1), self.Spectrogram.xToTime(x2))
                 self.TextGrid.selectedItem = (canvas, canvas.find_all()[0])
                 self.TextGrid.setSelectedIntvlFrames(self.TextGrid.selectedItem)
                 # self.TextGrid.paintCanvases()
@@ -3255,7 +6166,7 @@ class App(ThemedTk):
                 # self.TextGrid.fillCanvases()
                 self.TextGrid.genFrameList(widg=canvas,x_loc=x2, SI=True)
             self.Spectrogram.specClick = False
-            self.Spectrogram.clicktime = -1
+            self.Spectrogram.clicktime = None
 
     def onRelease(self,event):
         '''
@@ -3290,36 +6201,52 @@ class App(ThemedTk):
         '''
         if self.Dicom.isLoaded:
 
-            if self.isDragging: # dragging selection
-                thisClick = (event.x, event.y)
-                selected = list(self.Trace.selected)
-                coords = []
-                # move all currently selected crosshairs
-                for sch in selected:
-                    # keep their relative distance constant
-                    center = ( sch.x, sch.y ) # canvas coordinates not true coordinates
-                    newX = event.x + center[0] - self.dragClick[0]
-                    newY = event.y + center[1] - self.dragClick[1]
-                    sch.dragTo( (newX,newY) )
-                    coords.append( center )
-
-                self.dragClick = thisClick
-                self.Control.push({ 'type':'move', 'chs':selected, 'coords':coords })
-
-            elif self.isClicked: # no selection, mouse clicked
+            # only store the sample here; the work happens at most once per refresh
+            if self.isDragging or self.isClicked:
+                self.motion.feed( event )
+
+    def processMotion(self, samples):
+        '''
+        Handle the mouse movement (list of (x,y) samples) since the last refresh
+        '''
+        if self.isDragging: # dragging selection
+            # move all currently selected crosshairs by the accumulated offset
+            thisClick = samples[-1]
+            dx = thisClick[0] - self.dragClick[0]
+            dy = thisClick[1] - self.dragClick[1]
+            self.Trace.moveSelected( dx, dy )
+
+            # the undo entry gets pushed once, on release
+            self.dragClick = thisClick
+
+        elif self.isClicked: # no selection, mouse clicked
+            # enforce minimum distance b/w new crosshairs, filling in points along
+            # the path if the pointer got further than that between two samples
+            step = _CROSSHAIR_DRAG_BUFFER * self.Dicom.zframe.imgscale
+            for thisClick in samples:
                 lastClick = self.click
-                thisClick = (event.x, event.y)
-                # enforce minimum distance b/w new crosshairs
-                dx = abs(thisClick[0] - lastClick[0]) / self.Dicom.zframe.imgscale
-                dy = abs(thisClick[1] - lastClick[1]) / self.Dicom.zframe.imgscale
-                if dx > _CROSSHAIR_DRAG_BUFFER or dy > _CROSSHAIR_DRAG_BUFFER:
+                dx = thisClick[0] - lastClick[0]
+                dy = thisClick[1] - lastClick[1]
+                dist = max( abs(dx), abs(dy) )
+                if dist > step:
+                    for k in range( 1, int(dist // step) ):
+                        self.Trace.add( lastClick[0] + dx*k*step/dist, lastClick[1] + dy*k*step/dist )
                     self.click = thisClick
-                    ch = self.Trace.add( *self.click )
-                    self.Control.push({ 'type':'add', 'chs':[ch] })
+                    self.Trace.add( *self.click )
+    def onClose(self):
+        '''
+        Save anything that's waiting to be saved before closing the window
+        '''
+        self.Control.flush()
+        self.TextGrid.writeFrameShift()
+        self.Data.textgridWriter.wait()
+        self.destroy()
+
     def onEscape(self, event):
         '''
         Handle <Esc> key : empties the current selection
         '''
+        self.motion.cancel()
         self.isDragging = False
         self.isClicked = False
         self.Trace.unselectAll()
@@ -3327,9 +6254,13 @@ class App(ThemedTk):
         '''
         Handle <Backspace> key : removes current selection
         '''
+        traces = self.Trace.getSelectedTraces()
         for sch in self.Trace.selected:
-            self.Trace.remove( sch )
-        self.Control.push({ 'type':'delete', 'chs':self.Trace.selected })
+            self.Trace.remove( sch, write=False )
+        self.Control.beginGesture()
+        for trace in traces:
+            self.Trace.write( trace )
+        self.Control.endGesture()
         self.Trace.unselectAll()
 
     def filesUpdate(self):
@@ -3348,6 +6279,7 @@ class App(ThemedTk):
         self.Audio.reset()
         self.TextGrid.reset()
         self.Spectrogram.reset()
+        self.Data.refreshTraceIndex() # (the last file's TextGrid has been written by now)
 
         # check if we can pan left/right
         self.filesPrevBtn['state'] = DISABLED if self.Data.getFileLevel('_prev')==None else NORMAL
@@ -3608,7 +6540,156 @@ class CanvasTooltip:
             self.tw.destroy()
         self.tw = None
 
+class CanvasHoverTooltip(CanvasTooltip):
+    '''
+    A single tooltip for a whole canvas: instead of binding to items, it follows
+    the pointer and asks `lookup(x)` for the text to show there (None for no tip),
+    only rebuilding the tip when that text changes
+    '''
+    def __init__(self, canvas, lookup,
+                 *,
+                 bg='#FFFFEA',
+                 pad=(5, 3, 5, 3),
+                 waittime=400,
+                 wraplength=250):
+        self.waittime = waittime
+        self.wraplength = wraplength
+        self.canvas = canvas
+        self.text = ''
+        self.bg = bg
+        self.pad = pad
+        self.id = None
+        self.tw = None
+        self.lookup = lookup
+        self.current = None
+        self.canvas.bind("<Motion>", self.onMotion, add='+')
+        self.canvas.bind("<Leave>", self.onLeave, add='+')
+        self.canvas.bind("<ButtonPress>", self.onLeave, add='+')
+
+    def onMotion(self, event):
+        text = self.lookup(self.canvas.canvasx(event.x))
+        if text == self.current:
+            return
+        self.onLeave()
+        self.current = text
+        if text != None:
+            self.text = text
+            self.schedule()
+
+    def onLeave(self, event=None):
+        self.current = None
+        super().onLeave(event)
+
+def parseArgs():
+    ''' command line arguments (shared by the app and the headless tools) '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('path', help='path (unique to a participant) where subdirectories contain raw data', default=None, nargs='?')
+    parser.add_argument('--latency', help='report event-to-paint latency of drags and freehand tracing', action='store_true')
+    parser.add_argument('--resample', help='without opening the app, resample every trace to N points and save them to --output (with --query or --stats, resample their results instead)', type=int, metavar='N')
+    parser.add_argument('--smoothing', help='roughness penalty used by --resample (0 for none)', type=float, default=_RESAMPLE_SMOOTHING)
+    # the other headless tools, at most one at a time
+    actions = parser.add_mutually_exclusive_group()
+    actions.add_argument('--export', help='without opening the app, export every trace to --output', choices=['csv', 'npz', 'textgrid'])
+    actions.add_argument('--stats', help='without opening the app, save the mean contour and SD of every (trace, tier, label) to --output (resampled to --resample points)', action='store_true')
+    actions.add_argument('--query', help='without opening the app, save the TRACE traces on frames inside intervals labelled LABEL on TIER to --output', nargs=3, metavar=('TRACE', 'TIER', 'LABEL'))
+    actions.add_argument('--progress', help='without opening the app, print how many frames inside labelled intervals are traced, per file and tier', action='store_true')
+    parser.add_argument('--output', help='output file (or directory, for TextGrids) for headless tools (default: inside `path`)', default=None)
+    args = parser.parse_args()
+    if args.resample != None and ( args.export != None or args.progress ):
+        parser.error( 'argument --resample: not allowed with --export or --progress' )
+    return args
+
+def readProjectMetadata(path):
+    ''' load metadata.json for the headless tools (without a MetadataModule, which needs the app) '''
+    if path == None:
+        print( 'ERROR: headless tools need a path' )
+        exit(1)
+    mdfile = os.path.join( path, 'metadata.json' )
+    if not os.path.exists( mdfile ):
+        print( 'ERROR: `%s` could not be located' % mdfile )
+        exit(1)
+    with open( mdfile, 'r' ) as f:
+        return json.load( f )
+
+def resampleProject(args):
+    ''' headless entry point for --resample '''
+    data = readProjectMetadata( args.path )
+    output = os.path.join( args.path, 'resampled.npz' ) if args.output==None else args.output
+    resampler = TraceResampler( n=args.resample, smoothing=args.smoothing )
+    results = resampler.run( data, path=args.path )
+    resampler.save( results, output )
+    print( 'resampled %d trace/file pairs to %d points: `%s`' % (len(results), args.resample, output) )
+
+def exportProject(args):
+    ''' headless entry point for --export '''
+    data = readProjectMetadata( args.path )
+    exporter = TraceExporter( data, args.path )
+    if args.export == 'csv':
+        output = os.path.join( args.path, 'traces.csv' ) if args.output==None else args.output
+        exporter.writeCSV( output )
+    elif args.export == 'npz':
+        output = os.path.join( args.path, 'traces.npz' ) if args.output==None else args.output
+        exporter.writeNPZ( output )
+    else:
+        output = os.path.join( args.path, 'traces-textgrids' ) if args.output==None else args.output
+        exporter.writeTextGrids( output )
+    print( 'exported traces from %d files: `%s`' % (len(exporter.jobs), output) )
+
+def statsProject(args):
+    ''' headless entry point for --stats '''
+    data = readProjectMetadata( args.path )
+    started = time.time()
+    statistics = ContourStatistics( TraceIndex(data, args.path), n=_RESAMPLE_POINTS if args.resample==None else args.resample )
+    frames = statistics.update()
+    output = os.path.join( args.path, 'contour-stats.npz' ) if args.output==None else args.output
+    statistics.save( output )
+    print( 'summarized %d frames into %d groups in %.1f s: `%s`' % (frames, len(statistics.groups), time.time()-started, output) )
+
+def queryProject(args):
+    ''' headless entry point for --query '''
+    data = readProjectMetadata( args.path )
+    trace, tier, label = args.query
+    started = time.time()
+    index = TraceIndex( data, args.path )
+    indexed = time.time()
+    result = index.query( trace, tier, label, n=args.resample )
+    output = os.path.join( args.path, 'query.npz' ) if args.output==None else args.output
+    np.savez_compressed( output, **result )
+    print( 'found %d frames in %d files (index %.0f ms, query %.1f ms): `%s`' % (len(result['frame']),
+        len(set(result['file'].tolist())), (indexed-started)*1000, (time.time()-indexed)*1000, output) )
+
+def progressProject(args):
+    ''' headless entry point for --progress '''
+    data = readProjectMetadata( args.path )
+    progress = TracedFrameCounts( data ).getProgress( TraceIndex(data, args.path) )
+    totals = {}
+    for filename in sorted( progress ):
+        for tier, (traced, total) in sorted( progress[filename].items() ):
+            print( '%s\t%s\t%d/%d' % (filename, tier, traced, total) )
+            totals.setdefault( tier, [0, 0] )
+            totals[ tier ][0] += traced
+            totals[ tier ][1] += total
+    for tier, (traced, total) in sorted( totals.items() ):
+        print( 'all files\t%s\t%d/%d (%.1f%%)' % (tier, traced, total, 100.*traced/total if total else 0.) )
+
 if __name__=='__main__':
+    args = parseArgs()
+    # (--resample only modifies --query and --stats, otherwise it's a tool of its own)
+    if args.export != None:
+        exportProject( args )
+        exit(0)
+    if args.query != None:
+        queryProject( args )
+        exit(0)
+    if args.stats:
+        statsProject( args )
+        exit(0)
+    if args.progress:
+        progressProject( args )
+        exit(0)
+    if args.resample != None:
+        resampleProject( args )
+        exit(0)
     app = App()
     while True:
         try: